@@ -1,17 +1,28 @@
 import base64
 import json
-from typing import Dict, List, Optional
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Union
 
-from botocore.exceptions import ClientError
 from fastapi import HTTPException
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jose import jwk
 from jose.utils import base64url_decode
 from pydantic import BaseModel
 from starlette.requests import Request
-from starlette.status import HTTP_403_FORBIDDEN
+from starlette.status import HTTP_403_FORBIDDEN, HTTP_503_SERVICE_UNAVAILABLE
 
+from auth.cognito import CognitoError, call_cognito, invalidate_jwks
 from auth.user_auth import user_info_with_token
+from observability.metrics import AUTH_DURATION
+
+logger = logging.getLogger(__name__)
+
+# An unknown kid fetches the key set again, e.g. after a key rotation, at most
+# this often so that forged kids cannot hammer the identity provider
+JWKS_REFRESH_INTERVAL_SECONDS = float(os.environ.get("JWKS_REFRESH_INTERVAL_SECONDS", "60"))
 
 # Define the type for JWK
 JWK = Dict[str, str]
@@ -33,10 +44,65 @@ class JWTAuthorizationCredentials(BaseModel):
 
 # Class to handle JWT authentication
 class JWTBearer(HTTPBearer):
-    def __init__(self, jwks: JWKS, auto_error: bool = True):
+    def __init__(
+        self,
+        jwks: Union[JWKS, Callable[[], JWKS]],
+        auto_error: bool = True,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param jwks: Key set, or a callable returning it on first use so that
+            the keys are not fetched at import time.
+        :param auto_error: Raise on missing credentials instead of returning None.
+        :param clock: Monotonic clock rate limiting the refreshes on unknown kids.
+        """
         super().__init__(auto_error=auto_error)
-        # Map KIDs to their corresponding JWKs
-        self.kid_to_jwk = {jwk["kid"]: jwk for jwk in jwks.keys}
+        self._jwks = jwks
+        self._kid_to_jwk = None
+        self._clock = clock
+        self._refreshed_at = None
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def kid_to_jwk(self) -> Dict[str, JWK]:
+        """
+        Map KIDs to their corresponding JWKs, loading the key set on first use.
+        """
+        if self._kid_to_jwk is None:
+            jwks = self._jwks() if callable(self._jwks) else self._jwks
+            self._kid_to_jwk = {jwk["kid"]: jwk for jwk in jwks.keys}
+        return self._kid_to_jwk
+
+    def refresh_keys(self):
+        """
+        Drop the loaded key set, and the identity provider's copy when the
+        keys come from it, so the next request fetches it again.
+        """
+        if callable(self._jwks):
+            invalidate_jwks()
+        self._kid_to_jwk = None
+
+    def _refresh_allowed(self) -> bool:
+        """
+        Claim the next refresh on an unknown kid, if the last one is old enough.
+        """
+        now = self._clock()
+        with self._refresh_lock:
+            if self._refreshed_at is not None and now - self._refreshed_at < JWKS_REFRESH_INTERVAL_SECONDS:
+                return False
+            self._refreshed_at = now
+            return True
+
+    def _load_keys(self) -> Dict[str, JWK]:
+        try:
+            return self.kid_to_jwk
+        except Exception:
+            # Nothing was kept, the next request fetches the keys again
+            logger.warning("Could not load the identity provider keys", exc_info=True)
+            raise HTTPException(
+                status_code=HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Identity provider unavailable",
+            )
 
     def decode_jwt(self, token: str):
         """
@@ -65,9 +131,13 @@ class JWTBearer(HTTPBearer):
         :param jwt_credentials: JWTAuthorizationCredentials object.
         :return: True if the token is valid, otherwise False.
         """
-        try:
-            public_key = self.kid_to_jwk[jwt_credentials.header["kid"]]
-        except KeyError:
+        kid = jwt_credentials.header.get("kid")
+        public_key = self._load_keys().get(kid)
+        if public_key is None and kid is not None and self._refresh_allowed():
+            # The user pool may have rotated its keys since they were loaded
+            self.refresh_keys()
+            public_key = self._load_keys().get(kid)
+        if public_key is None:
             raise HTTPException(
                 status_code=HTTP_403_FORBIDDEN, detail="JWK public key not found"
             )
@@ -90,15 +160,15 @@ class JWTBearer(HTTPBearer):
         """
         try:
             user_info_with_token(jwt_token)
-        except ClientError as e:
+        except CognitoError as e:
             # Verifica se a exceção é 'NotAuthorizedException', ou seja, o token foi revogado
-            if e.response["Error"]["Code"] == "NotAuthorizedException":
+            if e.code == "NotAuthorizedException":
                 raise HTTPException(
                     status_code=HTTP_403_FORBIDDEN,
                     detail="Access token has been revoked",
                 )
             else:
-                raise  # Levanta outras exceções de boto3
+                raise  # Levanta outras exceções do Cognito
         except Exception as e:
             # Qualquer outra exceção que precise ser tratada
             raise HTTPException(
@@ -125,8 +195,23 @@ class JWTBearer(HTTPBearer):
 
         jwt_token = credentials.credentials
 
-        # Validate if token is revoked
-        self.verify_token_revoed(jwt_token)
+        # Validate if token is revoked, off the event loop
+        started = time.perf_counter()
+        try:
+            await call_cognito(self.verify_token_revoed, jwt_token)
+        except CognitoError as e:
+            if e.unavailable:
+                raise HTTPException(
+                    status_code=HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Identity provider unavailable",
+                )
+            # Rejected, e.g. the user was deleted: retrying will not help
+            raise HTTPException(
+                status_code=HTTP_403_FORBIDDEN,
+                detail="Access token was rejected by the identity provider",
+            )
+        finally:
+            AUTH_DURATION.observe(time.perf_counter() - started, ("revocation_check",))
 
         self.validate_jwt_structure(jwt_token)
 
@@ -141,7 +226,10 @@ class JWTBearer(HTTPBearer):
             )
 
         # Verify if the token is valid
-        if not self.verify_jwk_token(jwt_credentials):
+        started = time.perf_counter()
+        valid = self.verify_jwk_token(jwt_credentials)
+        AUTH_DURATION.observe(time.perf_counter() - started, ("signature_verify",))
+        if not valid:
             raise HTTPException(status_code=HTTP_403_FORBIDDEN, detail="JWK invalid")
 
         return jwt_credentials  # Return the JWT credentials if valid
@@ -1,25 +1,22 @@
-import os
-
-import requests
-from dotenv import load_dotenv
 from fastapi import Depends, HTTPException
 from starlette.status import HTTP_403_FORBIDDEN
 
+from auth.cognito import get_cognito_provider
 from auth.JWTBearer import JWKS, JWTAuthorizationCredentials, JWTBearer
 
-load_dotenv()
 
-AWS_REGION = os.environ.get("AWS_REGION")
-USER_POOL_ID = os.environ.get("USER_POOL_ID")
+def get_jwks() -> JWKS:
+    """
+    Get the JWKS of the Cognito User Pool.
+
+    The provider fetches it on the first call and reuses it afterwards.
 
-# Get the JWKS from the Cognito User Pool
-response = requests.get(
-    f"https://cognito-idp.{AWS_REGION}.amazonaws.com/{USER_POOL_ID}/.well-known/jwks.json"
-)
+    :return: JWKS object.
+    """
+    return JWKS.model_validate(get_cognito_provider().jwks())
 
-jwks = JWKS.model_validate(response.json())
 
-auth = JWTBearer(jwks)
+auth = JWTBearer(get_jwks)
 
 
 async def get_current_user(
@@ -0,0 +1,426 @@
+import asyncio
+import base64
+import functools
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+from dotenv import load_dotenv
+
+from observability.metrics import record_cache
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# "cognito" talks to the configured user pool, "fake" keeps everything in
+# memory so the API can start and be exercised without network access.
+COGNITO_PROVIDER = os.environ.get("COGNITO_PROVIDER", "cognito").lower()
+
+# Blocking Cognito calls run on their own bounded pool so a slow identity
+# provider cannot use up the threads that serve everything else.
+COGNITO_MAX_WORKERS = int(os.environ.get("COGNITO_MAX_WORKERS", "8"))
+COGNITO_TIMEOUT_SECONDS = float(os.environ.get("COGNITO_TIMEOUT_SECONDS", "5"))
+COGNITO_MAX_RETRIES = int(os.environ.get("COGNITO_MAX_RETRIES", "2"))
+
+T = TypeVar("T")
+
+# Codes meaning the identity provider could not answer, as opposed to having
+# rejected the request: only these are worth a 503 and a retry by the client
+UNAVAILABLE_CODES = frozenset(
+    {"Timeout", "Unavailable", "TooManyRequestsException", "ThrottlingException", "InternalErrorException"}
+)
+
+
+class CognitoError(Exception):
+    """Error returned by the identity provider, e.g. NotAuthorizedException."""
+
+    def __init__(self, code: str, message: str = ""):
+        super().__init__(f"{code}: {message}" if message else code)
+        self.code = code
+
+    @property
+    def unavailable(self) -> bool:
+        """Whether the provider failed to answer, rather than rejected the request."""
+        return self.code in UNAVAILABLE_CODES
+
+
+class CognitoProvider:
+    """
+    Cognito user pool integration.
+
+    Nothing is imported or fetched until first use: the boto3 client and the
+    JWKS are built lazily and then reused for the lifetime of the process.
+    """
+
+    def __init__(
+        self,
+        region: Optional[str] = None,
+        user_pool_id: Optional[str] = None,
+        client_id: Optional[str] = None,
+        client_secret: Optional[str] = None,
+        token_endpoint: Optional[str] = None,
+    ):
+        self.region = region or os.environ.get("AWS_REGION", "us-east-1")
+        self.user_pool_id = user_pool_id or os.environ.get("USER_POOL_ID")
+        self.client_id = client_id or os.environ.get("COGNITO_USER_CLIENT_ID")
+        self.token_endpoint = token_endpoint or os.environ.get("COGNITO_TOKEN_ENDPOINT")
+
+        # The Basic auth header never changes, so build it once
+        client_secret = client_secret or os.environ.get("COGNITO_USER_CLIENT_SECRET")
+        client_credentials = f"{self.client_id}:{client_secret}"
+        self._token_headers = {
+            "Content-Type": "application/x-www-form-urlencoded",
+            "Authorization": f"Basic {base64.b64encode(client_credentials.encode()).decode()}",
+        }
+
+        self._client = None
+        self._session = None
+        self._jwks = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """
+        Get the cognito-idp client, creating it on first use.
+
+        :return: boto3 cognito-idp client.
+        """
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import boto3
+                    from botocore.config import Config
+
+                    self._client = boto3.client(
+                        "cognito-idp",
+                        region_name=self.region,
+                        config=Config(
+                            connect_timeout=COGNITO_TIMEOUT_SECONDS,
+                            read_timeout=COGNITO_TIMEOUT_SECONDS,
+                            max_pool_connections=COGNITO_MAX_WORKERS,
+                            retries={"max_attempts": 2, "mode": "standard"},
+                        ),
+                    )
+        return self._client
+
+    @property
+    def session(self):
+        """
+        Get the HTTP session used for the token endpoint and the JWKS.
+
+        Connections are kept alive and pooled (one per Cognito pool thread), and
+        failed connects or throttled/5xx answers are retried with backoff. The
+        token endpoint consumes the single-use authorization code, so its POST
+        is only retried when it cannot have been processed: failed connects,
+        429 and 503.
+
+        :return: requests Session.
+        """
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+                    from urllib3.util.retry import Retry
+
+                    def adapter(status_forcelist, allowed_methods):
+                        return HTTPAdapter(
+                            pool_connections=2,
+                            pool_maxsize=COGNITO_MAX_WORKERS,
+                            max_retries=Retry(
+                                total=COGNITO_MAX_RETRIES,
+                                connect=COGNITO_MAX_RETRIES,
+                                # A read timeout may mean the code was already consumed
+                                read=0,
+                                status=COGNITO_MAX_RETRIES,
+                                status_forcelist=status_forcelist,
+                                allowed_methods=frozenset(allowed_methods),
+                                backoff_factor=0.1,
+                                raise_on_status=False,
+                            ),
+                        )
+
+                    session = requests.Session()
+                    reads = adapter((429, 500, 502, 503, 504), {"GET"})
+                    session.mount("https://", reads)
+                    session.mount("http://", reads)
+                    if self.token_endpoint:
+                        # The longest matching prefix wins over the adapters above
+                        session.mount(self.token_endpoint, adapter((429, 503), {"POST"}))
+                    self._session = session
+        return self._session
+
+    def exchange_code(self, code: str, redirect_uri: str) -> Optional[dict]:
+        """
+        Exchange an authorization code for tokens at the token endpoint.
+
+        :param code: Authorization code obtained after user login.
+        :param redirect_uri: Redirect URI used during the login process.
+        :return: Token endpoint response if successful, otherwise None.
+
+        :raises CognitoError: With code "Unavailable" if the endpoint could not
+            be reached, was throttling or failed.
+        """
+        import requests
+
+        payload = {
+            "grant_type": "authorization_code",
+            "code": code,
+            "client_id": self.client_id,
+            "redirect_uri": redirect_uri,
+        }
+
+        try:
+            response = self.session.post(
+                self.token_endpoint,
+                data=payload,
+                headers=self._token_headers,
+                timeout=COGNITO_TIMEOUT_SECONDS,
+            )
+        except requests.RequestException as e:
+            raise CognitoError("Unavailable", str(e)) from e
+
+        if response.status_code == 200:
+            return response.json()
+        elif response.status_code == 429 or response.status_code >= 500:
+            raise CognitoError("Unavailable", f"Token endpoint answered {response.status_code}")
+        else:
+            logger.warning(
+                "Token exchange failed with status %s",
+                response.status_code,
+                extra={"response_body": response.text[:500]},
+            )
+            return None
+
+    def jwks(self) -> dict:
+        """
+        Get the JSON Web Key Set of the user pool, fetching it on first use.
+
+        Only a valid key set is kept: after a failed fetch the next call
+        fetches it again.
+
+        :return: JWKS document.
+
+        :raises requests.HTTPError: If the user pool answered with an error status.
+        :raises ValueError: If the answer is not a key set.
+        """
+        if self._jwks is not None:
+            record_cache("jwks", hit=True)
+            return self._jwks
+        session = self.session
+        with self._lock:
+            # Another thread may have fetched it while this one waited
+            record_cache("jwks", hit=self._jwks is not None)
+            if self._jwks is None:
+                response = session.get(
+                    f"https://cognito-idp.{self.region}.amazonaws.com/"
+                    f"{self.user_pool_id}/.well-known/jwks.json",
+                    timeout=COGNITO_TIMEOUT_SECONDS,
+                )
+                response.raise_for_status()
+                jwks = response.json()
+                if not isinstance(jwks, dict) or not isinstance(jwks.get("keys"), list):
+                    raise ValueError("The user pool did not return a key set")
+                self._jwks = jwks
+        return self._jwks
+
+    def invalidate_jwks(self):
+        """
+        Drop the fetched JWKS so the next call fetches it again, e.g. after a key rotation.
+        """
+        with self._lock:
+            self._jwks = None
+
+    def _call(self, operation: str, **kwargs) -> dict:
+        from botocore.exceptions import BotoCoreError, ClientError
+
+        try:
+            return getattr(self.client, operation)(**kwargs)
+        except ClientError as e:
+            error = e.response.get("Error", {})
+            raise CognitoError(error.get("Code", "Unknown"), error.get("Message", "")) from e
+        except BotoCoreError as e:
+            # Connection failures and timeouts, before any answer from Cognito
+            raise CognitoError("Unavailable", str(e)) from e
+
+    def get_user(self, access_token: str) -> dict:
+        """
+        Get the user that owns an access token.
+
+        :param access_token: Access token to look up.
+        :return: GetUser response.
+
+        :raises CognitoError: If Cognito rejects the token.
+        """
+        return self._call("get_user", AccessToken=access_token)
+
+    def global_sign_out(self, access_token: str) -> dict:
+        """
+        Revoke every token of the user that owns an access token.
+
+        :param access_token: Access token of the user.
+        :return: GlobalSignOut response.
+
+        :raises CognitoError: If Cognito rejects the token.
+        """
+        return self._call("global_sign_out", AccessToken=access_token)
+
+    def warm_up(self):
+        """
+        Build the client and session and fetch the JWKS ahead of the first request.
+        """
+        self.client
+        self.session
+        self.jwks()
+
+
+class FakeCognitoProvider:
+    """
+    In-memory stand-in for Cognito, for offline startup, tests and benchmarks.
+
+    Tokens are trusted as-is: get_user builds the user from the token claims.
+    The JWKS can be loaded from the file in FAKE_COGNITO_JWKS_FILE.
+    """
+
+    def __init__(self, jwks: Optional[dict] = None):
+        if jwks is None:
+            jwks_file = os.environ.get("FAKE_COGNITO_JWKS_FILE")
+            if jwks_file:
+                with open(jwks_file) as f:
+                    jwks = json.load(f)
+        self._jwks = jwks or {"keys": []}
+        self.revoked = set()
+
+    def jwks(self) -> dict:
+        return self._jwks
+
+    def invalidate_jwks(self):
+        pass
+
+    def warm_up(self):
+        pass
+
+    def exchange_code(self, code: str, redirect_uri: str) -> Optional[dict]:
+        # The authorization code is used as the access token
+        return {"access_token": code, "expires_in": 3600, "token_type": "Bearer"}
+
+    def get_user(self, access_token: str) -> dict:
+        if access_token in self.revoked:
+            raise CognitoError("NotAuthorizedException", "Access Token has been revoked")
+
+        try:
+            payload = access_token.split(".")[1]
+            claims = json.loads(base64.urlsafe_b64decode(payload + "=="))
+        except (IndexError, ValueError):
+            raise CognitoError("NotAuthorizedException", "Invalid Access Token")
+
+        username = claims.get("username", claims.get("sub"))
+        return {
+            "Username": username,
+            "UserAttributes": [
+                {"Name": "email", "Value": claims.get("email", f"{username}@example.com")},
+                {"Name": "email_verified", "Value": "true"},
+                {"Name": "family_name", "Value": claims.get("family_name", "")},
+                {"Name": "given_name", "Value": claims.get("given_name", username)},
+                {"Name": "sub", "Value": claims.get("sub", username)},
+            ],
+            "ResponseMetadata": {"HTTPStatusCode": 200},
+        }
+
+    def global_sign_out(self, access_token: str) -> dict:
+        self.revoked.add(access_token)
+        return {"ResponseMetadata": {"HTTPStatusCode": 200}}
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_cognito_provider():
+    """
+    Get the process-wide identity provider selected by COGNITO_PROVIDER.
+
+    :return: CognitoProvider or FakeCognitoProvider instance.
+    """
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                if COGNITO_PROVIDER == "fake":
+                    _provider = FakeCognitoProvider()
+                else:
+                    _provider = CognitoProvider()
+    return _provider
+
+
+def set_cognito_provider(provider):
+    """
+    Replace the process-wide identity provider (tests, benchmarks).
+
+    :param provider: Provider to use from now on, or None to reset.
+    """
+    global _provider
+    with _provider_lock:
+        _provider = provider
+
+
+def invalidate_jwks():
+    """
+    Make the process-wide identity provider, if built, fetch its JWKS again.
+    """
+    with _provider_lock:
+        provider = _provider
+    if provider is not None:
+        provider.invalidate_jwks()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=COGNITO_MAX_WORKERS, thread_name_prefix="cognito"
+                )
+    return _executor
+
+
+async def call_cognito(
+    func: Callable[..., T], *args, timeout: float = COGNITO_TIMEOUT_SECONDS
+) -> T:
+    """
+    Run a blocking Cognito call on the Cognito pool without blocking the event loop.
+
+    :param func: Blocking function to run.
+    :param args: Positional arguments for the function.
+    :param timeout: Seconds to wait, including the time queued behind other calls.
+    :return: Result of the function.
+
+    :raises CognitoError: With code "Timeout" if the call did not finish in time.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(_get_executor(), functools.partial(func, *args))
+    try:
+        return await asyncio.wait_for(future, timeout)
+    except asyncio.TimeoutError:
+        name = getattr(func, "__name__", "Cognito call")
+        raise CognitoError("Timeout", f"{name} took longer than {timeout}s")
+
+
+def shutdown_cognito_pool():
+    """
+    Stop the Cognito pool, dropping calls that have not started yet.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
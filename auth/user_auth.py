@@ -1,15 +1,8 @@
-import base64
-import os
+import logging
 
-import boto3
-import requests
-from dotenv import load_dotenv
+from auth.cognito import get_cognito_provider
 
-load_dotenv()
-
-cognito_client = boto3.client(
-    "cognito-idp", region_name=os.getenv("AWS_REGION", "us-east-1")
-)
+logger = logging.getLogger(__name__)
 
 
 def auth_with_code(code: str, redirect_uri: str):
@@ -20,38 +13,15 @@ def auth_with_code(code: str, redirect_uri: str):
     :param redirect_uri: Redirect URI used during the login process.
     :return: Access token and expiration time if authentication is successful, otherwise None.
     """
-    client_id = os.getenv("COGNITO_USER_CLIENT_ID")
-    client_credentials = f"{client_id}:{os.getenv('COGNITO_USER_CLIENT_SECRET')}"
-    auth_header = base64.b64encode(client_credentials.encode()).decode()
-    token_endpoint = os.getenv("COGNITO_TOKEN_ENDPOINT")
-
-    # Prepare token request payload
-    payload = {
-        "grant_type": "authorization_code",
-        "code": code,
-        "client_id": client_id,
-        "redirect_uri": redirect_uri,
-    }
-
-    # Send request to the token endpoint to exchange the code for tokens
-    response = requests.post(
-        token_endpoint,
-        data=payload,
-        headers={
-            "Content-Type": "application/x-www-form-urlencoded",
-            "Authorization": f"Basic {auth_header}",
-        },
-    )
+    # The provider reuses a pooled keep-alive session and precomputed credentials
+    token_data = get_cognito_provider().exchange_code(code, redirect_uri)
 
-    # Check if request was successful
-    if response.status_code == 200:
-        token_data = response.json()
+    if token_data is not None:
         return {
             "token": token_data.get("access_token"),
             "expires_in": token_data.get("expires_in"),
         }  # Returns the access token from the response and the expiration time
     else:
-        print(f"Error: {response.status_code}, {response.text}")
         return None
 
 
@@ -62,12 +32,15 @@ def user_info_with_token(access_token: str):
     :param access_token: Access token obtained after successful authentication.
     :return: User information if successful, otherwise None.
     """
-    response = cognito_client.get_user(AccessToken=access_token)
+    response = get_cognito_provider().get_user(access_token)
 
     if response.get("ResponseMetadata").get("HTTPStatusCode") == 200:
         return response
     else:
-        print(f"Error: Error getting user info: {response}")
+        logger.warning(
+            "Error getting user info",
+            extra={"cognito_response": response.get("ResponseMetadata")},
+        )
         return None
 
 def logout_with_token(access_token: str):
@@ -78,10 +51,13 @@ def logout_with_token(access_token: str):
     :return: True if successful, otherwise False.
     """
 
-    response = cognito_client.global_sign_out(AccessToken=access_token)
+    response = get_cognito_provider().global_sign_out(access_token)
 
     if response.get("ResponseMetadata").get("HTTPStatusCode") == 200:
         return True
     else:
-        print(f"Error: Error logging out: {response}")
+        logger.warning(
+            "Error logging out",
+            extra={"cognito_response": response.get("ResponseMetadata")},
+        )
         return False
\ No newline at end of file
@@ -0,0 +1,177 @@
+"""
+Self-contained environment for running the API under load.
+
+Points the app at its own database (SQLite file or a local MySQL), replaces
+Cognito with the fake provider and a freshly generated RSA key set so that real
+JWTBearer verification runs, and seeds users and tasks.
+"""
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+import auth.auth
+import routers.task
+import routers.user
+import throttling.rate_limit
+from auth.cognito import FakeCognitoProvider, set_cognito_provider
+from db.database import get_db, get_sessionmaker
+from db.ids import new_task_id
+from db.migrate import upgrade
+from main import app
+from models.task import Task as TaskModel
+from models.task import TaskPriority, TaskStatus
+from models.user import User as UserModel
+from observability.metrics import instrument_engine
+from observability.sql import SQL_DIAGNOSTICS_ENABLED, instrument_sql
+
+
+class SigningKey:
+    """RSA key pair published as a JWKS and used to sign access tokens."""
+
+    def __init__(self, kid: str = "benchmark-key"):
+        self.kid = kid
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.private_pem = private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+        public_pem = private_key.public_key().public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+        public_jwk = jwk.construct(public_pem, "RS256").to_dict()
+        self.jwks = {"keys": [{**public_jwk, "kid": kid, "use": "sig"}]}
+
+    def token(self, username: str, sub: str) -> str:
+        now = int(time.time())
+        claims = {
+            "sub": sub,
+            "username": username,
+            "token_use": "access",
+            "iat": now,
+            "exp": now + 3600,
+        }
+        return jwt.encode(claims, self.private_pem, algorithm="RS256", headers={"kid": self.kid})
+
+
+class BenchmarkEnvironment:
+    def __init__(
+        self,
+        db_url: str,
+        users: int = 10,
+        tasks_per_user: int = 100,
+        seed: int = 0,
+    ):
+        self.db_url = db_url
+        self.users = users
+        self.tasks_per_user = tasks_per_user
+        self.random = random.Random(seed)
+        self.engine = None
+        self.key: Optional[SigningKey] = None
+        self.tokens: Dict[str, str] = {}
+        self.task_ids: Dict[str, List[str]] = {}
+        self._overrides = None
+        self._rate_limit_enabled = None
+
+    def start(self):
+        """
+        Create the schema, seed the data and wire the app to this environment.
+        """
+        self.engine = create_engine(self.db_url)
+        upgrade(self.engine)
+        instrument_engine(self.engine)
+        if SQL_DIAGNOSTICS_ENABLED:
+            instrument_sql(self.engine)
+        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+
+        def get_benchmark_db():
+            db = SessionLocal()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        # The load comes from a handful of users, far above any per-user limit
+        self._rate_limit_enabled = throttling.rate_limit.RATE_LIMIT_ENABLED
+        throttling.rate_limit.RATE_LIMIT_ENABLED = False
+
+        self._overrides = dict(app.dependency_overrides)
+        app.dependency_overrides.clear()
+        app.dependency_overrides[get_db] = get_benchmark_db
+        app.dependency_overrides[get_sessionmaker] = lambda: SessionLocal
+
+        self.key = SigningKey()
+        set_cognito_provider(FakeCognitoProvider(jwks=self.key.jwks))
+        for bearer in (auth.auth.auth, routers.task.auth, routers.user.auth):
+            bearer.refresh_keys()
+
+        self._seed()
+
+    def stop(self):
+        """
+        Restore the app and dispose of the database connections.
+        """
+        app.dependency_overrides.clear()
+        app.dependency_overrides.update(self._overrides or {})
+        throttling.rate_limit.RATE_LIMIT_ENABLED = self._rate_limit_enabled
+        set_cognito_provider(None)
+        for bearer in (auth.auth.auth, routers.task.auth, routers.user.auth):
+            bearer.refresh_keys()
+        self.engine.dispose()
+
+    def _seed(self):
+        run_id = uuid.uuid4().hex[:8]
+        now = datetime.now(timezone.utc)
+        users = []
+        tasks = []
+        for i in range(self.users):
+            user_id = f"bench-{run_id}-{i}"
+            username = f"bench-user-{run_id}-{i}"
+            users.append(
+                {
+                    "id": user_id,
+                    "given_name": "Bench",
+                    "family_name": str(i),
+                    "username": username,
+                    "email": f"{username}@example.com",
+                    "updated_at": now,
+                }
+            )
+            self.tokens[username] = self.key.token(username, user_id)
+            self.task_ids[username] = []
+            for _ in range(self.tasks_per_user):
+                task_id = new_task_id()
+                self.task_ids[username].append(task_id)
+                tasks.append(
+                    {
+                        "id": task_id,
+                        "title": "Seeded task",
+                        "description": "Seeded by the benchmark suite",
+                        "status": self.random.choice(list(TaskStatus)),
+                        "created_at": now,
+                        "priority": self.random.choice(list(TaskPriority)),
+                        "deadline": now + timedelta(days=self.random.randint(1, 30)),
+                        "user_id": user_id,
+                    }
+                )
+
+        with sessionmaker(bind=self.engine)() as db:
+            db.execute(insert(UserModel), users)
+            for start in range(0, len(tasks), 1000):
+                db.execute(insert(TaskModel), tasks[start:start + 1000])
+            db.commit()
+
+    def random_user(self) -> str:
+        return self.random.choice(list(self.tokens))
+
+    def headers(self, username: str) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.tokens[username]}"}
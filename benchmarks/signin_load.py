@@ -0,0 +1,147 @@
+"""
+Burst sign-in load test against a local stub of the Cognito token endpoint.
+
+Fires bursts of concurrent authorization-code exchanges, once with a fresh
+connection per call (the old requests.post behaviour) and once through the
+pooled keep-alive session of CognitoProvider, and prints latency percentiles,
+throughput and the number of TCP connections the stub accepted as JSON:
+
+    COGNITO_MAX_WORKERS=32 python -m benchmarks.signin_load --logins 2000
+
+The concurrency defaults to COGNITO_MAX_WORKERS, the size of both the Cognito
+thread pool and the session's connection pool, as it would be in the API.
+
+--latency-ms adds server-side delay; --tls-ms simulates the handshake cost
+that every new connection pays against the real endpoint.
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from auth.cognito import COGNITO_MAX_WORKERS, CognitoProvider
+from benchmarks.stats import percentile
+
+
+class StubTokenServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, latency_ms: float, tls_ms: float):
+        super().__init__(("127.0.0.1", 0), StubTokenHandler)
+        self.latency = latency_ms / 1000
+        self.tls = tls_ms / 1000
+        self.connections = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/oauth2/token"
+
+
+class StubTokenHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server._lock:
+            self.server.connections += 1
+        time.sleep(self.server.tls)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.server.latency)
+        body = json.dumps({"access_token": "token", "expires_in": 3600}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run(name: str, exchange, server: StubTokenServer, logins: int, concurrency: int) -> dict:
+    """
+    Run `logins` exchanges in bursts of `concurrency` and measure them.
+
+    :param name: Label of the run.
+    :param exchange: Callable performing one code exchange.
+    :param server: Running stub server.
+    :param logins: Total number of sign-ins.
+    :param concurrency: Concurrent sign-ins per burst.
+    :return: Measured results.
+    """
+    connections_before = server.connections
+    latencies = []
+
+    def timed(i):
+        started = time.perf_counter()
+        exchange(f"code-{i}")
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for burst in range(0, logins, concurrency):
+            latencies.extend(pool.map(timed, range(burst, min(logins, burst + concurrency))))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "client": name,
+        "logins": logins,
+        "concurrency": concurrency,
+        "throughput_per_second": round(logins / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 2),
+        "connections_opened": server.connections - connections_before,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Burst sign-in load test")
+    parser.add_argument("--logins", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=COGNITO_MAX_WORKERS)
+    parser.add_argument("--latency-ms", type=float, default=5)
+    parser.add_argument("--tls-ms", type=float, default=20)
+    args = parser.parse_args(argv)
+
+    server = StubTokenServer(args.latency_ms, args.tls_ms)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    provider = CognitoProvider(
+        client_id="client_id",
+        client_secret="client_secret",
+        token_endpoint=server.url,
+    )
+
+    def per_call_connection(code):
+        # What auth_with_code did before: new connection, new auth header
+        return requests.post(
+            server.url,
+            data={"grant_type": "authorization_code", "code": code},
+            headers=provider._token_headers,
+        ).json()
+
+    def pooled_session(code):
+        return provider.exchange_code(code, "http://localhost/callback")
+
+    results = [
+        run("per-call-connection", per_call_connection, server, args.logins, args.concurrency),
+        run("pooled-session", pooled_session, server, args.logins, args.concurrency),
+    ]
+    server.shutdown()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import statistics
+from typing import Dict, List
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """
+    Nearest-rank percentile of a list of samples.
+
+    :param samples: Measured values.
+    :param pct: Percentile between 0 and 100.
+    :return: The sample at that percentile.
+    """
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(latencies: List[float], elapsed: float) -> Dict[str, float]:
+    """
+    Summarize request latencies (in seconds) measured over `elapsed` seconds.
+
+    :return: Count, throughput and latency percentiles in milliseconds.
+    """
+    if not latencies:
+        return {"count": 0, "throughput_rps": 0.0}
+    return {
+        "count": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3),
+    }
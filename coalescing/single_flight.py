@@ -0,0 +1,166 @@
+"""
+Single-flight reads: concurrent identical lookups in a worker share one query.
+
+Requests reading the same thing at the same time (a user's task list open in
+several tabs, one task polled from several devices) await the call started by
+the first of them instead of each running their own. The call runs on a pool
+of READ_COALESCING_THREADS threads of its own, with a session it opens there
+and closes when done, so it must return something that outlives the session:
+serialized bodies, or detached objects. It never uses the session of a request,
+which that request may be committing meanwhile.
+
+Results never cross a write: keys carry the write generation of the worker,
+bumped by every commit of a session that wrote something. A read starting
+after a commit returned cannot join a call started before it. Writes of other
+workers and of the background jobs are not seen, as they would not be by a
+query already running either.
+
+Set READ_COALESCING_ENABLED=false to run every read on its own.
+"""
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.orm import ORMExecuteState, Session, sessionmaker
+
+from observability.metrics import REGISTRY, Counter
+
+load_dotenv()
+
+READ_COALESCING_ENABLED = os.environ.get("READ_COALESCING_ENABLED", "true").lower() == "true"
+# Reads running at once, each holding a connection; more wait for a thread
+READ_COALESCING_THREADS = int(os.environ.get("READ_COALESCING_THREADS", "8"))
+
+COALESCED_READS = REGISTRY.register(
+    Counter(
+        "coalesced_reads_total",
+        "Reads answered by the call of a concurrent identical read.",
+        ("read",),
+    )
+)
+
+T = TypeVar("T")
+
+_WRITES_KEY = "coalescing_writes"
+
+_generation = 0
+_generation_lock = threading.Lock()
+
+
+def write_generation() -> int:
+    return _generation
+
+
+def _bump_generation():
+    global _generation
+    with _generation_lock:
+        _generation += 1
+
+
+@event.listens_for(Session, "after_flush")
+def _flushed(session: Session, flush_context):
+    session.info[_WRITES_KEY] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _executed(orm_execute_state: ORMExecuteState):
+    # Bulk statements, like the upsert of users, bypass the flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info[_WRITES_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _committed(session: Session):
+    if session.info.pop(_WRITES_KEY, False):
+        _bump_generation()
+
+
+@event.listens_for(Session, "after_rollback")
+def _rolled_back(session: Session):
+    session.info.pop(_WRITES_KEY, None)
+
+
+class SingleFlight:
+    """
+    Calls in progress on the event loop, by key.
+    """
+
+    def __init__(self, executor: Optional[Executor] = None):
+        """
+        :param executor: Runs the calls; the loop's default executor when None.
+        """
+        self._executor = executor
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    def run(self, fn: Callable[..., T], *args) -> asyncio.Future:
+        """
+        Run fn(*args) on the executor, in the context of the caller.
+        """
+        context = contextvars.copy_context()
+        call = functools.partial(context.run, fn, *args)
+        return asyncio.get_running_loop().run_in_executor(self._executor, call)
+
+    async def do(self, key: Hashable, fn: Callable[..., T], *args) -> Tuple[T, bool]:
+        """
+        Run fn(*args) in a thread, unless a call with the same key is running.
+
+        :param key: Identifies the call; equal keys must mean equal results.
+        :return: The result, and whether it came from another caller's call.
+        :raises Exception: Whatever the call raised, to every caller sharing it.
+        """
+        call = self._calls.get(key)
+        # A call of another event loop cannot be awaited from this one
+        shared = call is not None and call.get_loop() is asyncio.get_running_loop()
+        if not shared:
+            call = self.run(fn, *args)
+            self._calls[key] = call
+            call.add_done_callback(lambda done: self._forget(key, done))
+        # The call goes on if this caller is cancelled: others may wait for it
+        return await asyncio.shield(call), shared
+
+    def _forget(self, key: Hashable, call: asyncio.Future):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        if not call.cancelled():
+            # Retrieved, so an error nobody waits for anymore is not logged
+            call.exception()
+
+
+# Not the default executor: it also runs the waits of duplicate requests for
+# an idempotency key, which must not hold reads up or be held up by them
+_executor = ThreadPoolExecutor(max_workers=READ_COALESCING_THREADS, thread_name_prefix="coalesced-read")
+_flights = SingleFlight(_executor)
+
+
+def _read(sessions: sessionmaker, fn: Callable[..., T], *args) -> T:
+    db = sessions()
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
+
+async def coalesce(read: str, key: Tuple[Any, ...], sessions: sessionmaker, fn: Callable[..., T], *args) -> T:
+    """
+    Run a blocking read in a thread, shared with the identical reads in progress.
+
+    :param read: Name of the read, labelling the metric.
+    :param key: Arguments the result depends on, including the user for
+        reads checking access.
+    :param sessions: Opens the session of the read, in its thread.
+    :param fn: The read; gets the session, then *args.
+    :return: The result of fn.
+    """
+    if not READ_COALESCING_ENABLED:
+        return await _flights.run(_read, sessions, fn, *args)
+
+    result, shared = await _flights.do((read, write_generation(), *key), _read, sessions, fn, *args)
+    if shared:
+        COALESCED_READS.inc((read,))
+    return result
@@ -0,0 +1,75 @@
+from datetime import datetime, timezone
+
+from fastapi import Depends, HTTPException
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from crud.task import (_enum_value, delete_future_occurrences,
+                       materialize_recurring_task)
+from db.database import get_db
+from db.ids import is_valid_task_id
+from models.recurring_task import RecurringTask
+from models.task import TaskPriority
+from recurrence.roller import naive_utc, utcnow
+from schemas.recurring_task import RecurringTaskCreate
+
+
+def create_recurring_task(recurring_task: RecurringTaskCreate, user_id: str, until: datetime, db: Session = Depends(get_db)):
+    """
+    Create a series and materialize its occurrences up to `until`.
+    """
+    db_recurring_task = RecurringTask(
+        title=recurring_task.title,
+        description=recurring_task.description,
+        priority=_enum_value(TaskPriority, recurring_task.priority),
+        rule=recurring_task.rule,
+        starts_at=naive_utc(recurring_task.starts_at),
+        created_at=datetime.now(timezone.utc),
+        user_id=user_id,
+    )
+
+    try:
+        db.add(db_recurring_task)
+        db.commit()
+        db.refresh(db_recurring_task)
+        materialize_recurring_task(db_recurring_task, until, db)
+        db.refresh(db_recurring_task)
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail="An error occurred while creating the recurring task.") from e
+
+    return db_recurring_task
+
+def get_recurring_tasks_by_user_id(user_id: str, db: Session = Depends(get_db)):
+    return (
+        db.query(RecurringTask)
+        .execution_options(use_replica=True)
+        .filter(RecurringTask.user_id == user_id)
+        .all()
+    )
+
+def delete_recurring_task(recurring_task_id: str, user_id: str, db: Session = Depends(get_db)):
+    """
+    Delete a series and its occurrences that are not due nor started yet.
+    """
+    if not is_valid_task_id(recurring_task_id):
+        raise HTTPException(status_code=404, detail="Recurring task not found")
+
+    db_recurring_task = (
+        db.query(RecurringTask)
+        .filter(RecurringTask.id == recurring_task_id, RecurringTask.user_id == user_id)
+        .first()
+    )
+
+    if db_recurring_task is None:
+        raise HTTPException(status_code=404, detail="Recurring task not found")
+
+    try:
+        delete_future_occurrences(recurring_task_id, utcnow(), db)
+        db.delete(db_recurring_task)
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail="An error occurred while deleting the recurring task.") from e
+
+    return db_recurring_task
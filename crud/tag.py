@@ -0,0 +1,82 @@
+from typing import List, Optional
+
+from fastapi import Depends
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from db.database import get_db
+from models.tag import Tag, TaskTag
+from models.task import Task as TaskModel
+
+
+def get_or_create_tags(user_id: str, names: List[str], db: Session = Depends(get_db)) -> List[Tag]:
+    """
+    Get the tags of a user by name, creating the missing ones.
+
+    Leaves the transaction open for the caller to commit.
+
+    :param user_id: Owner of the tags.
+    :param names: Normalized tag names, see schemas.tag.normalize_tags.
+    :param db: Database session.
+    :return: The tags, in the order of `names`.
+    """
+    if not names:
+        return []
+
+    def existing():
+        return {
+            tag.name: tag
+            for tag in db.query(Tag).filter(Tag.user_id == user_id, Tag.name.in_(names))
+        }
+
+    tags = existing()
+    missing = [name for name in names if name not in tags]
+    for name in missing:
+        # One savepoint each, so a tag created by a concurrent request first
+        # does not roll back the others
+        try:
+            with db.begin_nested():
+                db.add(Tag(name=name, user_id=user_id))
+        except IntegrityError:
+            pass
+    if missing:
+        tags = existing()
+    return [tags[name] for name in names]
+
+def tag_filter(user_id: Optional[str], names: List[str], match_all: bool = True):
+    """
+    Build a subquery of the ids of a user's tasks tagged with `names`.
+
+    Only task_tags and tags are read, through their composite indexes.
+
+    :param user_id: Owner of the tags, or None for the tags of any user.
+    :param match_all: Require every tag (AND) instead of any of them (OR).
+    :return: A SELECT of task ids, for use with `Task.id.in_(...)`.
+    """
+    query = select(TaskTag.task_id).join(Tag, Tag.id == TaskTag.tag_id).where(Tag.name.in_(names))
+    if user_id is not None:
+        query = query.where(Tag.user_id == user_id)
+    if match_all:
+        # (task_id, tag_id) is unique, so each matched tag counts once
+        query = query.group_by(TaskTag.task_id).having(func.count() == len(set(names)))
+    return query
+
+def get_tag_counts(user_id: str, db: Session = Depends(get_db)):
+    """
+    Count the tasks of each tag of a user in one grouped query.
+
+    Deleted and archived tasks are not counted; tags without tasks are left out.
+
+    :return: (name, count) rows ordered by name.
+    """
+    return (
+        db.query(Tag.name, func.count(TaskModel.id).label("count"))
+        .execution_options(use_replica=True)
+        .join(TaskTag, TaskTag.tag_id == Tag.id)
+        .join(TaskModel, TaskModel.id == TaskTag.task_id)
+        .filter(Tag.user_id == user_id)
+        .group_by(Tag.name)
+        .order_by(Tag.name)
+        .all()
+    )
@@ -1,28 +1,157 @@
 import logging
 from datetime import datetime, timezone
+from typing import List, Optional
 
 from fastapi import Depends, HTTPException
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import and_, or_, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import flag_modified
 
-from db.database import get_db
+from crud.tag import get_or_create_tags, tag_filter
+from crud.task_list import get_memberships
+from db.database import get_db, shards
+from db.ids import is_valid_task_id
+from db.sharding import is_sharded
+from db.soft_delete import TASK_SOFT_DELETE
+from events.outbox import enqueue
+from events.tasks import (TASK_CREATED, TASK_DELETED, TASK_RESTORED,
+                          TASK_UPDATED, task_event)
+from models.idempotency_key import IdempotencyKey
+from models.recurring_task import RecurringTask
+from models.tag import Tag, TaskTag
+from models.task import ArchivedTask, Subtask
 from models.task import Task as TaskModel
 from models.task import TaskPriority, TaskStatus
-from schemas.task import TaskCreate, TaskInDB, TaskUpdate
+from models.task_list import ListRole, TaskListMember, allows
+from recurrence.rule import occurrences, parse_rule
+from schemas.task import (SubtaskCreate, SubtaskUpdate, TaskCreate, TaskInDB,
+                          TaskUpdate)
 
+logger = logging.getLogger(__name__)
+
+
+def _enum_value(enum_type, value):
+    # Enum columns store member names; MySQL matches "low" against LOW
+    # case-insensitively but SQLite does not, so always bind the member.
+    try:
+        return enum_type(value)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid {enum_type.__name__}: {value}") from e
+
+def _record(kind: str, task: TaskModel, db: Session):
+    # Written in the transaction of the change itself, see events.outbox
+    enqueue(db, kind, task.user_id, task_event(kind, task))
+
+def _set_tags(db_task: TaskModel, tags: List[Tag]):
+    # Keep the links of tags that stay, so they are not deleted and reinserted
+    links = {link.tag_id: link for link in db_task.tag_links}
+    db_task.tag_links = [
+        links.get(tag.id) or TaskTag(tag_id=tag.id, user_id=db_task.user_id) for tag in tags
+    ]
+    # tags is read-only; set it too so that the events of this transaction see the change
+    db_task.tags = sorted(tags, key=lambda tag: tag.name)
+
+def _find_task(
+    model,
+    task_id: str,
+    user_id: Optional[str],
+    db: Session,
+    required: ListRole = ListRole.VIEWER,
+    *criteria,
+    include_deleted: bool = False,
+):
+    """
+    Load a task the user may access with at least the `required` role.
+
+    The creator of a task owns it; members of its list have their role in
+    the list. The role is resolved by the query loading the task, joined to
+    the user's membership. Sharded tasks cannot be joined to the members on
+    the main database, so the role then comes from get_memberships().
+
+    :param user_id: Requesting user; None skips the check, for internal callers.
+    :return: The task, or None if it does not exist or the user has no access.
+    :raises HTTPException: 403 if the user's role is below `required`.
+    """
+    if not is_valid_task_id(task_id):
+        return None
+
+    query = db.query(model)
+    if include_deleted:
+        query = query.execution_options(include_deleted=True)
+    query = query.filter(model.id == task_id, *criteria)
+    if user_id is None:
+        return query.first()
+
+    if is_sharded(db):
+        task = query.first()
+        role = None
+        if task is not None:
+            role = ListRole.OWNER if task.user_id == user_id else get_memberships(user_id, db).get(task.list_id)
+    else:
+        row = (
+            query.add_columns(TaskListMember.role)
+            .outerjoin(
+                TaskListMember,
+                and_(TaskListMember.list_id == model.list_id, TaskListMember.user_id == user_id),
+            )
+            .filter(or_(model.user_id == user_id, TaskListMember.user_id.is_not(None)))
+            .first()
+        )
+        task, role = row if row is not None else (None, None)
+        if task is not None and task.user_id == user_id:
+            role = ListRole.OWNER
+
+    if task is None or role is None:
+        return None
+    if not allows(role, required):
+        raise HTTPException(status_code=403, detail="Not allowed to change this task")
+    return task
+
+def create_task(task: TaskCreate, user_id: str, db: Session = Depends(get_db), idempotency_key: Optional[IdempotencyKey] = None):
+    """
+    Create a task.
+
+    :param idempotency_key: Unsaved key row, stored with the task and its
+        response in the same transaction (see idempotency.keys).
+    :raises HTTPException: 409 if the key was stored meanwhile by another request.
+    """
+    if task.list_id is not None:
+        role = get_memberships(user_id, db).get(task.list_id)
+        if role is None:
+            raise HTTPException(status_code=404, detail="List not found")
+        if not allows(role, ListRole.EDITOR):
+            raise HTTPException(status_code=403, detail="Not allowed to add tasks to this list")
 
-def create_task(task: TaskCreate, user_id: str, db: Session = Depends(get_db)):
     db_task = TaskModel(
         title=task.title,
         description=task.description,
         created_at=datetime.now(timezone.utc),
-        priority=task.priority,
+        priority=_enum_value(TaskPriority, task.priority),
         deadline=task.deadline,
         user_id=user_id,
+        list_id=task.list_id,
+        subtasks=[
+            Subtask(title=subtask.title, position=position, user_id=user_id)
+            for position, subtask in enumerate(task.subtasks)
+        ],
     )
 
     try:
+        _set_tags(db_task, get_or_create_tags(user_id, task.tags, db))
         db.add(db_task)
+        db.flush()
+        _record(TASK_CREATED, db_task, db)
+        if idempotency_key is not None:
+            idempotency_key.task_id = db_task.id
+            idempotency_key.response = TaskInDB.model_validate(db_task, from_attributes=True).model_dump_json()
+            db.add(idempotency_key)
+            try:
+                # Waits for a concurrent request holding the same key, then fails
+                db.flush()
+            except IntegrityError as e:
+                db.rollback()
+                raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is in progress") from e
         db.commit()
         db.refresh(db_task)
     except SQLAlchemyError as e:
@@ -31,22 +160,93 @@ def create_task(task: TaskCreate, user_id: str, db: Session = Depends(get_db)):
 
     return db_task
 
-def get_task_by_user_id(user_id: str, db: Session = Depends(get_db)):
-    tasks = db.query(TaskModel).filter(TaskModel.user_id == user_id).all()
+def get_task_by_user_id(
+    user_id: str,
+    db: Session = Depends(get_db),
+    include_archived: bool = False,
+    tags: Optional[List[str]] = None,
+    match_all: bool = True,
+):
+    """
+    Get the tasks of a user and of the lists the user is a member of,
+    optionally only those with some tags.
+
+    :param tags: Tag names to filter on; no filter when empty.
+    :param match_all: Require every tag (AND) instead of any of them (OR).
+    """
+    models = [TaskModel, ArchivedTask] if include_archived else [TaskModel]
+    list_ids = list(get_memberships(user_id, db))
+    tasks = []
+    for model in models:
+        query = db.query(model).execution_options(use_replica=True).filter(model.user_id == user_id)
+        if tags:
+            query = query.filter(model.id.in_(tag_filter(user_id, tags, match_all)))
+        tasks += query.all()
+        if list_ids:
+            # Tasks of other users, possibly on other shards, tagged by them
+            shared = (
+                db.query(model)
+                .execution_options(use_replica=True)
+                .filter(model.list_id.in_(list_ids), model.user_id != user_id)
+            )
+            if tags:
+                shared = shared.filter(model.id.in_(tag_filter(None, tags, match_all)))
+            tasks += shared.all()
     return tasks
 
-def get_task_by_id(task_id: str, db: Session = Depends(get_db)):
-    task = db.query(TaskModel).filter(TaskModel.id == task_id).first()
+def get_task_by_id(task_id: str, db: Session = Depends(get_db), include_archived: bool = False, user_id: Optional[str] = None):
+    task = _find_task(TaskModel, task_id, user_id, db)
+    if task is None and include_archived:
+        task = _find_task(ArchivedTask, task_id, user_id, db)
     if task is None:
         raise HTTPException(status_code=404, detail="Task not found")
     return task
 
-def get_task_by_status(status: str, db: Session = Depends(get_db)):
-    tasks = db.query(TaskModel).filter(TaskModel.status == status).all()
-    return tasks
+def get_task_by_status(status: str, db: Session = Depends(get_db), include_archived: bool = False, user_id: Optional[str] = None):
+    """
+    Get the tasks with a status.
+
+    :param user_id: Only the tasks of this user and of the lists the user is
+        a member of; every user's tasks when None.
+    """
+    status = _enum_value(TaskStatus, status)
+    models = [TaskModel, ArchivedTask] if include_archived else [TaskModel]
+
+    if user_id is not None:
+        list_ids = list(get_memberships(user_id, db))
+        tasks = []
+        for model in models:
+            tasks += (
+                db.query(model)
+                .execution_options(use_replica=True)
+                .filter(model.user_id == user_id, model.status == status)
+                .all()
+            )
+            if list_ids:
+                tasks += (
+                    db.query(model)
+                    .execution_options(use_replica=True)
+                    .filter(model.list_id.in_(list_ids), model.user_id != user_id, model.status == status)
+                    .all()
+                )
+        return tasks
 
-def update_task(task_id: str, task: TaskUpdate, db: Session = Depends(get_db)):
-    db_task = db.query(TaskModel).filter(TaskModel.id == task_id).first()
+    def query(session: Session):
+        return [
+            task
+            for model in models
+            for task in session.query(model)
+            .execution_options(use_replica=True)
+            .filter(model.status == status)
+            .all()
+        ]
+
+    if is_sharded(db):
+        return [task for tasks in shards.fan_out(query) for task in tasks]
+    return query(db)
+
+def update_task(task_id: str, task: TaskUpdate, db: Session = Depends(get_db), user_id: Optional[str] = None):
+    db_task = _find_task(TaskModel, task_id, user_id, db, ListRole.EDITOR)
 
     if db_task is None:
         raise HTTPException(status_code=404, detail="Task not found")
@@ -54,16 +254,27 @@ def update_task(task_id: str, task: TaskUpdate, db: Session = Depends(get_db)):
     for attr, value in task.model_dump(exclude_unset=True).items():
         if value is not None:
             if attr == "status":
-                print("attr: ", attr)
-                print("value: ", TaskStatus(value))
-                print("db_task status: ", db_task.status)
-                setattr(db_task, attr, TaskStatus(value))
+                status = TaskStatus(value)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(
+                        "Changing status of task %s from %s to %s",
+                        task_id,
+                        db_task.status,
+                        status,
+                    )
+                if status != db_task.status:
+                    # Done tasks are archived some time after this, see db.archive
+                    db_task.completed_at = datetime.now(timezone.utc) if status == TaskStatus.DONE else None
+                setattr(db_task, attr, status)
             elif attr == "priority":
                 setattr(db_task, attr, TaskPriority(value))
+            elif attr == "tags":
+                _set_tags(db_task, get_or_create_tags(db_task.user_id, value, db))
             else:
                 setattr(db_task, attr, value)
     
     try:
+        _record(TASK_UPDATED, db_task, db)
         db.commit()
         db.refresh(db_task)
     except SQLAlchemyError as e:
@@ -72,17 +283,202 @@ def update_task(task_id: str, task: TaskUpdate, db: Session = Depends(get_db)):
     
     return db_task
 
-def delete_task(task_id: str, db: Session = Depends(get_db)):
-    db_task = db.query(TaskModel).filter(TaskModel.id == task_id).first()
+def delete_task(task_id: str, db: Session = Depends(get_db), user_id: Optional[str] = None):
+    db_task = _find_task(TaskModel, task_id, user_id, db, ListRole.EDITOR)
 
     if db_task is None:
         raise HTTPException(status_code=404, detail="Task not found")
 
     try:
-        db.delete(db_task)
+        if TASK_SOFT_DELETE:
+            db_task.deleted_at = datetime.now(timezone.utc)
+        else:
+            db.delete(db_task)
+        _record(TASK_DELETED, db_task, db)
         db.commit()
     except SQLAlchemyError as e:
         db.rollback()
         raise HTTPException(status_code=500, detail="An error occurred while deleting the task.") from e
 
-    return db_task
\ No newline at end of file
+    return db_task
+
+def restore_task(task_id: str, db: Session = Depends(get_db), user_id: Optional[str] = None):
+    db_task = _find_task(
+        TaskModel,
+        task_id,
+        user_id,
+        db,
+        ListRole.EDITOR,
+        TaskModel.deleted_at.is_not(None),
+        include_deleted=True,
+    )
+
+    if db_task is None:
+        raise HTTPException(status_code=404, detail="Deleted task not found")
+
+    try:
+        db_task.deleted_at = None
+        _record(TASK_RESTORED, db_task, db)
+        db.commit()
+        db.refresh(db_task)
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail="An error occurred while restoring the task.") from e
+
+    return db_task
+
+def _get_subtask(db_task: TaskModel, subtask_id: str) -> Subtask:
+    for subtask in db_task.subtasks:
+        if subtask.id == subtask_id:
+            return subtask
+    raise HTTPException(status_code=404, detail="Subtask not found")
+
+def _save_subtasks(db_task: TaskModel, db: Session, action: str):
+    # Subtasks are part of their task: a change is an update of the task,
+    # for the outbox as well as for the streams (see events.tasks). Only flag
+    # an unchanged collection: flagging drops its pending history.
+    if not db.is_modified(db_task):
+        flag_modified(db_task, "subtasks")
+    try:
+        db.flush()
+        _record(TASK_UPDATED, db_task, db)
+        db.commit()
+        db.refresh(db_task)
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"An error occurred while {action} the subtask.") from e
+
+def add_subtask(task_id: str, subtask: SubtaskCreate, db: Session = Depends(get_db), user_id: Optional[str] = None):
+    db_task = _find_task(TaskModel, task_id, user_id, db, ListRole.EDITOR)
+    if db_task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    position = max((item.position for item in db_task.subtasks), default=-1) + 1
+    db_task.subtasks.append(Subtask(title=subtask.title, position=position, user_id=db_task.user_id))
+    _save_subtasks(db_task, db, "creating")
+    return db_task
+
+def update_subtask(task_id: str, subtask_id: str, subtask: SubtaskUpdate, db: Session = Depends(get_db), user_id: Optional[str] = None):
+    db_task = _find_task(TaskModel, task_id, user_id, db, ListRole.EDITOR)
+    if db_task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    db_subtask = _get_subtask(db_task, subtask_id)
+    for attr, value in subtask.model_dump(exclude_unset=True).items():
+        if value is not None:
+            setattr(db_subtask, attr, value)
+    _save_subtasks(db_task, db, "updating")
+    return db_task
+
+def delete_subtask(task_id: str, subtask_id: str, db: Session = Depends(get_db), user_id: Optional[str] = None):
+    db_task = _find_task(TaskModel, task_id, user_id, db, ListRole.EDITOR)
+    if db_task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    db_task.subtasks.remove(_get_subtask(db_task, subtask_id))
+    _save_subtasks(db_task, db, "deleting")
+    return db_task
+
+def materialize_recurring_task(definition: RecurringTask, until: datetime, db: Session = Depends(get_db)) -> int:
+    """
+    Create the tasks of a series' occurrences up to `until` that do not exist yet.
+
+    materialized_until is advanced with a compare-and-set in the same
+    transaction, so concurrent callers never insert the same occurrence twice.
+
+    :param definition: Series to extend.
+    :param until: Inclusive end of the window, naive UTC.
+    :param db: Database session.
+    :return: Number of tasks created.
+    """
+    previous = definition.materialized_until
+    if previous is not None and previous >= until:
+        return 0
+
+    rule = parse_rule(definition.rule)
+    # DATETIME columns may drop the microseconds the compare-and-set matches on
+    until = until.replace(microsecond=0)
+    try:
+        claimed = db.execute(
+            update(RecurringTask)
+            .where(
+                RecurringTask.id == definition.id,
+                RecurringTask.user_id == definition.user_id,
+                RecurringTask.materialized_until.is_(None)
+                if previous is None
+                else RecurringTask.materialized_until == previous,
+            )
+            .values(materialized_until=until)
+        ).rowcount
+        if not claimed:
+            db.rollback()
+            return 0
+
+        now = datetime.now(timezone.utc)
+        created = 0
+        for occurrence in occurrences(rule, definition.starts_at, previous, until):
+            db_task = TaskModel(
+                title=definition.title,
+                description=definition.description,
+                created_at=now,
+                priority=definition.priority,
+                deadline=occurrence,
+                user_id=definition.user_id,
+                recurring_task_id=definition.id,
+                subtasks=[],
+                tags=[],
+            )
+            db.add(db_task)
+            db.flush()
+            _record(TASK_CREATED, db_task, db)
+            created += 1
+        db.commit()
+    except IntegrityError:
+        # Another worker materialized the same window first
+        db.rollback()
+        return 0
+    return created
+
+def materialize_recurring_tasks(user_id: str, needed: datetime, target: datetime, db: Session = Depends(get_db)) -> int:
+    """
+    Make sure every series of a user is materialized up to `needed`.
+
+    Series behind are extended up to `target`, further ahead, so that
+    following calls find nothing to do.
+
+    :return: Number of tasks created.
+    """
+    behind = (
+        db.query(RecurringTask)
+        .filter(
+            RecurringTask.user_id == user_id,
+            or_(
+                RecurringTask.materialized_until.is_(None),
+                RecurringTask.materialized_until < needed,
+            ),
+        )
+        .all()
+    )
+    return sum(materialize_recurring_task(definition, max(needed, target), db) for definition in behind)
+
+def delete_future_occurrences(recurring_task_id: str, after: datetime, db: Session = Depends(get_db)) -> int:
+    """
+    Delete the occurrences of a series that are due after `after` and not started.
+
+    Leaves the transaction open for the caller to commit.
+
+    :return: Number of tasks deleted.
+    """
+    pending = (
+        db.query(TaskModel)
+        .filter(
+            TaskModel.recurring_task_id == recurring_task_id,
+            TaskModel.deadline > after,
+            TaskModel.status == TaskStatus.TODO,
+        )
+        .all()
+    )
+    for db_task in pending:
+        if TASK_SOFT_DELETE:
+            db_task.deleted_at = datetime.now(timezone.utc)
+        else:
+            db.delete(db_task)
+        _record(TASK_DELETED, db_task, db)
+    return len(pending)
@@ -0,0 +1,121 @@
+from datetime import datetime, timezone
+from typing import Dict
+
+from fastapi import Depends, HTTPException
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from db.database import get_db
+from db.ids import is_valid_task_id
+from models.task_list import ListRole, TaskList, TaskListMember
+from schemas.task_list import TaskListCreate
+
+# Roles of users in their lists, cached in session.info: there is one session
+# per request, so each request looks a user's memberships up at most once.
+_MEMBERSHIPS_KEY = "task_list_memberships"
+
+
+def get_memberships(user_id: str, db: Session = Depends(get_db)) -> Dict[str, ListRole]:
+    """
+    Get the lists a user is a member of, once per session.
+
+    :return: The user's role by list id.
+    """
+    cache = db.info.setdefault(_MEMBERSHIPS_KEY, {})
+    if user_id not in cache:
+        cache[user_id] = dict(
+            db.query(TaskListMember.list_id, TaskListMember.role)
+            .filter(TaskListMember.user_id == user_id)
+            .all()
+        )
+    return cache[user_id]
+
+def _forget_memberships(db: Session):
+    db.info.pop(_MEMBERSHIPS_KEY, None)
+
+def create_task_list(task_list: TaskListCreate, user_id: str, db: Session = Depends(get_db)):
+    db_task_list = TaskList(name=task_list.name, owner_id=user_id, created_at=datetime.now(timezone.utc))
+
+    try:
+        db.add(db_task_list)
+        db.flush()
+        db.add(TaskListMember(list_id=db_task_list.id, user_id=user_id, role=ListRole.OWNER))
+        db.commit()
+        db.refresh(db_task_list)
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail="An error occurred while creating the list.") from e
+    finally:
+        _forget_memberships(db)
+
+    return db_task_list, ListRole.OWNER
+
+def get_task_lists_by_user_id(user_id: str, db: Session = Depends(get_db)):
+    """
+    Get the lists of a user with the user's role in each.
+
+    :return: (TaskList, ListRole) pairs.
+    """
+    return (
+        db.query(TaskList, TaskListMember.role)
+        .join(TaskListMember, TaskListMember.list_id == TaskList.id)
+        .filter(TaskListMember.user_id == user_id)
+        .order_by(TaskList.created_at)
+        .all()
+    )
+
+def _owned_list(list_id: str, user_id: str, db: Session) -> TaskList:
+    role = get_memberships(user_id, db).get(list_id) if is_valid_task_id(list_id) else None
+    if role is None:
+        raise HTTPException(status_code=404, detail="List not found")
+    if role is not ListRole.OWNER:
+        raise HTTPException(status_code=403, detail="Only the owner can manage the members of a list")
+    return db.get(TaskList, list_id)
+
+def set_member(list_id: str, user_id: str, member_id: str, role: str, db: Session = Depends(get_db)):
+    """
+    Add a member to a list, or change the member's role.
+
+    :param user_id: User making the change, who must own the list.
+    :param member_id: User to add.
+    :param role: "editor" or "viewer".
+    """
+    task_list = _owned_list(list_id, user_id, db)
+    role = ListRole(role)
+    if role is ListRole.OWNER or member_id == task_list.owner_id:
+        raise HTTPException(status_code=422, detail="The owner of a list cannot be changed")
+
+    try:
+        member = db.get(TaskListMember, (list_id, member_id))
+        if member is None:
+            member = TaskListMember(list_id=list_id, user_id=member_id, role=role)
+            db.add(member)
+        else:
+            member.role = role
+        db.commit()
+        db.refresh(member)
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail="An error occurred while updating the list.") from e
+    finally:
+        _forget_memberships(db)
+
+    return member
+
+def remove_member(list_id: str, user_id: str, member_id: str, db: Session = Depends(get_db)):
+    task_list = _owned_list(list_id, user_id, db)
+    if member_id == task_list.owner_id:
+        raise HTTPException(status_code=422, detail="The owner of a list cannot be removed")
+
+    member = db.get(TaskListMember, (list_id, member_id))
+    if member is None:
+        raise HTTPException(status_code=404, detail="Member not found")
+
+    try:
+        db.delete(member)
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail="An error occurred while updating the list.") from e
+    finally:
+        _forget_memberships(db)
@@ -1,4 +1,10 @@
+from datetime import datetime, timezone
+
 from fastapi import Depends, HTTPException
+from sqlalchemy import func
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from db.database import get_db
@@ -22,8 +28,70 @@ def create_user(new_user: CreateUser, db: Session = Depends(get_db)):
     return db_user
 
 
+def _taken() -> HTTPException:
+    return HTTPException(status_code=409, detail="Username or email already belongs to another user")
+
+
+def upsert_user(new_user: CreateUser, db: Session = Depends(get_db)):
+    """
+    Insert the user, or refresh its attributes if it already exists, in one statement.
+
+    Uses INSERT ... ON CONFLICT (id) on SQLite and INSERT ... ON DUPLICATE KEY
+    UPDATE on MySQL, so concurrent sign-ins of the same user cannot race into a
+    unique-constraint error. Other dialects fall back to a merge.
+
+    Only a row with the same id is refreshed. ON DUPLICATE KEY UPDATE also
+    matches the other unique keys, so on MySQL each assignment keeps the stored
+    value unless the ids match, and the user is looked up afterwards.
+
+    :param new_user: User attributes from the identity provider.
+    :param db: Database session.
+
+    :raises HTTPException: 409 if the username or email belongs to another user.
+    """
+    values = {**new_user.model_dump(), "updated_at": datetime.now(timezone.utc)}
+    refreshed = ("given_name", "family_name", "username", "email", "updated_at")
+    dialect = db.get_bind().dialect.name
+
+    try:
+        if dialect == "mysql":
+            stmt = mysql_insert(UserModel).values(**values)
+            stmt = stmt.on_duplicate_key_update(
+                {
+                    column: func.if_(
+                        UserModel.id == stmt.inserted.id, stmt.inserted[column], UserModel.__table__.c[column]
+                    )
+                    for column in refreshed
+                }
+            )
+            db.execute(stmt)
+            if db.query(UserModel.id).filter(UserModel.id == new_user.id).first() is None:
+                # Matched another user's username or email, and left it as it was
+                db.rollback()
+                raise _taken()
+        elif dialect == "sqlite":
+            stmt = sqlite_insert(UserModel).values(**values)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[UserModel.id],
+                set_={column: stmt.excluded[column] for column in refreshed},
+            )
+            db.execute(stmt)
+        else:
+            db.merge(UserModel(**values))
+
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        raise _taken() from e
+
+
 def get_user_by_username(username: str, db: Session = Depends(get_db)):
-    user = db.query(UserModel).filter(UserModel.username == username).first()
+    user = (
+        db.query(UserModel)
+        .execution_options(use_replica=True)
+        .filter(UserModel.username == username)
+        .first()
+    )
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return user
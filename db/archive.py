@@ -0,0 +1,162 @@
+"""
+Hot/cold archival of completed tasks.
+
+Tasks that were completed (set to done) more than TASK_ARCHIVE_AFTER_DAYS ago
+are moved from tasks to tasks_archive, a compressed table indexed only by
+user_id, so the hot table every task list scans only holds live work. The
+default read paths of crud.task query the hot table; they read the archive
+too when called with include_archived=True (?include_archived=true on the
+API). Archived tasks are read-only.
+
+TaskArchiver moves TASK_ARCHIVE_BATCH_SIZE tasks per transaction (copy, then
+delete) every TASK_ARCHIVE_INTERVAL_SECONDS, pausing between batches.
+
+    python -m db.archive run              # archive everything due once
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Sequence
+
+from dotenv import load_dotenv
+from sqlalchemy import delete, insert, literal, select
+from sqlalchemy.engine import Engine
+
+from models.task import ArchivedTask
+from models.task import Task as TaskModel
+from models.task import TaskStatus
+from observability.metrics import REGISTRY, Counter
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+TASK_ARCHIVE_ENABLED = os.environ.get("TASK_ARCHIVE_ENABLED", "true").lower() == "true"
+TASK_ARCHIVE_AFTER_DAYS = float(os.environ.get("TASK_ARCHIVE_AFTER_DAYS", "30"))
+TASK_ARCHIVE_INTERVAL_SECONDS = float(os.environ.get("TASK_ARCHIVE_INTERVAL_SECONDS", "3600"))
+TASK_ARCHIVE_BATCH_SIZE = int(os.environ.get("TASK_ARCHIVE_BATCH_SIZE", "500"))
+TASK_ARCHIVE_PAUSE_SECONDS = float(os.environ.get("TASK_ARCHIVE_PAUSE_SECONDS", "0.5"))
+
+TASKS_ARCHIVED = REGISTRY.register(
+    Counter("tasks_archived_total", "Completed tasks moved to the archive table.")
+)
+
+# Columns shared by both tables, in the order of the archive table
+_COLUMNS = [column.name for column in ArchivedTask.__table__.columns if column.name != "archived_at"]
+
+
+def archive(
+    engine: Engine,
+    age: timedelta = timedelta(days=TASK_ARCHIVE_AFTER_DAYS),
+    batch_size: int = TASK_ARCHIVE_BATCH_SIZE,
+    pause: float = TASK_ARCHIVE_PAUSE_SECONDS,
+    stop: Optional[threading.Event] = None,
+) -> int:
+    """
+    Move the completed tasks older than `age` of one database to its archive.
+
+    :param engine: Database holding the tasks and tasks_archive tables.
+    :param age: Minimum time since completion of the tasks to archive.
+    :param batch_size: Tasks moved per transaction.
+    :param pause: Seconds to wait between batches.
+    :param stop: Interrupts the job between batches once set.
+    :return: Number of tasks archived.
+    """
+    tasks = TaskModel.__table__
+    archived_tasks = ArchivedTask.__table__
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    cutoff = now - age
+    moved = 0
+    while stop is None or not stop.is_set():
+        with engine.begin() as conn:
+            ids = conn.execute(
+                select(tasks.c.id)
+                .where(
+                    tasks.c.status == TaskStatus.DONE,
+                    tasks.c.completed_at < cutoff,
+                    tasks.c.deleted_at.is_(None),
+                )
+                .limit(batch_size)
+            ).scalars().all()
+            if ids:
+                conn.execute(
+                    insert(archived_tasks).from_select(
+                        [*_COLUMNS, "archived_at"],
+                        select(
+                            *[tasks.c[name] for name in _COLUMNS],
+                            literal(now, archived_tasks.c.archived_at.type),
+                        ).where(tasks.c.id.in_(ids)),
+                    )
+                )
+                conn.execute(delete(tasks).where(tasks.c.id.in_(ids)))
+        moved += len(ids)
+        TASKS_ARCHIVED.inc(amount=len(ids))
+        if len(ids) < batch_size:
+            break
+        if stop is not None:
+            stop.wait(pause)
+        else:
+            time.sleep(pause)
+    if moved:
+        logger.info("Archived %d completed tasks", moved)
+    return moved
+
+
+class TaskArchiver:
+    """
+    Background thread archiving completed tasks every TASK_ARCHIVE_INTERVAL_SECONDS.
+    """
+
+    def __init__(self, engines: Sequence[Engine], interval: float = TASK_ARCHIVE_INTERVAL_SECONDS):
+        self.engines: List[Engine] = list(engines)
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> int:
+        moved = 0
+        for engine in self.engines:
+            try:
+                moved += archive(engine, stop=self._stop)
+            except Exception:
+                logger.warning("Could not archive the tasks of %s", engine.url, exc_info=True)
+        return moved
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="task-archive", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.run_once()
+
+
+def main(argv=None):
+    from db.database import engine, shards
+
+    parser = argparse.ArgumentParser(description="Archive completed tasks")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="Archive every task due once")
+    run.add_argument("--after-days", type=float, default=TASK_ARCHIVE_AFTER_DAYS)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    age = timedelta(days=args.after_days)
+    print(sum(archive(database, age) for database in [engine, *shards.engines]))
+
+
+if __name__ == "__main__":
+    main()
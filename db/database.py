@@ -1,9 +1,13 @@
 import os
 
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 
+from db.replicas import ReplicaPool, RoutingSession
+from db.sharding import ShardSet
+
 load_dotenv()
 
 MYSQL_DATABASE = os.environ.get("MYSQL_DATABASE")
@@ -15,8 +19,34 @@ SQLALCHEMY_DATABASE_URL = os.environ.get(
     f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}/{MYSQL_DATABASE}",
 )
 
+# Connections each engine opens at startup, so the first requests of a new
+# worker do not pay for the TCP and authentication handshakes
+DB_WARM_CONNECTIONS = int(os.environ.get("DB_WARM_CONNECTIONS", "2"))
+
+# Comma-separated URLs of read replicas; see db.replicas for what is routed there
+REPLICA_URLS = [url for url in os.environ.get("REPLICA_URLS", "").split(",") if url]
+REPLICA_HEALTH_INTERVAL_SECONDS = float(os.environ.get("REPLICA_HEALTH_INTERVAL_SECONDS", "5"))
+
+# Comma-separated URLs of the task shards; see db.sharding
+SHARD_URLS = [url for url in os.environ.get("SHARD_URLS", "").split(",") if url]
+
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+replicas = ReplicaPool(
+    [create_engine(url, pool_pre_ping=True) for url in REPLICA_URLS],
+    health_interval=REPLICA_HEALTH_INTERVAL_SECONDS,
+)
+shards = ShardSet(engine, SHARD_URLS)
+if shards:
+    # Replica routing does not apply to sharded sessions
+    SessionLocal = shards.sessionmaker(autocommit=False, autoflush=False)
+else:
+    SessionLocal = sessionmaker(
+        class_=RoutingSession,
+        autocommit=False,
+        autoflush=False,
+        bind=engine,
+        replicas=replicas,
+    )
 
 Base = declarative_base()
 
@@ -26,4 +56,29 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def get_sessionmaker() -> sessionmaker:
+    """
+    Get the factory of sessions, for work done outside of the request's session.
+    """
+    return SessionLocal
+
+
+def warm_pool(engine: Engine, connections: int = DB_WARM_CONNECTIONS):
+    """
+    Open connections and return them to the pool.
+
+    :param engine: Engine whose pool to fill.
+    :param connections: Number of connections to open.
+    """
+    opened = []
+    try:
+        for _ in range(connections):
+            conn = engine.connect()
+            opened.append(conn)
+            conn.execute(text("SELECT 1"))
+    finally:
+        for conn in opened:
+            conn.close()
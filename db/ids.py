@@ -0,0 +1,96 @@
+import os
+import secrets
+import time
+import uuid
+
+from dotenv import load_dotenv
+from sqlalchemy import BINARY, String
+from sqlalchemy.types import TypeDecorator
+
+load_dotenv()
+
+# "string" keeps the legacy layout (random uuid4 in a VARCHAR(36) column),
+# "binary" stores time-ordered uuid7 values in a BINARY(16) column.
+TASK_ID_LAYOUT = os.environ.get("TASK_ID_LAYOUT", "string").lower()
+TASK_ID_BINARY = TASK_ID_LAYOUT == "binary"
+
+
+def uuid7() -> uuid.UUID:
+    """
+    Generate a time-ordered UUID (version 7, RFC 9562).
+
+    The first 48 bits hold the Unix timestamp in milliseconds, so consecutive
+    ids land next to each other in a clustered index instead of at random pages.
+
+    :return: A new UUID object.
+    """
+    timestamp_ms = time.time_ns() // 1_000_000
+    rand = int.from_bytes(secrets.token_bytes(10), "big")
+
+    value = (timestamp_ms & 0xFFFF_FFFF_FFFF) << 80
+    value |= 0x7 << 76  # version
+    value |= ((rand >> 62) & 0xFFF) << 64  # rand_a
+    value |= 0b10 << 62  # variant
+    value |= rand & 0x3FFF_FFFF_FFFF_FFFF  # rand_b
+
+    return uuid.UUID(int=value)
+
+
+def new_task_id() -> str:
+    """
+    Generate a new task id for the configured layout.
+
+    :return: The canonical string form of the id.
+    """
+    if TASK_ID_BINARY:
+        return str(uuid7())
+    return str(uuid.uuid4())
+
+
+def is_valid_task_id(task_id: str) -> bool:
+    """
+    Check if a task id received from the API can be bound to the id column.
+
+    :param task_id: Task id in string form.
+    :return: True if the id can be used in a query, otherwise False.
+    """
+    if not TASK_ID_BINARY:
+        return True
+    try:
+        uuid.UUID(task_id)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+class TaskId(TypeDecorator):
+    """
+    Column type for task ids.
+
+    The API always sees the canonical string form; depending on the layout the
+    database stores either that string or the raw 16 bytes of the UUID.
+    """
+
+    impl = String(36)
+    cache_ok = True
+
+    def __init__(self, binary: bool = TASK_ID_BINARY):
+        super().__init__()
+        self.binary = binary
+
+    def load_dialect_impl(self, dialect):
+        if self.binary:
+            return dialect.type_descriptor(BINARY(16))
+        return dialect.type_descriptor(String(36))
+
+    def process_bind_param(self, value, dialect):
+        if value is None or not self.binary:
+            return value
+        if isinstance(value, uuid.UUID):
+            return value.bytes
+        return uuid.UUID(str(value)).bytes
+
+    def process_result_value(self, value, dialect):
+        if value is None or not self.binary:
+            return value
+        return str(uuid.UUID(bytes=bytes(value)))
@@ -0,0 +1,221 @@
+"""
+Schema migrations.
+
+    python -m db.migrate upgrade            # apply every pending migration
+    python -m db.migrate downgrade -1       # revert the last migration
+    python -m db.migrate current            # print the revision of the database
+    python -m db.migrate check              # exit 1 if a database is behind
+    python -m db.migrate stamp 0001         # adopt a database built by create_all
+    python -m db.migrate revision -m "..."  # autogenerate a new migration
+
+upgrade and check also cover every task shard of SHARD_URLS (see db.sharding).
+The same revisions run on the shards, which only get the sharded tables and no
+foreign keys (see on_shard); --url with --shard targets a single shard.
+
+The application itself never runs DDL on startup; it only compares the stored
+revision of every database with the head revision (see ensure_schema_current).
+"""
+import argparse
+import logging
+import os
+import sys
+from functools import lru_cache
+from typing import Iterable, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ALEMBIC_INI = os.path.join(ROOT_DIR, "alembic.ini")
+
+# Run pending migrations on startup instead of refusing to start. Only meant for
+# local development and single-process deployments.
+DB_AUTO_MIGRATE = os.environ.get("DB_AUTO_MIGRATE", "false").lower() == "true"
+
+
+class SchemaOutOfDateError(RuntimeError):
+    pass
+
+
+def alembic_config(url: Optional[str] = None, shard: bool = False):
+    """
+    Build the Alembic configuration for this repository.
+
+    :param url: Database URL, defaults to the one of db.database.
+    :param shard: The database is a task shard.
+    :return: Alembic Config object.
+    """
+    from alembic.config import Config
+
+    config = Config(ALEMBIC_INI)
+    if url is not None:
+        config.set_main_option("sqlalchemy.url", url.replace("%", "%%"))
+    config.attributes["shard"] = shard
+    return config
+
+
+def on_shard() -> bool:
+    """
+    Tell a running migration whether its database is a task shard.
+
+    Shards only hold the sharded tables (see db.sharding.SHARDED_TABLES), and
+    no foreign keys since the tables they would reference are elsewhere.
+    """
+    from alembic import context
+
+    return context.config.attributes.get("shard", False)
+
+
+def foreign_keys(*constraints):
+    """
+    Foreign key constraints of a table created by a migration, none on shards.
+    """
+    return () if on_shard() else constraints
+
+
+@lru_cache(maxsize=1)
+def head_revision() -> str:
+    """
+    Get the newest revision in the migrations directory.
+
+    :return: Head revision id.
+    """
+    from alembic.script import ScriptDirectory
+
+    return ScriptDirectory.from_config(alembic_config()).get_current_head()
+
+
+def current_revision(engine: Engine) -> Optional[str]:
+    """
+    Read the revision stored in the database with a single query.
+
+    :param engine: Engine connected to the database.
+    :return: Stored revision, or None if the database was never migrated.
+    """
+    try:
+        with engine.connect() as conn:
+            return conn.execute(
+                text("SELECT version_num FROM alembic_version")
+            ).scalar()
+    except DBAPIError:
+        # Only a missing alembic_version table means "never migrated"
+        if inspect(engine).has_table("alembic_version"):
+            raise
+        return None
+
+
+def upgrade(engine: Engine, revision: str = "head", shard: bool = False):
+    """
+    Apply migrations up to the given revision.
+
+    :param engine: Engine connected to the database.
+    :param revision: Target revision.
+    :param shard: The database is a task shard.
+    """
+    from alembic import command
+
+    config = alembic_config(shard=shard)
+    with engine.begin() as conn:
+        config.attributes["connection"] = conn
+        config.attributes["configure_logger"] = False
+        command.upgrade(config, revision)
+
+
+def ensure_schema_current(engine: Engine, shards: Iterable[Engine] = ()):
+    """
+    Check on startup that the database and every shard are at the head revision.
+
+    :param engine: Engine connected to the main database.
+    :param shards: Engines connected to the task shards.
+
+    :raises SchemaOutOfDateError: If a database is behind and DB_AUTO_MIGRATE is off.
+    """
+    head = head_revision()
+    for database, shard in [(engine, False), *((shard_engine, True) for shard_engine in shards)]:
+        current = current_revision(database)
+        if current == head:
+            continue
+
+        if DB_AUTO_MIGRATE:
+            logger.info("Migrating %s from %s to %s", database.url, current, head)
+            upgrade(database, shard=shard)
+            continue
+
+        raise SchemaOutOfDateError(
+            f"Schema of {database.url!r} is at revision {current}, expected {head}. "
+            "Run `python -m db.migrate upgrade`."
+        )
+
+
+def main(argv=None):
+    from alembic import command
+
+    parser = argparse.ArgumentParser(description="Database schema migrations")
+    parser.add_argument("--url", help="Database URL (defaults to MYSQL_URL and SHARD_URLS)")
+    parser.add_argument("--shard", action="store_true", help="The --url database is a task shard")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    upgrade_parser = subparsers.add_parser("upgrade")
+    upgrade_parser.add_argument("revision", nargs="?", default="head")
+    upgrade_parser.add_argument("--sql", action="store_true", help="Print SQL only")
+
+    downgrade_parser = subparsers.add_parser("downgrade")
+    downgrade_parser.add_argument("revision")
+    downgrade_parser.add_argument("--sql", action="store_true", help="Print SQL only")
+
+    stamp_parser = subparsers.add_parser("stamp")
+    stamp_parser.add_argument("revision")
+
+    revision_parser = subparsers.add_parser("revision")
+    revision_parser.add_argument("-m", "--message", required=True)
+    revision_parser.add_argument("--empty", action="store_true")
+
+    subparsers.add_parser("current")
+    subparsers.add_parser("check")
+    subparsers.add_parser("history")
+
+    args = parser.parse_args(argv)
+    config = alembic_config(args.url, shard=args.shard)
+    # Without --url, upgrade and check go over the shards too
+    shard_urls = []
+    if args.url is None:
+        from db.database import SHARD_URLS as shard_urls
+
+    if args.command == "upgrade":
+        command.upgrade(config, args.revision, sql=args.sql)
+        for url in shard_urls:
+            command.upgrade(alembic_config(url, shard=True), args.revision, sql=args.sql)
+    elif args.command == "downgrade":
+        command.downgrade(config, args.revision, sql=args.sql)
+    elif args.command == "stamp":
+        command.stamp(config, args.revision)
+    elif args.command == "revision":
+        command.revision(config, message=args.message, autogenerate=not args.empty)
+    elif args.command == "current":
+        command.current(config, verbose=True)
+    elif args.command == "history":
+        command.history(config)
+    elif args.command == "check":
+        from sqlalchemy import create_engine
+
+        from db.database import SQLALCHEMY_DATABASE_URL
+
+        behind = False
+        for url in [args.url or SQLALCHEMY_DATABASE_URL, *shard_urls]:
+            engine = create_engine(url)
+            current = current_revision(engine)
+            print(f"{engine.url}: {current}, head: {head_revision()}")
+            engine.dispose()
+            behind = behind or current != head_revision()
+        if behind:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Convert the task id columns between the VARCHAR(36) and BINARY(16) layouts.
+
+Every column holding a task id (the ids of tasks, archived tasks, recurring
+tasks, subtasks, tags and lists, and the columns referencing them) is
+converted in place, table by table: indexes, unique and foreign key
+constraints are kept. Migration 0010 brings a database to the layout of
+TASK_ID_LAYOUT; to switch the layout of a database already at that revision:
+
+    TASK_ID_LAYOUT=binary python -m db.migrate_task_ids
+
+Existing ids keep their value (the API still returns the same string), only the
+storage changes. New rows get time-ordered uuid7 ids once the application runs
+with TASK_ID_LAYOUT=binary. Run it with the API stopped: the tables are
+rewritten while it runs.
+"""
+import argparse
+import logging
+import uuid
+from typing import Dict, Tuple
+
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import VARBINARY, String, inspect
+from sqlalchemy.engine import Engine
+
+from db.ids import TASK_ID_BINARY, TaskId
+
+logger = logging.getLogger(__name__)
+
+# Columns of type TaskId, by table; new ones must be added here to be converted
+TASK_ID_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    "tasks": ("id", "recurring_task_id", "list_id"),
+    "tasks_archive": ("id", "list_id"),
+    "recurring_tasks": ("id",),
+    "subtasks": ("id", "task_id"),
+    "tags": ("id",),
+    "task_tags": ("task_id", "tag_id"),
+    "task_lists": ("id",),
+    "task_list_members": ("list_id",),
+    "idempotency_keys": ("task_id",),
+}
+
+
+def _uuid_to_bin(value):
+    return None if value is None else uuid.UUID(value).bytes
+
+
+def _bin_to_uuid(value):
+    return None if value is None else str(uuid.UUID(bytes=bytes(value)))
+
+
+def convert_task_ids(op: Operations, binary: bool) -> int:
+    """
+    Convert every task id column not in the given layout yet.
+
+    Columns of tables or revisions the database does not have are skipped.
+
+    :param op: Alembic operations bound to the connection to the database.
+    :param binary: Convert to BINARY(16) if True, to VARCHAR(36) otherwise.
+    :return: Number of columns converted.
+    """
+    conn = op.get_bind()
+    mysql = conn.dialect.name == "mysql"
+    if conn.dialect.name == "sqlite":
+        # MySQL 8 has both functions built in
+        driver = conn.connection.driver_connection
+        driver.create_function("UUID_TO_BIN", 1, _uuid_to_bin, deterministic=True)
+        driver.create_function("BIN_TO_UUID", 1, _bin_to_uuid, deterministic=True)
+    elif mysql:
+        # Referencing and referenced columns differ until both are converted
+        op.execute("SET FOREIGN_KEY_CHECKS = 0")
+
+    inspector = inspect(conn)
+    tables = set(inspector.get_table_names())
+    converted = 0
+    for table, names in TASK_ID_COLUMNS.items():
+        if table not in tables:
+            continue
+        columns = {
+            column["name"]: column["nullable"]
+            for column in inspector.get_columns(table)
+            # SQLite reflects BINARY(16) as NUMERIC, so check for strings
+            if column["name"] in names and isinstance(column["type"], String) == binary
+        }
+        if not columns:
+            continue
+
+        if mysql:
+            # Bytes, not characters, while the values change form
+            for name, nullable in columns.items():
+                op.alter_column(table, name, type_=VARBINARY(36), existing_nullable=nullable)
+        function = "UUID_TO_BIN" if binary else "BIN_TO_UUID"
+        op.execute(
+            f"UPDATE {table} SET "
+            + ", ".join(f"{name} = {function}({name})" for name in columns)
+        )
+        # Rebuilt with its indexes and constraints on SQLite, altered on MySQL
+        with op.batch_alter_table(table) as batch_op:
+            for name, nullable in columns.items():
+                batch_op.alter_column(name, type_=TaskId(binary=binary), existing_nullable=nullable)
+
+        converted += len(columns)
+        logger.info("Converted %s of %s", ", ".join(columns), table)
+
+    if mysql:
+        op.execute("SET FOREIGN_KEY_CHECKS = 1")
+    return converted
+
+
+def is_binary_layout(engine: Engine) -> bool:
+    """
+    Check if the tasks table already stores binary ids.
+
+    :param engine: Engine connected to the database to inspect.
+    :return: True if the id column no longer holds strings, otherwise False.
+    """
+    for column in inspect(engine).get_columns("tasks"):
+        if column["name"] == "id":
+            return not isinstance(column["type"], String)
+    return False
+
+
+def convert(engine: Engine, binary: bool = TASK_ID_BINARY) -> int:
+    """
+    Convert the task id columns of a database to a layout.
+
+    :param engine: Engine connected to the database to convert.
+    :param binary: Convert to BINARY(16) if True, to VARCHAR(36) otherwise.
+    :return: Number of columns converted.
+    """
+    with engine.begin() as conn:
+        return convert_task_ids(Operations(MigrationContext.configure(conn)), binary)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.parse_args(argv)
+
+    from db.database import engine
+
+    logging.basicConfig(level=logging.INFO)
+    convert(engine)
+
+
+if __name__ == "__main__":
+    main()
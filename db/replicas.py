@@ -0,0 +1,141 @@
+"""
+Read replica routing.
+
+Statements marked with the `use_replica` execution option, e.g.
+
+    db.query(TaskModel).execution_options(use_replica=True).filter(...)
+
+are sent by RoutingSession to one of the replica engines, round-robin over
+the replicas that passed their last health check. Everything else, and every
+read issued after the session has written (flush, INSERT/UPDATE/DELETE), goes
+to the primary so a request always reads its own writes. Sessions live for one
+request (see db.database.get_db), so that stickiness is per request.
+
+A replica is taken out of rotation when a statement on it fails to connect or
+when the background health check (SELECT 1 every REPLICA_HEALTH_INTERVAL_SECONDS)
+fails, and put back once a check succeeds. With no healthy replica, reads fall
+back to the primary.
+"""
+import itertools
+import logging
+import threading
+from typing import List, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicaPool:
+    def __init__(self, engines: List[Engine], health_interval: float = 5.0):
+        self.engines = list(engines)
+        self.health_interval = health_interval
+        self._healthy = {id(engine): True for engine in self.engines}
+        self._cycle = itertools.cycle(self.engines)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        for engine in self.engines:
+            event.listen(engine, "handle_error", self._on_error(engine))
+
+    def __bool__(self) -> bool:
+        return bool(self.engines)
+
+    def _on_error(self, engine: Engine):
+        def handle_error(context):
+            if context.is_disconnect or context.connection is None:
+                self.mark(engine, False)
+
+        return handle_error
+
+    def mark(self, engine: Engine, healthy: bool):
+        if self._healthy.get(id(engine)) != healthy:
+            logger.warning(
+                "Replica %s is %s",
+                engine.url.render_as_string(hide_password=True),
+                "back in rotation" if healthy else "out of rotation",
+            )
+        self._healthy[id(engine)] = healthy
+
+    def is_healthy(self, engine: Engine) -> bool:
+        return self._healthy.get(id(engine), False)
+
+    def choose(self) -> Optional[Engine]:
+        """
+        Get the next healthy replica, round-robin.
+
+        :return: A replica engine, or None if none is healthy.
+        """
+        with self._lock:
+            for _ in range(len(self.engines)):
+                engine = next(self._cycle)
+                if self._healthy[id(engine)]:
+                    return engine
+        return None
+
+    def check_health(self):
+        """
+        Ping every replica and update its place in the rotation.
+        """
+        for engine in self.engines:
+            try:
+                with engine.connect() as conn:
+                    conn.execute(text("SELECT 1"))
+            except DBAPIError:
+                self.mark(engine, False)
+            else:
+                self.mark(engine, True)
+
+    def start(self):
+        """
+        Start the background health checks.
+        """
+        if not self.engines or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="replica-health", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.health_interval):
+            self.check_health()
+
+
+class RoutingSession(Session):
+    """
+    Session sending replica-safe reads to a ReplicaPool and everything else to the primary.
+    """
+
+    def __init__(self, *args, replicas: Optional[ReplicaPool] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replicas = replicas
+
+    @property
+    def has_written(self) -> bool:
+        return self.info.get("has_written", False)
+
+    def get_bind(self, mapper=None, *, clause=None, **kwargs):
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.info["has_written"] = True
+        elif (
+            self.replicas
+            and not self.has_written
+            and clause is not None
+            and clause.get_execution_options().get("use_replica")
+        ):
+            replica = self.replicas.choose()
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper, clause=clause, **kwargs)
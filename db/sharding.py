@@ -0,0 +1,410 @@
+"""
+Horizontal sharding of tasks by user_id.
+
+With SHARD_URLS set, the tasks table lives on N shard databases, each with its
+own engine and connection pool, while users stay in the main database. A
+user's tasks all live on one shard, picked by jump consistent hashing of the
+user id, so growing from N to N+1 shards only moves about 1/(N+1) of the users.
+
+SessionLocal then builds a ShardedSession (sqlalchemy.ext.horizontal_shard):
+
+- new tasks are written to their user's shard,
+- task queries filtering on user_id go to that shard only,
+- other task queries (by id, by status) run on every shard and merge results;
+  ShardSet.fan_out runs such reads on all shards in parallel,
+- everything else goes to the main database.
+
+The task archive (see db.archive), recurring task definitions and the outbox
+(see events.outbox) are sharded the same way, so they stay next to the tasks
+they relate to. Shards hold no user table, so their
+tasks table has no foreign key to it. The migrations of db.migrate run on every
+shard too, skipping the tables that stay in the main database:
+
+    python -m db.sharding init                 # migrate every shard to the head revision
+    python -m db.sharding locate USER_ID       # print the shard of a user
+    python -m db.sharding rebalance --source-urls sqlite:///old.db
+                                               # move users' rows to their shard
+
+rebalance reads every sharded table from the source databases (the main
+database when introducing sharding, or the previous SHARD_URLS when adding
+shards) and moves the rows whose user now hashes elsewhere: tasks with their
+subtasks and tag links, tags, archived tasks, recurring task definitions,
+idempotency keys and pending outbox events. It copies before deleting and
+skips rows already present on the target, so it can be stopped and re-run.
+Outbox events get a new id on their shard, so an interrupted run may leave an
+event on both databases and deliver it twice, which the at-least-once outbox
+allows for.
+"""
+import argparse
+import hashlib
+import logging
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, TypeVar
+
+from dotenv import load_dotenv
+from sqlalchemy import (Column, Index, MetaData, Table, create_engine, delete,
+                        insert, select, tuple_)
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql import operators, visitors
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+SHARD_POOL_SIZE = int(os.environ.get("SHARD_POOL_SIZE", "5"))
+SHARD_MAX_OVERFLOW = int(os.environ.get("SHARD_MAX_OVERFLOW", "10"))
+
+PRIMARY = "primary"
+TASKS_TABLE = "tasks"
+ARCHIVE_TABLE = "tasks_archive"
+RECURRING_TABLE = "recurring_tasks"
+OUTBOX_TABLE = "outbox"
+SUBTASKS_TABLE = "subtasks"
+TAGS_TABLE = "tags"
+TASK_TAGS_TABLE = "task_tags"
+IDEMPOTENCY_KEYS_TABLE = "idempotency_keys"
+SHARDED_TABLES = (
+    TASKS_TABLE,
+    ARCHIVE_TABLE,
+    RECURRING_TABLE,
+    OUTBOX_TABLE,
+    SUBTASKS_TABLE,
+    TAGS_TABLE,
+    TASK_TAGS_TABLE,
+    IDEMPOTENCY_KEYS_TABLE,
+)
+# The order rebalance moves the sharded tables in, each before the tables it
+# references: the main database has foreign keys between them (task_tags to
+# tags), so a row can only be deleted once nothing on its source points to it
+REBALANCE_ORDER = (
+    TASK_TAGS_TABLE,
+    TAGS_TABLE,
+    SUBTASKS_TABLE,
+    TASKS_TABLE,
+    ARCHIVE_TABLE,
+    RECURRING_TABLE,
+    IDEMPOTENCY_KEYS_TABLE,
+    OUTBOX_TABLE,
+)
+
+T = TypeVar("T")
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    """
+    Jump consistent hash (Lamping & Veach).
+
+    :param key: 64-bit key.
+    :param buckets: Number of buckets.
+    :return: Bucket between 0 and buckets - 1.
+    """
+    b, j = -1, 0
+    while j < buckets:
+        b = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((b + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return b
+
+
+def shard_index(user_id: str, shards: int) -> int:
+    """
+    Get the shard of a user.
+
+    :param user_id: Id of the user owning the tasks.
+    :param shards: Number of shards.
+    :return: Index into SHARD_URLS.
+    """
+    digest = hashlib.blake2b(user_id.encode(), digest_size=8).digest()
+    return jump_hash(int.from_bytes(digest, "big"), shards)
+
+
+def shard_tables() -> MetaData:
+    """
+    Build the schema of a shard: the sharded tables without foreign keys, as
+    the migrations create it there.
+    """
+    from models.idempotency_key import IdempotencyKey
+    from models.outbox import OutboxEvent
+    from models.recurring_task import RecurringTask
+    from models.tag import Tag, TaskTag
+    from models.task import ArchivedTask, Subtask
+    from models.task import Task as TaskModel
+
+    metadata = MetaData()
+    sources = (
+        TaskModel,
+        ArchivedTask,
+        RecurringTask,
+        OutboxEvent,
+        Subtask,
+        Tag,
+        TaskTag,
+        IdempotencyKey,
+    )
+    for source in (model.__table__ for model in sources):
+        table = Table(
+            source.name,
+            metadata,
+            *[
+                Column(
+                    column.name,
+                    column.type,
+                    primary_key=column.primary_key,
+                    nullable=column.nullable,
+                    server_default=column.server_default,
+                    autoincrement=column.autoincrement,
+                )
+                for column in source.columns
+            ],
+            **source.kwargs,
+        )
+        for index in source.indexes:
+            Index(index.name, *[table.c[c.name] for c in index.columns], unique=index.unique)
+    return metadata
+
+
+def _user_ids(statement) -> List[str]:
+    """
+    Get the user ids a statement is restricted to by `<table>.user_id = :value`.
+    """
+    where = getattr(statement, "whereclause", None)
+    if where is None:
+        return []
+    user_ids = []
+    for element in visitors.iterate(where):
+        if (
+            isinstance(element, BinaryExpression)
+            and element.operator is operators.eq
+            and getattr(element.left, "key", None) == "user_id"
+            and getattr(getattr(element.left, "table", None), "name", None) in SHARDED_TABLES
+            and isinstance(element.right, BindParameter)
+        ):
+            user_ids.append(element.right.effective_value)
+    return user_ids
+
+
+def _is_sharded_table(mapper) -> bool:
+    return mapper is not None and mapper.local_table.name in SHARDED_TABLES
+
+
+class ShardSet:
+    def __init__(self, primary: Engine, urls: List[str]):
+        self.primary = primary
+        self.engines = [
+            create_engine(
+                url,
+                pool_pre_ping=True,
+                pool_size=SHARD_POOL_SIZE,
+                max_overflow=SHARD_MAX_OVERFLOW,
+            )
+            for url in urls
+        ]
+        self.ids = [f"tasks-{i}" for i in range(len(self.engines))]
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def __bool__(self) -> bool:
+        return bool(self.engines)
+
+    def shard_id(self, user_id: str) -> str:
+        return self.ids[shard_index(user_id, len(self.ids))]
+
+    def engine_for(self, user_id: str) -> Engine:
+        return self.engines[shard_index(user_id, len(self.engines))]
+
+    def _shard_chooser(self, mapper, instance, clause=None, **kw):
+        if _is_sharded_table(mapper):
+            if instance is not None and instance.user_id is not None:
+                return self.shard_id(instance.user_id)
+        return PRIMARY
+
+    def _identity_chooser(self, mapper, primary_key, **kw):
+        if _is_sharded_table(mapper):
+            return self.ids
+        return [PRIMARY]
+
+    def _execute_chooser(self, orm_context):
+        mapper = orm_context.bind_mapper
+        if not _is_sharded_table(mapper):
+            return [PRIMARY]
+        user_ids = _user_ids(orm_context.statement)
+        if user_ids:
+            return sorted({self.shard_id(user_id) for user_id in user_ids})
+        return self.ids
+
+    def sessionmaker(self, **kwargs) -> sessionmaker:
+        """
+        Build a factory of ShardedSessions over the main database and the shards.
+        """
+        return sessionmaker(
+            class_=ShardedSession,
+            shards={PRIMARY: self.primary, **dict(zip(self.ids, self.engines))},
+            shard_chooser=self._shard_chooser,
+            identity_chooser=self._identity_chooser,
+            execute_chooser=self._execute_chooser,
+            **kwargs,
+        )
+
+    def fan_out(self, func: Callable[[Session], T]) -> List[T]:
+        """
+        Run a read on every shard in parallel, each in its own session.
+
+        The returned objects are detached; only use it for reads.
+
+        :param func: Called with a session bound to one shard.
+        :return: The results, in shard order.
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=len(self.engines), thread_name_prefix="shard"
+                )
+
+        def run(engine):
+            with Session(bind=engine) as session:
+                return func(session)
+
+        return list(self._executor.map(run, self.engines))
+
+    def upgrade(self, revision: str = "head"):
+        """
+        Run the migrations on every shard, see db.migrate.
+        """
+        from db.migrate import upgrade
+
+        for engine in self.engines:
+            upgrade(engine, revision, shard=True)
+
+    def dispose(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        for engine in self.engines:
+            engine.dispose()
+
+
+def is_sharded(db: Session) -> bool:
+    return isinstance(db, ShardedSession)
+
+
+def _key_in(key: List[Column], values: List[tuple]):
+    if len(key) == 1:
+        return key[0].in_([value[0] for value in values])
+    return tuple_(*key).in_(values)
+
+
+def _after(key: List[Column], last: tuple):
+    if len(key) == 1:
+        return key[0] > last[0]
+    return tuple_(*key) > tuple_(*last)
+
+
+def _move_rows(table: Table, source: Engine, shards: ShardSet, batch_size: int, moved: Dict[str, int]):
+    key = list(table.primary_key.columns)
+    # Numbered by each database, so given a new number on the target
+    renumbered = {column.name for column in key if column.autoincrement is True}
+    last = None
+    while True:
+        with source.connect() as conn:
+            query = select(table).order_by(*key).limit(batch_size)
+            if last is not None:
+                query = query.where(_after(key, last))
+            rows = [dict(row) for row in conn.execute(query).mappings()]
+        if not rows:
+            return
+        last = tuple(rows[-1][column.name] for column in key)
+
+        by_target: Dict[int, List[dict]] = {}
+        for row in rows:
+            index = shard_index(row["user_id"], len(shards.engines))
+            if shards.engines[index].url != source.url:
+                by_target.setdefault(index, []).append(row)
+
+        for index, batch in by_target.items():
+            keys = [tuple(row[column.name] for column in key) for row in batch]
+            with shards.engines[index].begin() as conn:
+                if renumbered:
+                    missing = [
+                        {name: value for name, value in row.items() if name not in renumbered}
+                        for row in batch
+                    ]
+                else:
+                    present = {tuple(row) for row in conn.execute(select(*key).where(_key_in(key, keys)))}
+                    missing = [row for row, row_key in zip(batch, keys) if row_key not in present]
+                if missing:
+                    conn.execute(insert(table), missing)
+            with source.begin() as conn:
+                conn.execute(delete(table).where(_key_in(key, keys)))
+            moved[shards.ids[index]] += len(batch)
+            logger.info("Moved %d rows of %s to %s", len(batch), table.name, shards.ids[index])
+
+
+def rebalance(
+    sources: Iterable[Engine],
+    shards: ShardSet,
+    batch_size: int = 1000,
+) -> Dict[str, int]:
+    """
+    Move the rows of every sharded table to the shard their user hashes to.
+
+    :param sources: Databases currently holding sharded rows; may include the shards.
+    :param shards: Target shard set.
+    :param batch_size: Rows read, copied and deleted per transaction.
+    :return: Number of rows moved into each shard.
+    """
+    tables = shard_tables().tables
+    moved = {shard_id: 0 for shard_id in shards.ids}
+
+    for source in sources:
+        for name in REBALANCE_ORDER:
+            _move_rows(tables[name], source, shards, batch_size, moved)
+
+    return moved
+
+
+def main(argv=None):
+    from db.database import SHARD_URLS, engine
+
+    parser = argparse.ArgumentParser(description="Task shard administration")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("init", help="Migrate every shard to the head revision")
+    locate = commands.add_parser("locate", help="Print the shard of a user")
+    locate.add_argument("user_id")
+    move = commands.add_parser("rebalance", help="Move users' rows to their shard")
+    move.add_argument(
+        "--source-urls",
+        help="Comma-separated databases to move rows out of "
+        "(default: the main database and every shard)",
+    )
+    move.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    if not SHARD_URLS:
+        sys.exit("SHARD_URLS is not set")
+
+    logging.basicConfig(level=logging.INFO)
+    shards = ShardSet(engine, SHARD_URLS)
+    try:
+        if args.command == "init":
+            shards.upgrade()
+        elif args.command == "locate":
+            index = shard_index(args.user_id, len(SHARD_URLS))
+            print(f"{shards.ids[index]} {SHARD_URLS[index]}")
+        elif args.command == "rebalance":
+            if args.source_urls:
+                sources = [create_engine(url) for url in args.source_urls.split(",")]
+            else:
+                sources = [engine, *shards.engines]
+            print(rebalance(sources, shards, args.batch_size))
+    finally:
+        shards.dispose()
+
+
+if __name__ == "__main__":
+    main()
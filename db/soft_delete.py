@@ -0,0 +1,170 @@
+"""
+Soft delete of tasks.
+
+With TASK_SOFT_DELETE on, crud.task.delete_task only sets tasks.deleted_at;
+the row stays as a tombstone that can be restored (POST /tasks/{id}/restore)
+for TASK_TOMBSTONE_RETENTION_HOURS. Every ORM SELECT of tasks gets a
+`deleted_at IS NULL` criterion added here, so tombstones are invisible to
+reads unless a query opts in with
+
+    db.query(TaskModel).execution_options(include_deleted=True)
+
+TaskPurger removes expired tombstones in the background, TASK_PURGE_BATCH_SIZE
+rows per transaction with TASK_PURGE_PAUSE_SECONDS between batches, so the
+purge never holds many row locks nor competes with requests for long.
+
+    python -m db.soft_delete purge         # purge expired tombstones once
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Sequence
+
+from dotenv import load_dotenv
+from sqlalchemy import delete, event, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import ORMExecuteState, Session, with_loader_criteria
+
+from models.tag import TaskTag
+from models.task import Subtask
+from models.task import Task as TaskModel
+from observability.metrics import REGISTRY, Counter
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+TASK_SOFT_DELETE = os.environ.get("TASK_SOFT_DELETE", "true").lower() == "true"
+TASK_TOMBSTONE_RETENTION_HOURS = float(os.environ.get("TASK_TOMBSTONE_RETENTION_HOURS", "168"))
+TASK_PURGE_ENABLED = os.environ.get("TASK_PURGE_ENABLED", "true").lower() == "true"
+TASK_PURGE_INTERVAL_SECONDS = float(os.environ.get("TASK_PURGE_INTERVAL_SECONDS", "300"))
+TASK_PURGE_BATCH_SIZE = int(os.environ.get("TASK_PURGE_BATCH_SIZE", "500"))
+TASK_PURGE_PAUSE_SECONDS = float(os.environ.get("TASK_PURGE_PAUSE_SECONDS", "0.5"))
+
+TASKS_PURGED = REGISTRY.register(
+    Counter("tasks_purged_total", "Soft-deleted tasks removed by the purge job.")
+)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _hide_deleted(orm_execute_state: ORMExecuteState):
+    if (
+        orm_execute_state.is_select
+        # Loading the attributes of an instance already in hand
+        and not orm_execute_state.is_column_load
+        and not orm_execute_state.is_relationship_load
+        and not orm_execute_state.execution_options.get("include_deleted", False)
+    ):
+        orm_execute_state.statement = orm_execute_state.statement.options(
+            with_loader_criteria(TaskModel, TaskModel.deleted_at.is_(None), include_aliases=True)
+        )
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def purge(
+    engine: Engine,
+    retention: timedelta = timedelta(hours=TASK_TOMBSTONE_RETENTION_HOURS),
+    batch_size: int = TASK_PURGE_BATCH_SIZE,
+    pause: float = TASK_PURGE_PAUSE_SECONDS,
+    stop: Optional[threading.Event] = None,
+) -> int:
+    """
+    Delete the tombstones older than `retention` from one database.
+
+    :param engine: Database holding the tasks and their subtasks and tags.
+    :param retention: How long deleted tasks stay restorable.
+    :param batch_size: Rows deleted per transaction.
+    :param pause: Seconds to wait between batches.
+    :param stop: Interrupts the purge between batches once set.
+    :return: Number of tasks deleted.
+    """
+    tasks = TaskModel.__table__
+    cutoff = _utcnow() - retention
+    purged = 0
+    while stop is None or not stop.is_set():
+        with engine.begin() as conn:
+            ids = conn.execute(
+                select(tasks.c.id)
+                .where(tasks.c.deleted_at.is_not(None), tasks.c.deleted_at < cutoff)
+                .limit(batch_size)
+            ).scalars().all()
+            if ids:
+                conn.execute(delete(Subtask.__table__).where(Subtask.__table__.c.task_id.in_(ids)))
+                conn.execute(delete(TaskTag.__table__).where(TaskTag.__table__.c.task_id.in_(ids)))
+                conn.execute(delete(tasks).where(tasks.c.id.in_(ids)))
+        purged += len(ids)
+        TASKS_PURGED.inc(amount=len(ids))
+        if len(ids) < batch_size:
+            break
+        if stop is not None:
+            stop.wait(pause)
+        else:
+            time.sleep(pause)
+    if purged:
+        logger.info("Purged %d deleted tasks", purged)
+    return purged
+
+
+class TaskPurger:
+    """
+    Background thread purging tombstones every TASK_PURGE_INTERVAL_SECONDS.
+    """
+
+    def __init__(self, engines: Sequence[Engine], interval: float = TASK_PURGE_INTERVAL_SECONDS):
+        self.engines: List[Engine] = list(engines)
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> int:
+        purged = 0
+        for engine in self.engines:
+            try:
+                purged += purge(engine, stop=self._stop)
+            except Exception:
+                logger.warning("Could not purge deleted tasks of %s", engine.url, exc_info=True)
+        return purged
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="task-purge", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.run_once()
+
+
+def main(argv=None):
+    from db.database import engine, shards
+
+    parser = argparse.ArgumentParser(description="Soft-deleted task maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+    purge_command = commands.add_parser("purge", help="Delete expired tombstones")
+    purge_command.add_argument(
+        "--retention-hours", type=float, default=TASK_TOMBSTONE_RETENTION_HOURS
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    retention = timedelta(hours=args.retention_hours)
+    print(sum(purge(database, retention) for database in [engine, *shards.engines]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+In-process publish/subscribe of per-user events.
+
+Subscribers are kept per user id. A subscriber is a small slotted object with
+a bounded deque, created on the first undelivered message, and a future that
+exists only while its stream is waiting, so an idle connection costs a few
+hundred bytes. When a slow client lets SSE_QUEUE_SIZE messages pile up, the
+oldest are dropped and the subscriber is told to resynchronize instead.
+
+The broker only reaches subscribers of its own worker. With
+EVENTS_BACKEND=redis (and the redis package installed) messages are published
+to Redis channels and every worker relays those of its subscribers' users;
+other transports can be plugged in with set_broker().
+"""
+import asyncio
+import logging
+import os
+import threading
+from collections import deque
+from typing import Dict, Optional, Set
+
+from dotenv import load_dotenv
+
+from observability.metrics import REGISTRY, Counter, Gauge
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+EVENTS_BACKEND = os.environ.get("EVENTS_BACKEND", "local").lower()
+EVENTS_REDIS_URL = os.environ.get("EVENTS_REDIS_URL", "redis://localhost:6379/0")
+SSE_QUEUE_SIZE = int(os.environ.get("SSE_QUEUE_SIZE", "32"))
+SSE_MAX_SUBSCRIBERS = int(os.environ.get("SSE_MAX_SUBSCRIBERS", "50000"))
+
+RESYNC = "resync"
+
+SUBSCRIBERS = REGISTRY.register(
+    Gauge("event_subscribers", "Open event stream subscriptions.")
+)
+EVENTS_DROPPED = REGISTRY.register(
+    Counter("events_dropped_total", "Events dropped because a subscriber fell behind.")
+)
+
+
+class Subscriber:
+    __slots__ = ("user_id", "loop", "_pending", "_waiter", "overflowed")
+
+    def __init__(self, user_id: str, loop: asyncio.AbstractEventLoop):
+        self.user_id = user_id
+        self.loop = loop
+        self._pending: Optional[deque] = None
+        self._waiter: Optional[asyncio.Future] = None
+        self.overflowed = False
+
+    def push(self, message: str):
+        """
+        Queue a message; only call from the subscriber's event loop.
+        """
+        if self._pending is None:
+            self._pending = deque()
+        if len(self._pending) >= SSE_QUEUE_SIZE:
+            self._pending.clear()
+            self.overflowed = True
+            EVENTS_DROPPED.inc(amount=SSE_QUEUE_SIZE)
+        else:
+            self._pending.append(message)
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def get(self, timeout: float) -> Optional[str]:
+        """
+        Wait for the next message.
+
+        :param timeout: Seconds to wait.
+        :return: The message, RESYNC if messages were dropped, or None on timeout.
+        """
+        if not self._pending and not self.overflowed:
+            self._waiter = self.loop.create_future()
+            try:
+                await asyncio.wait_for(self._waiter, timeout)
+            except asyncio.TimeoutError:
+                return None
+            finally:
+                self._waiter = None
+
+        if self.overflowed:
+            self.overflowed = False
+            return RESYNC
+        message = self._pending.popleft()
+        if not self._pending:
+            # Give the memory back while the connection is idle
+            self._pending = None
+        return message
+
+
+class Broker:
+    def __init__(self, max_subscribers: int = SSE_MAX_SUBSCRIBERS):
+        self.max_subscribers = max_subscribers
+        self._subscribers: Dict[str, Set[Subscriber]] = {}
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def has_subscribers(self, user_id: str) -> bool:
+        return user_id in self._subscribers
+
+    def subscribe(self, user_id: str) -> Optional[Subscriber]:
+        """
+        Subscribe to the events of a user from the running event loop.
+
+        :return: The subscriber, or None if the worker is at SSE_MAX_SUBSCRIBERS.
+        """
+        subscriber = Subscriber(user_id, asyncio.get_running_loop())
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                return None
+            self._subscribers.setdefault(user_id, set()).add(subscriber)
+            self._count += 1
+        SUBSCRIBERS.inc()
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(subscriber.user_id)
+            if subscribers is None or subscriber not in subscribers:
+                return
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[subscriber.user_id]
+            self._count -= 1
+        SUBSCRIBERS.dec()
+
+    def deliver(self, user_id: str, message: str):
+        """
+        Hand a message to this worker's subscribers of a user; callable from any thread.
+        """
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        if not subscribers:
+            return
+
+        try:
+            current = asyncio.get_running_loop()
+        except RuntimeError:
+            current = None
+        for subscriber in subscribers:
+            if subscriber.loop is current:
+                subscriber.push(message)
+            elif not subscriber.loop.is_closed():
+                subscriber.loop.call_soon_threadsafe(subscriber.push, message)
+
+    def wants(self, user_id: str) -> bool:
+        """
+        Whether a message for this user may have a recipient, so is worth building.
+        """
+        return self.has_subscribers(user_id)
+
+    def publish(self, user_id: str, message: str):
+        self.deliver(user_id, message)
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class RedisBroker(Broker):
+    """
+    Broker relaying messages between workers through Redis channels "events:<user id>".
+    """
+
+    def __init__(self, url: str = EVENTS_REDIS_URL, **kwargs):
+        import redis
+
+        super().__init__(**kwargs)
+        self.client = redis.Redis.from_url(url)
+        self._pubsub = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def wants(self, user_id: str) -> bool:
+        # Subscribers may be connected to any worker
+        return True
+
+    def publish(self, user_id: str, message: str):
+        self.client.publish(f"events:{user_id}", message)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.psubscribe("events:*")
+        self._thread = threading.Thread(target=self._run, name="events-relay", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+        self._pubsub.close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                message = self._pubsub.get_message(timeout=1.0)
+            except Exception:
+                logger.warning("Event relay failed, retrying", exc_info=True)
+                self._stop.wait(1.0)
+                continue
+            if message is None or message["type"] != "pmessage":
+                continue
+            user_id = message["channel"].decode().split(":", 1)[1]
+            self.deliver(user_id, message["data"].decode())
+
+
+_broker: Optional[Broker] = None
+_broker_lock = threading.Lock()
+
+
+def get_broker() -> Broker:
+    """
+    Get the process-wide broker selected by EVENTS_BACKEND.
+    """
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = RedisBroker() if EVENTS_BACKEND == "redis" else Broker()
+    return _broker
+
+
+def set_broker(broker: Optional[Broker]):
+    global _broker
+    _broker = broker
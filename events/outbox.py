@@ -0,0 +1,312 @@
+"""
+Transactional outbox for the side effects of task writes.
+
+crud.task adds an OutboxEvent in the same transaction as the task change it
+describes, so an event exists if and only if the change was committed. Worker
+threads drain the outbox outside of any request:
+
+1. claim a batch of due events (SELECT ... FOR UPDATE SKIP LOCKED where the
+   database supports it) and push their available_at OUTBOX_LEASE_SECONDS
+   ahead, so other workers skip them,
+2. hand each event to every registered handler,
+3. delete delivered events; reschedule failed ones with exponential backoff,
+   and after OUTBOX_MAX_ATTEMPTS mark them failed and leave them in place.
+
+A worker that dies mid-batch leaves its events to be claimed again once the
+lease runs out, so delivery is at least once and handlers must be idempotent.
+Events are not ordered across a retry.
+
+Handlers are callables taking the OutboxEvent; register them with
+register_handler(). With OUTBOX_WEBHOOK_URL set, every event is POSTed there.
+
+    python -m events.outbox        # run the workers without the API
+"""
+import logging
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Optional, Sequence
+
+from dotenv import load_dotenv
+from sqlalchemy import delete, event, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from models.outbox import OutboxEvent
+from observability.metrics import REGISTRY, Counter, Histogram
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_WORKER_ENABLED = os.environ.get("OUTBOX_WORKER_ENABLED", "true").lower() == "true"
+OUTBOX_WORKERS = int(os.environ.get("OUTBOX_WORKERS", "2"))
+OUTBOX_BATCH_SIZE = int(os.environ.get("OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_POLL_SECONDS = float(os.environ.get("OUTBOX_POLL_SECONDS", "1"))
+OUTBOX_LEASE_SECONDS = float(os.environ.get("OUTBOX_LEASE_SECONDS", "60"))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", "10"))
+OUTBOX_RETRY_SECONDS = float(os.environ.get("OUTBOX_RETRY_SECONDS", "1"))
+OUTBOX_MAX_RETRY_SECONDS = float(os.environ.get("OUTBOX_MAX_RETRY_SECONDS", "600"))
+OUTBOX_WEBHOOK_URL = os.environ.get("OUTBOX_WEBHOOK_URL")
+OUTBOX_WEBHOOK_TIMEOUT_SECONDS = float(os.environ.get("OUTBOX_WEBHOOK_TIMEOUT_SECONDS", "5"))
+
+OUTBOX_DELIVERED = REGISTRY.register(
+    Counter("outbox_delivered_total", "Outbox events delivered to every handler.")
+)
+OUTBOX_RETRIED = REGISTRY.register(
+    Counter("outbox_retried_total", "Outbox deliveries that failed and were rescheduled.")
+)
+OUTBOX_FAILED = REGISTRY.register(
+    Counter("outbox_failed_total", "Outbox events given up after OUTBOX_MAX_ATTEMPTS.")
+)
+OUTBOX_LAG = REGISTRY.register(
+    Histogram(
+        "outbox_delivery_lag_seconds",
+        "Time from the task write to the delivery of its event.",
+        buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300),
+    )
+)
+
+_NOTIFY_KEY = "outbox_notify"
+
+Handler = Callable[[OutboxEvent], None]
+
+_handlers: List[Handler] = []
+# Set after a commit that wrote events, so idle workers do not wait a full poll
+_wake = threading.Event()
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def register_handler(handler: Handler) -> Handler:
+    """
+    Deliver every outbox event to `handler`; usable as a decorator.
+    """
+    _handlers.append(handler)
+    return handler
+
+
+def unregister_handler(handler: Handler):
+    _handlers.remove(handler)
+
+
+def enqueue(db: Session, topic: str, user_id: str, payload: str):
+    """
+    Add an event to the outbox as part of the session's transaction.
+
+    :param db: Session writing the change the event describes.
+    :param topic: Event type, e.g. "task.created".
+    :param user_id: Owner of the changed task.
+    :param payload: JSON body of the event.
+    """
+    now = _utcnow()
+    db.add(
+        OutboxEvent(
+            topic=topic,
+            user_id=user_id,
+            payload=payload,
+            created_at=now,
+            available_at=now,
+            attempts=0,
+        )
+    )
+    db.info[_NOTIFY_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _notify(session: Session):
+    if session.info.pop(_NOTIFY_KEY, False):
+        _wake.set()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session: Session):
+    session.info.pop(_NOTIFY_KEY, None)
+
+
+def retry_delay(attempts: int) -> float:
+    """
+    Seconds to wait before the next attempt after `attempts` failures.
+    """
+    return min(OUTBOX_MAX_RETRY_SECONDS, OUTBOX_RETRY_SECONDS * 2 ** (attempts - 1))
+
+
+def claim(engine: Engine, batch_size: int = OUTBOX_BATCH_SIZE) -> List[OutboxEvent]:
+    """
+    Lease a batch of due events.
+
+    :return: Detached events, oldest first.
+    """
+    now = _utcnow()
+    with Session(bind=engine, expire_on_commit=False) as session, session.begin():
+        events = session.scalars(
+            select(OutboxEvent)
+            .where(OutboxEvent.failed_at.is_(None), OutboxEvent.available_at <= now)
+            .order_by(OutboxEvent.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+        lease_end = now + timedelta(seconds=OUTBOX_LEASE_SECONDS)
+        for outbox_event in events:
+            outbox_event.available_at = lease_end
+    return list(events)
+
+
+def deliver(outbox_event: OutboxEvent, handlers: Sequence[Handler]) -> Optional[Exception]:
+    """
+    Run every handler on an event.
+
+    :return: The first error raised, or None if all handlers succeeded.
+    """
+    for handler in handlers:
+        try:
+            handler(outbox_event)
+        except Exception as e:
+            logger.warning(
+                "Outbox handler %s failed on event %s", getattr(handler, "__name__", handler),
+                outbox_event.id, exc_info=True,
+            )
+            return e
+    return None
+
+
+def process_batch(engine: Engine, handlers: Optional[Sequence[Handler]] = None) -> int:
+    """
+    Claim, deliver and acknowledge one batch of events from a database.
+
+    :param engine: Database holding an outbox table.
+    :param handlers: Defaults to the registered handlers.
+    :return: Number of events claimed.
+    """
+    handlers = _handlers if handlers is None else handlers
+    events = claim(engine)
+    if not events:
+        return 0
+
+    delivered = []
+    failed = []
+    for outbox_event in events:
+        error = deliver(outbox_event, handlers)
+        if error is None:
+            delivered.append(outbox_event.id)
+            OUTBOX_LAG.observe((_utcnow() - outbox_event.created_at).total_seconds())
+        else:
+            failed.append((outbox_event, error))
+
+    now = _utcnow()
+    with Session(bind=engine) as session, session.begin():
+        if delivered:
+            session.execute(delete(OutboxEvent).where(OutboxEvent.id.in_(delivered)))
+        for outbox_event, error in failed:
+            attempts = outbox_event.attempts + 1
+            values = {"attempts": attempts, "last_error": repr(error)[:500]}
+            if attempts >= OUTBOX_MAX_ATTEMPTS:
+                values["failed_at"] = now
+                OUTBOX_FAILED.inc()
+                logger.error("Giving up on outbox event %s after %d attempts", outbox_event.id, attempts)
+            else:
+                values["available_at"] = now + timedelta(seconds=retry_delay(attempts))
+                OUTBOX_RETRIED.inc()
+            session.query(OutboxEvent).filter(OutboxEvent.id == outbox_event.id).update(values)
+
+    OUTBOX_DELIVERED.inc(amount=len(delivered))
+    return len(events)
+
+
+class OutboxWorker:
+    """
+    Pool of threads draining the outboxes of a set of databases.
+    """
+
+    def __init__(
+        self,
+        engines: Sequence[Engine],
+        workers: int = OUTBOX_WORKERS,
+        poll_interval: float = OUTBOX_POLL_SECONDS,
+    ):
+        self.engines = list(engines)
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+
+    def start(self):
+        if self._threads:
+            return
+        self._stop.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"outbox-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 10):
+        self._stop.set()
+        _wake.set()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+
+    def run_once(self) -> int:
+        """
+        Process one batch from every database.
+
+        :return: Number of events claimed.
+        """
+        claimed = 0
+        for engine in self.engines:
+            try:
+                claimed += process_batch(engine)
+            except Exception:
+                logger.warning("Could not drain the outbox of %s", engine.url, exc_info=True)
+        return claimed
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self.run_once():
+                continue
+            _wake.wait(self.poll_interval)
+            _wake.clear()
+
+
+def webhook_handler(outbox_event: OutboxEvent):
+    """
+    POST the event to OUTBOX_WEBHOOK_URL; the receiver must tolerate duplicates.
+    """
+    import requests
+
+    response = requests.post(
+        OUTBOX_WEBHOOK_URL,
+        data=outbox_event.payload,
+        headers={
+            "Content-Type": "application/json",
+            "X-Event-Id": str(outbox_event.id),
+            "X-Event-Topic": outbox_event.topic,
+        },
+        timeout=OUTBOX_WEBHOOK_TIMEOUT_SECONDS,
+    )
+    response.raise_for_status()
+
+
+if OUTBOX_WEBHOOK_URL:
+    register_handler(webhook_handler)
+
+
+def main():
+    from db.database import engine, shards
+    from observability.log import configure_logging
+
+    configure_logging()
+    worker = OutboxWorker([engine, *shards.engines])
+    worker.start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        worker.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Publish task changes once their transaction commits.
+
+Listeners on every Session collect the tasks created, updated and deleted by
+each flush, serialize them while their attributes are still loaded, and hand
+them to the broker after the commit; a rollback discards them. Changes go to
+the task's creator and, for tasks on a list, to the list's members, looked up
+once per list and commit. Nothing is serialized for users without an open
+stream on the local broker.
+"""
+import json
+import logging
+from typing import Dict, Iterable, List
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from events.broker import get_broker
+from models.task import Task as TaskModel
+from models.task_list import TaskListMember
+from schemas.task import TaskInDB
+
+logger = logging.getLogger(__name__)
+
+TASK_CREATED = "task.created"
+TASK_UPDATED = "task.updated"
+TASK_DELETED = "task.deleted"
+TASK_RESTORED = "task.restored"
+
+_PENDING_KEY = "task_events"
+_MEMBERS_KEY = "task_event_list_members"
+
+
+def task_event(kind: str, task: TaskModel) -> str:
+    """
+    Serialize a task change.
+
+    :param kind: TASK_CREATED, TASK_UPDATED, TASK_DELETED or TASK_RESTORED.
+    :param task: The task; only its id is sent for deletions.
+    :return: JSON message.
+    """
+    if kind == TASK_DELETED:
+        body = {"id": task.id}
+    else:
+        body = TaskInDB.model_validate(task, from_attributes=True).model_dump(mode="json")
+    return json.dumps({"type": kind, "task": body})
+
+
+def _update_kind(task: TaskModel) -> str:
+    # Soft deletes and restores are updates of deleted_at
+    history = inspect(task).attrs.deleted_at.history
+    if history.added and history.added[0] is not None:
+        return TASK_DELETED
+    if history.deleted and history.deleted[0] is not None:
+        return TASK_RESTORED
+    return TASK_UPDATED
+
+
+def _list_members(session: Session, list_ids: Iterable[str]) -> Dict[str, List[str]]:
+    # Cached until the commit: flushes of one transaction share the lookup
+    members = session.info.setdefault(_MEMBERS_KEY, {})
+    missing = set(list_ids) - members.keys()
+    if missing:
+        for list_id in missing:
+            members[list_id] = []
+        rows = session.query(TaskListMember.list_id, TaskListMember.user_id).filter(
+            TaskListMember.list_id.in_(missing)
+        )
+        for list_id, user_id in rows:
+            members[list_id].append(user_id)
+    return members
+
+
+@event.listens_for(Session, "after_flush")
+def _collect(session: Session, flush_context):
+    broker = get_broker()
+    changes = [
+        *((TASK_CREATED, obj) for obj in session.new),
+        *(
+            (_update_kind(obj), obj)
+            for obj in session.dirty
+            if isinstance(obj, TaskModel) and session.is_modified(obj)
+        ),
+        *((TASK_DELETED, obj) for obj in session.deleted),
+    ]
+    # Read without loading: a deleted row can no longer be refreshed
+    changes = [(kind, obj, inspect(obj).dict) for kind, obj in changes if isinstance(obj, TaskModel)]
+    list_ids = {state["list_id"] for _, _, state in changes if state.get("list_id") is not None}
+    members = _list_members(session, list_ids) if list_ids else {}
+
+    for kind, obj, state in changes:
+        recipients = {state.get("user_id"), *members.get(state.get("list_id"), ())}
+        recipients = [user_id for user_id in recipients if user_id is not None and broker.wants(user_id)]
+        if not recipients:
+            continue
+        message = task_event(kind, obj)
+        session.info.setdefault(_PENDING_KEY, []).extend((user_id, message) for user_id in recipients)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish(session: Session):
+    session.info.pop(_MEMBERS_KEY, None)
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    broker = get_broker()
+    for user_id, message in pending:
+        try:
+            broker.publish(user_id, message)
+        except Exception:
+            # The change is committed either way; streams resync on reconnect
+            logger.warning("Could not publish task event", exc_info=True)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session: Session):
+    session.info.pop(_MEMBERS_KEY, None)
+    session.info.pop(_PENDING_KEY, None)
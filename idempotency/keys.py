@@ -0,0 +1,288 @@
+"""
+Idempotency keys for POST /tasks.
+
+A client sending an Idempotency-Key header can retry the request safely: the
+first request creates the task and stores its response under the key, in the
+same transaction; later requests with the key get that response back, marked
+with an Idempotent-Replayed header, without inserting anything. Keys are
+scoped to their user and kept for IDEMPOTENCY_KEY_TTL_HOURS; reusing one for
+a different body is answered 422.
+
+Responses are looked up in a per-worker LRU cache of IDEMPOTENCY_CACHE_SIZE
+entries first, then in the idempotency_keys table. Duplicates arriving while
+the first request runs are coalesced: in the same worker they wait for its
+result; across workers the primary key of the stored row lets only one
+transaction commit, and the others replay its response.
+
+KeyPurger deletes expired keys every IDEMPOTENCY_PURGE_INTERVAL_SECONDS.
+
+    python -m idempotency.keys purge      # delete expired keys once
+"""
+import argparse
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+from fastapi import Depends, HTTPException
+from sqlalchemy import delete, select, tuple_
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from crud.task import create_task
+from db.database import get_db
+from models.idempotency_key import IdempotencyKey
+from observability.metrics import REGISTRY, Counter
+from schemas.task import TaskCreate, TaskInDB
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_KEY_TTL_HOURS = float(os.environ.get("IDEMPOTENCY_KEY_TTL_HOURS", "24"))
+IDEMPOTENCY_CACHE_SIZE = int(os.environ.get("IDEMPOTENCY_CACHE_SIZE", "10000"))
+# How long a duplicate waits for the first request of its key in this worker
+IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get("IDEMPOTENCY_WAIT_SECONDS", "10"))
+IDEMPOTENCY_PURGE_ENABLED = os.environ.get("IDEMPOTENCY_PURGE_ENABLED", "true").lower() == "true"
+IDEMPOTENCY_PURGE_INTERVAL_SECONDS = float(os.environ.get("IDEMPOTENCY_PURGE_INTERVAL_SECONDS", "3600"))
+IDEMPOTENCY_PURGE_BATCH_SIZE = int(os.environ.get("IDEMPOTENCY_PURGE_BATCH_SIZE", "1000"))
+
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+REPLAYS = REGISTRY.register(
+    Counter(
+        "idempotent_replays_total",
+        "Requests answered with the stored response of their Idempotency-Key.",
+        ("source",),
+    )
+)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class ResponseCache:
+    """
+    Bounded LRU of stored responses, each dropped once its key expires.
+    """
+
+    def __init__(self, max_size: int = IDEMPOTENCY_CACHE_SIZE, clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.clock = clock
+        # (user_id, key) -> (fingerprint, response, expires at)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[str, str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, str]) -> Optional[Tuple[str, str]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[2] <= self.clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0], entry[1]
+
+    def put(self, key: Tuple[str, str], fingerprint: str, response: str, ttl: float):
+        with self._lock:
+            self._entries[key] = (fingerprint, response, self.clock() + ttl)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = ResponseCache()
+# Keys with a request running in this worker, set once it is done
+_in_flight: Dict[Tuple[str, str], threading.Event] = {}
+_in_flight_lock = threading.Lock()
+
+
+def fingerprint(task: TaskCreate) -> str:
+    return hashlib.sha256(task.model_dump_json().encode()).hexdigest()
+
+
+def _replay(expected: str, stored: str, response: str) -> TaskInDB:
+    if stored != expected:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+    return TaskInDB.model_validate_json(response)
+
+
+def _ttl_left(created_at: datetime) -> float:
+    return IDEMPOTENCY_KEY_TTL_HOURS * 3600 - (_utcnow() - created_at).total_seconds()
+
+
+def _stored(user_id: str, key: str, db: Session) -> Optional[IdempotencyKey]:
+    return (
+        db.query(IdempotencyKey)
+        .filter(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+        .first()
+    )
+
+
+def _create(task: TaskCreate, user_id: str, key: str, expected: str, db: Session):
+    stored = _stored(user_id, key, db)
+    if stored is not None and _ttl_left(stored.created_at) <= 0:
+        # Expired but not purged yet: the key is free again
+        db.delete(stored)
+        db.flush()
+        stored = None
+    if stored is None:
+        row = IdempotencyKey(user_id=user_id, key=key, fingerprint=expected, created_at=_utcnow())
+        try:
+            db_task = create_task(task, user_id, db, row)
+        except HTTPException as e:
+            if e.status_code != 409:
+                raise
+            # Another worker stored the key first and has committed by now
+            stored = _stored(user_id, key, db)
+            if stored is None:
+                raise
+        else:
+            response = TaskInDB.model_validate(db_task, from_attributes=True).model_dump_json()
+            _cache.put((user_id, key), expected, response, IDEMPOTENCY_KEY_TTL_HOURS * 3600)
+            return db_task, False
+
+    _cache.put((user_id, key), stored.fingerprint, stored.response, _ttl_left(stored.created_at))
+    REPLAYS.inc(("database",))
+    return _replay(expected, stored.fingerprint, stored.response), True
+
+
+def create_task_once(task: TaskCreate, user_id: str, key: str, db: Session = Depends(get_db)):
+    """
+    Create a task unless a request with the same Idempotency-Key did.
+
+    Blocks while a request with the same key runs in this worker, so call it
+    from a thread rather than the event loop.
+
+    :param key: Idempotency-Key header of the request.
+    :return: The task, and whether it is the stored response of an earlier request.
+    :raises HTTPException: 422 if the key is invalid or was used for another
+        body, 409 if the first request with the key is still running.
+    """
+    if not key or len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise HTTPException(status_code=422, detail="Invalid Idempotency-Key")
+
+    cache_key = (user_id, key)
+    expected = fingerprint(task)
+    while True:
+        cached = _cache.get(cache_key)
+        if cached is not None:
+            REPLAYS.inc(("memory",))
+            return _replay(expected, *cached), True
+
+        with _in_flight_lock:
+            running = _in_flight.get(cache_key)
+            leader = running is None
+            if leader:
+                running = _in_flight[cache_key] = threading.Event()
+        if leader:
+            break
+        if not running.wait(IDEMPOTENCY_WAIT_SECONDS):
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is in progress")
+        # Its response is cached now, unless it failed and this request retries
+
+    try:
+        return _create(task, user_id, key, expected, db)
+    finally:
+        with _in_flight_lock:
+            del _in_flight[cache_key]
+        running.set()
+
+
+def purge(
+    engine: Engine,
+    ttl: timedelta = timedelta(hours=IDEMPOTENCY_KEY_TTL_HOURS),
+    batch_size: int = IDEMPOTENCY_PURGE_BATCH_SIZE,
+    stop: Optional[threading.Event] = None,
+) -> int:
+    """
+    Delete the expired keys of one database.
+
+    :param engine: Database holding an idempotency_keys table.
+    :param ttl: How long keys are kept.
+    :param batch_size: Keys deleted per transaction.
+    :param stop: Interrupts the purge between batches once set.
+    :return: Number of keys deleted.
+    """
+    keys = IdempotencyKey.__table__
+    cutoff = _utcnow() - ttl
+    purged = 0
+    while stop is None or not stop.is_set():
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(keys.c.user_id, keys.c.key).where(keys.c.created_at < cutoff).limit(batch_size)
+            ).all()
+            if rows:
+                conn.execute(delete(keys).where(tuple_(keys.c.user_id, keys.c.key).in_(rows)))
+        purged += len(rows)
+        if len(rows) < batch_size:
+            break
+    if purged:
+        logger.info("Purged %d expired idempotency keys", purged)
+    return purged
+
+
+class KeyPurger:
+    """
+    Background thread deleting expired keys every IDEMPOTENCY_PURGE_INTERVAL_SECONDS.
+    """
+
+    def __init__(self, engines: Sequence[Engine], interval: float = IDEMPOTENCY_PURGE_INTERVAL_SECONDS):
+        self.engines: List[Engine] = list(engines)
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> int:
+        purged = 0
+        for engine in self.engines:
+            try:
+                purged += purge(engine, stop=self._stop)
+            except Exception:
+                logger.warning("Could not purge the idempotency keys of %s", engine.url, exc_info=True)
+        return purged
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="idempotency-purge", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.run_once()
+
+
+def main(argv=None):
+    from db.database import engine, shards
+
+    parser = argparse.ArgumentParser(description="Manage idempotency keys")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("purge", help="Delete expired keys once")
+    parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    print(sum(purge(database) for database in [engine, *shards.engines]))
+
+
+if __name__ == "__main__":
+    main()
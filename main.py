@@ -1,18 +1,98 @@
+import logging
+import os
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from starlette import status
+from starlette.responses import PlainTextResponse
 
-from db.create_database import create_tables
-from db.database import SessionLocal
-from routers import task, user
+from auth.auth import auth as auth_bearer
+from auth.cognito import get_cognito_provider, shutdown_cognito_pool
+from db.database import SessionLocal, engine, replicas, shards, warm_pool
+from db.archive import TASK_ARCHIVE_ENABLED, TaskArchiver
+from db.migrate import ensure_schema_current
+from db.soft_delete import TASK_PURGE_ENABLED, TaskPurger
+from events import tasks as task_events  # noqa: F401 (registers the listeners)
+from events.broker import get_broker
+from events.outbox import OUTBOX_WORKER_ENABLED, OutboxWorker
+from idempotency.keys import IDEMPOTENCY_PURGE_ENABLED, KeyPurger
+from observability.log import (RequestIdMiddleware, configure_logging,
+                               shutdown_logging)
+from observability.metrics import (METRICS_ENABLED, REGISTRY,
+                                   MetricsMiddleware, instrument_engine)
+from observability.profiling import ProfilingMiddleware, profiling_configured
+from observability.sql import (SQL_DEBUG_ENDPOINT, SQL_DIAGNOSTICS_ENABLED,
+                               SqlDiagnosticsMiddleware, findings,
+                               instrument_sql)
+from recurrence.roller import RECURRENCE_ROLLER_ENABLED, RecurrenceRoller
+from routers import (recurring_task, tag, task, task_list, task_stream,
+                     user)
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ENABLED = os.environ.get("WARMUP_ENABLED", "true").lower() == "true"
+
+outbox_worker = OutboxWorker([engine, *shards.engines])
+task_purger = TaskPurger([engine, *shards.engines])
+task_archiver = TaskArchiver([engine, *shards.engines])
+recurrence_roller = RecurrenceRoller([engine, *shards.engines])
+key_purger = KeyPurger([engine, *shards.engines])
+
+
+def warm_up():
+    """
+    Fill the connection pools and load the signing keys before serving traffic.
+
+    Failures are logged and left to the first request to retry.
+    """
+    for database in [engine, *replicas.engines, *shards.engines]:
+        try:
+            warm_pool(database)
+        except Exception:
+            logger.warning("Could not warm up %s", database.url.render_as_string(), exc_info=True)
+
+    try:
+        get_cognito_provider().warm_up()
+        for bearer in (
+            auth_bearer, task.auth, recurring_task.auth, tag.auth, task_list.auth, user.auth
+        ):
+            bearer.kid_to_jwk
+    except Exception:
+        logger.warning("Could not load the identity provider keys", exc_info=True)
 
 
 @asynccontextmanager
 async def lifespan(app):
-    create_tables()
+    configure_logging()
+    ensure_schema_current(engine, shards.engines)
+    # Build the identity provider (and its precomputed credentials) up front
+    get_cognito_provider()
+    if WARMUP_ENABLED:
+        warm_up()
+    replicas.start()
+    get_broker().start()
+    if OUTBOX_WORKER_ENABLED:
+        outbox_worker.start()
+    if TASK_PURGE_ENABLED:
+        task_purger.start()
+    if TASK_ARCHIVE_ENABLED:
+        task_archiver.start()
+    if RECURRENCE_ROLLER_ENABLED:
+        recurrence_roller.start()
+    if IDEMPOTENCY_PURGE_ENABLED:
+        key_purger.start()
     yield
+    key_purger.stop()
+    recurrence_roller.stop()
+    task_archiver.stop()
+    task_purger.stop()
+    outbox_worker.stop()
+    get_broker().stop()
+    replicas.stop()
+    shards.dispose()
+    shutdown_cognito_pool()
+    shutdown_logging()
 
 
 app = FastAPI(
@@ -37,8 +117,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if profiling_configured():
+    app.add_middleware(ProfilingMiddleware)
+
+if SQL_DIAGNOSTICS_ENABLED:
+    app.add_middleware(SqlDiagnosticsMiddleware)
+    instrument_sql(engine)
+    for other in [*replicas.engines, *shards.engines]:
+        instrument_sql(other)
+
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    instrument_engine(engine)
+    for other in [*replicas.engines, *shards.engines]:
+        instrument_engine(other)
+
+# Added after the middleware above so their logs carry the request id
+app.add_middleware(RequestIdMiddleware)
+
 app.include_router(user.router)
+# Before task.router, whose /tasks/{task_id} would match /tasks/stream
+app.include_router(task_stream.router)
 app.include_router(task.router)
+app.include_router(recurring_task.router)
+app.include_router(tag.router)
+app.include_router(task_list.router)
 
 @app.get(
     "/health",
@@ -51,6 +154,20 @@ def get_health():
     return {"status": "ok"}
 
 
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    return PlainTextResponse(
+        REGISTRY.render(), media_type="text/plain; version=0.0.4"
+    )
+
+
+if SQL_DEBUG_ENDPOINT:
+
+    @app.get("/debug/sql", include_in_schema=False)
+    def get_sql_findings():
+        return findings()
+
+
 @app.middleware("http")
 async def db_session_middleware(request: Request, call_next):
     request.state.db = SessionLocal()
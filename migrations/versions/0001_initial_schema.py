@@ -0,0 +1,75 @@
+"""initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 10:00:00.000000
+
+Databases created by the old create_all() startup already have these tables;
+mark them as migrated with `python -m db.migrate stamp 0001`.
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+from db.ids import TaskId
+from db.migrate import foreign_keys, on_shard
+
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if not on_shard():
+        op.create_table(
+            "user",
+            sa.Column("id", sa.String(length=50), nullable=False),
+            sa.Column("given_name", sa.String(length=200), nullable=False),
+            sa.Column("family_name", sa.String(length=200), nullable=False),
+            sa.Column("username", sa.String(length=200), nullable=False),
+            sa.Column("email", sa.String(length=200), nullable=False),
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_user_id", "user", ["id"])
+        op.create_index("ix_user_given_name", "user", ["given_name"])
+        op.create_index("ix_user_family_name", "user", ["family_name"])
+        op.create_index("ix_user_username", "user", ["username"], unique=True)
+        op.create_index("ix_user_email", "user", ["email"], unique=True)
+        op.create_index("ix_user_updated_at", "user", ["updated_at"])
+
+    op.create_table(
+        "tasks",
+        sa.Column("id", TaskId(), nullable=False),
+        sa.Column("title", sa.String(length=200), nullable=False),
+        sa.Column("description", sa.String(length=2048), nullable=False),
+        sa.Column(
+            "status",
+            sa.Enum("TODO", "IN_PROGRESS", "DONE", name="taskstatus"),
+            nullable=False,
+        ),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column(
+            "priority",
+            sa.Enum("LOW", "MEDIUM", "HIGH", name="taskpriority"),
+            nullable=False,
+        ),
+        sa.Column("deadline", sa.DateTime(), nullable=False),
+        sa.Column("user_id", sa.String(length=50), nullable=False),
+        *foreign_keys(sa.ForeignKeyConstraint(["user_id"], ["user.id"])),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("tasks")
+    if not on_shard():
+        op.drop_index("ix_user_updated_at", table_name="user")
+        op.drop_index("ix_user_email", table_name="user")
+        op.drop_index("ix_user_username", table_name="user")
+        op.drop_index("ix_user_family_name", table_name="user")
+        op.drop_index("ix_user_given_name", table_name="user")
+        op.drop_index("ix_user_id", table_name="user")
+        op.drop_table("user")
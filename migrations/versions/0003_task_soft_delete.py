@@ -0,0 +1,26 @@
+"""task soft delete
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 13:00:00.000000
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("tasks", sa.Column("deleted_at", sa.DateTime(), nullable=True))
+    op.create_index("ix_tasks_deleted_at", "tasks", ["deleted_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_tasks_deleted_at", table_name="tasks")
+    with op.batch_alter_table("tasks") as batch_op:
+        batch_op.drop_column("deleted_at")
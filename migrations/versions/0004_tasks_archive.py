@@ -0,0 +1,48 @@
+"""tasks archive
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 14:00:00.000000
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+from db.ids import TaskId
+
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "tasks_archive",
+        sa.Column("id", TaskId(), nullable=False),
+        sa.Column("title", sa.String(length=200), nullable=False),
+        sa.Column("description", sa.String(length=2048), nullable=False),
+        sa.Column(
+            "status",
+            sa.Enum("TODO", "IN_PROGRESS", "DONE", name="taskstatus"),
+            nullable=False,
+        ),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column(
+            "priority",
+            sa.Enum("LOW", "MEDIUM", "HIGH", name="taskpriority"),
+            nullable=False,
+        ),
+        sa.Column("deadline", sa.DateTime(), nullable=False),
+        sa.Column("user_id", sa.String(length=50), nullable=False),
+        sa.Column("archived_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        mysql_row_format="COMPRESSED",
+    )
+    op.create_index("ix_tasks_archive_user_id", "tasks_archive", ["user_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_tasks_archive_user_id", table_name="tasks_archive")
+    op.drop_table("tasks_archive")
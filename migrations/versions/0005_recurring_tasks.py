@@ -0,0 +1,60 @@
+"""recurring tasks
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 15:00:00.000000
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+from db.ids import TaskId
+from db.migrate import foreign_keys
+
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "recurring_tasks",
+        sa.Column("id", TaskId(), nullable=False),
+        sa.Column("title", sa.String(length=200), nullable=False),
+        sa.Column("description", sa.String(length=2048), nullable=False),
+        sa.Column(
+            "priority",
+            sa.Enum("LOW", "MEDIUM", "HIGH", name="taskpriority"),
+            nullable=False,
+        ),
+        sa.Column("rule", sa.String(length=200), nullable=False),
+        sa.Column("starts_at", sa.DateTime(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("materialized_until", sa.DateTime(), nullable=True),
+        sa.Column("user_id", sa.String(length=50), nullable=False),
+        *foreign_keys(sa.ForeignKeyConstraint(["user_id"], ["user.id"])),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_recurring_tasks_materialized_until", "recurring_tasks", ["materialized_until"]
+    )
+    op.create_index("ix_recurring_tasks_user_id", "recurring_tasks", ["user_id"])
+
+    op.add_column("tasks", sa.Column("recurring_task_id", TaskId(), nullable=True))
+    op.create_index(
+        "ix_tasks_recurring_task_id_deadline",
+        "tasks",
+        ["recurring_task_id", "deadline"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_tasks_recurring_task_id_deadline", table_name="tasks")
+    with op.batch_alter_table("tasks") as batch_op:
+        batch_op.drop_column("recurring_task_id")
+    op.drop_index("ix_recurring_tasks_user_id", table_name="recurring_tasks")
+    op.drop_index("ix_recurring_tasks_materialized_until", table_name="recurring_tasks")
+    op.drop_table("recurring_tasks")
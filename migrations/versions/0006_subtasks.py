@@ -0,0 +1,36 @@
+"""subtasks
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 16:00:00.000000
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+from db.ids import TaskId
+
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "subtasks",
+        sa.Column("id", TaskId(), nullable=False),
+        sa.Column("task_id", TaskId(), nullable=False),
+        sa.Column("user_id", sa.String(length=50), nullable=False),
+        sa.Column("title", sa.String(length=200), nullable=False),
+        sa.Column("done", sa.Boolean(), nullable=False),
+        sa.Column("position", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_subtasks_task_id", "subtasks", ["task_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_subtasks_task_id", table_name="subtasks")
+    op.drop_table("subtasks")
@@ -0,0 +1,47 @@
+"""tags
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 17:00:00.000000
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+from db.ids import TaskId
+from db.migrate import foreign_keys
+
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "tags",
+        sa.Column("id", TaskId(), nullable=False),
+        sa.Column("name", sa.String(length=50), nullable=False),
+        sa.Column("user_id", sa.String(length=50), nullable=False),
+        *foreign_keys(sa.ForeignKeyConstraint(["user_id"], ["user.id"])),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_tags_user_id_name", "tags", ["user_id", "name"], unique=True)
+
+    op.create_table(
+        "task_tags",
+        sa.Column("task_id", TaskId(), nullable=False),
+        sa.Column("tag_id", TaskId(), nullable=False),
+        sa.Column("user_id", sa.String(length=50), nullable=False),
+        *foreign_keys(sa.ForeignKeyConstraint(["tag_id"], ["tags.id"])),
+        sa.PrimaryKeyConstraint("task_id", "tag_id"),
+    )
+    op.create_index("ix_task_tags_tag_id_task_id", "task_tags", ["tag_id", "task_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_task_tags_tag_id_task_id", table_name="task_tags")
+    op.drop_table("task_tags")
+    op.drop_index("ix_tags_user_id_name", table_name="tags")
+    op.drop_table("tags")
@@ -0,0 +1,64 @@
+"""shared task lists
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 18:00:00.000000
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+from db.ids import TaskId
+from db.migrate import on_shard
+
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Lists stay in the main database, next to the users
+    if not on_shard():
+        op.create_table(
+            "task_lists",
+            sa.Column("id", TaskId(), nullable=False),
+            sa.Column("name", sa.String(length=200), nullable=False),
+            sa.Column("owner_id", sa.String(length=50), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(["owner_id"], ["user.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_table(
+            "task_list_members",
+            sa.Column("list_id", TaskId(), nullable=False),
+            sa.Column("user_id", sa.String(length=50), nullable=False),
+            sa.Column(
+                "role",
+                sa.Enum("OWNER", "EDITOR", "VIEWER", name="listrole"),
+                nullable=False,
+            ),
+            sa.ForeignKeyConstraint(["list_id"], ["task_lists.id"]),
+            sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+            sa.PrimaryKeyConstraint("list_id", "user_id"),
+        )
+        op.create_index(
+            "ix_task_list_members_user_id_list_id", "task_list_members", ["user_id", "list_id"]
+        )
+
+    op.add_column("tasks", sa.Column("list_id", TaskId(), nullable=True))
+    op.create_index("ix_tasks_list_id", "tasks", ["list_id"])
+    op.add_column("tasks_archive", sa.Column("list_id", TaskId(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("tasks_archive") as batch_op:
+        batch_op.drop_column("list_id")
+    op.drop_index("ix_tasks_list_id", table_name="tasks")
+    with op.batch_alter_table("tasks") as batch_op:
+        batch_op.drop_column("list_id")
+    if not on_shard():
+        op.drop_index("ix_task_list_members_user_id_list_id", table_name="task_list_members")
+        op.drop_table("task_list_members")
+        op.drop_table("task_lists")
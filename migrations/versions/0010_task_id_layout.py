@@ -0,0 +1,26 @@
+"""task id layout
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19 20:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from db.ids import TASK_ID_BINARY
+from db.migrate_task_ids import convert_task_ids
+
+revision: str = "0010"
+down_revision: Union[str, None] = "0009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Databases created with the other layout convert all their task id columns
+    convert_task_ids(op, TASK_ID_BINARY)
+
+
+def downgrade() -> None:
+    convert_task_ids(op, False)
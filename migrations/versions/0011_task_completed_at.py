@@ -0,0 +1,42 @@
+"""task completed at
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-19 21:00:00.000000
+"""
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0011"
+down_revision: Union[str, None] = "0010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("tasks", sa.Column("completed_at", sa.DateTime(), nullable=True))
+    op.create_index("ix_tasks_completed_at", "tasks", ["completed_at"])
+    op.add_column("tasks_archive", sa.Column("completed_at", sa.DateTime(), nullable=True))
+
+    # When existing tasks were completed is unknown: count from now, so that
+    # none is archived earlier than TASK_ARCHIVE_AFTER_DAYS after the upgrade
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    tasks = sa.table("tasks", sa.column("status"), sa.column("completed_at", sa.DateTime()))
+    op.execute(
+        tasks.update()
+        .where(tasks.c.status == "DONE", tasks.c.completed_at.is_(None))
+        .values(completed_at=now)
+    )
+    archived_tasks = sa.table("tasks_archive", sa.column("completed_at"), sa.column("archived_at"))
+    op.execute(archived_tasks.update().values(completed_at=archived_tasks.c.archived_at))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("tasks_archive") as batch_op:
+        batch_op.drop_column("completed_at")
+    op.drop_index("ix_tasks_completed_at", table_name="tasks")
+    with op.batch_alter_table("tasks") as batch_op:
+        batch_op.drop_column("completed_at")
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, DateTime, Index, String, Text
+
+from db.database import Base
+from db.ids import TaskId
+
+
+class IdempotencyKey(Base):
+    """
+    Response of a POST /tasks made with an Idempotency-Key header, stored in
+    the transaction creating the task (see idempotency.keys).
+    """
+
+    __tablename__ = "idempotency_keys"
+
+    # Keys are scoped to their user, who also picks the shard
+    user_id = Column(String(50), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    # Hash of the request body, to reject a key reused for another request
+    fingerprint = Column(String(64), nullable=False)
+    task_id = Column(TaskId(), nullable=False)
+    # TaskInDB as JSON
+    response = Column(Text, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (Index("ix_idempotency_keys_created_at", "created_at"),)
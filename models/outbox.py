@@ -0,0 +1,22 @@
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text
+
+from db.database import Base
+
+
+class OutboxEvent(Base):
+    __tablename__ = "outbox"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    topic = Column(String(50), nullable=False)
+    # Owner of the changed task; also picks the shard the event is stored on
+    user_id = Column(String(50), nullable=False)
+    payload = Column(Text, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    # Next delivery attempt; pushed forward while a worker holds the event
+    available_at = Column(DateTime, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(String(500), nullable=True)
+    # Set once the event ran out of attempts; it is then left for inspection
+    failed_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (Index("ix_outbox_failed_at_available_at", "failed_at", "available_at"),)
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, DateTime, Enum, ForeignKey, String
+
+from db.database import Base
+from db.ids import TaskId, new_task_id
+from models.task import TaskPriority
+
+
+class RecurringTask(Base):
+    """
+    Definition of a task series; its occurrences are materialized as tasks
+    only up to materialized_until (see crud.task.materialize_recurring_tasks).
+    """
+
+    __tablename__ = "recurring_tasks"
+
+    id = Column(TaskId(), primary_key=True, default=new_task_id)
+    title = Column(String(200), nullable=False)
+    description = Column(String(2048), nullable=False)
+    priority = Column(Enum(TaskPriority), nullable=False)
+    # Recurrence rule, see recurrence.rule
+    rule = Column(String(200), nullable=False)
+    starts_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    # Every occurrence up to this point exists as a task; None before the first run
+    materialized_until = Column(DateTime, nullable=True, index=True)
+    user_id = Column(String(50), ForeignKey("user.id"), nullable=False, index=True)
@@ -0,0 +1,43 @@
+from sqlalchemy import Column, ForeignKey, Index, String
+
+from db.database import Base
+from db.ids import TaskId, new_task_id
+
+
+class Tag(Base):
+    """
+    Label of a user's tasks, unique by name per user.
+    """
+
+    __tablename__ = "tags"
+
+    id = Column(TaskId(), primary_key=True, default=new_task_id)
+    name = Column(String(50), nullable=False)
+    user_id = Column(String(50), ForeignKey("user.id"), nullable=False)
+
+    __table_args__ = (
+        Index("ix_tags_user_id_name", "user_id", "name", unique=True),
+    )
+
+
+class TaskTag(Base):
+    """
+    Tag of a task.
+
+    A mapped row rather than a plain secondary table so that it carries
+    user_id and is written to the shard of its task. task_id has no foreign
+    key, as for subtasks, so that the tags of a task follow it into the
+    archive table.
+    """
+
+    __tablename__ = "task_tags"
+
+    task_id = Column(TaskId(), primary_key=True)
+    tag_id = Column(TaskId(), ForeignKey("tags.id"), primary_key=True)
+    user_id = Column(String(50), nullable=False)
+
+    __table_args__ = (
+        # Tasks with a tag, without touching tasks: the filter subquery reads
+        # the index only
+        Index("ix_task_tags_tag_id_task_id", "tag_id", "task_id"),
+    )
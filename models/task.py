@@ -1,11 +1,13 @@
 import enum
-import uuid
 from typing import List, Optional
 
 from sqlalchemy import (ARRAY, Boolean, Column, DateTime, Enum, Float,
-                        ForeignKey, Integer, String, Text)
+                        ForeignKey, Index, Integer, String, Text)
+from sqlalchemy.orm import foreign, relationship
 
 from db.database import Base
+from db.ids import TaskId, new_task_id
+import models.tag  # noqa: F401  (Tag and TaskTag, for the relationships)
 
 
 class TaskStatus(enum.Enum):
@@ -22,11 +24,112 @@ class TaskPriority(enum.Enum):
 class Task(Base):
     __tablename__ = "tasks"
 
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(TaskId(), primary_key=True, default=new_task_id)
     title = Column(String(200), nullable=False)
     description = Column(String(2048), nullable=False)
     status = Column(Enum(TaskStatus), default=TaskStatus.TODO, nullable=False)
     created_at = Column(DateTime, nullable=False)
     priority = Column(Enum(TaskPriority), nullable=False)
     deadline = Column(DateTime, nullable=False)
-    user_id = Column(String(50), ForeignKey("user.id"), nullable=False)
\ No newline at end of file
+    user_id = Column(String(50), ForeignKey("user.id"), nullable=False)
+    # Set by a soft delete; such tasks are hidden from reads (see db.soft_delete)
+    deleted_at = Column(DateTime, nullable=True)
+    # Series this task is an occurrence of, its deadline being the occurrence
+    recurring_task_id = Column(TaskId(), nullable=True)
+    # Shared list the task belongs to, see models.task_list
+    list_id = Column(TaskId(), nullable=True, index=True)
+    # When the status last became DONE; the archive age counts from it
+    completed_at = Column(DateTime, nullable=True)
+
+    # Loaded for a whole result in one extra SELECT ... WHERE task_id IN (...)
+    subtasks = relationship(
+        "Subtask",
+        primaryjoin="Task.id == foreign(Subtask.task_id)",
+        order_by="Subtask.position",
+        cascade="all, delete-orphan",
+        lazy="selectin",
+    )
+    tag_links = relationship(
+        "TaskTag",
+        primaryjoin="Task.id == foreign(TaskTag.task_id)",
+        cascade="all, delete-orphan",
+    )
+    # Read side of tag_links, which is what crud.task writes
+    tags = relationship(
+        "Tag",
+        secondary="task_tags",
+        primaryjoin="Task.id == foreign(TaskTag.task_id)",
+        secondaryjoin="Tag.id == foreign(TaskTag.tag_id)",
+        order_by="Tag.name",
+        lazy="selectin",
+        viewonly=True,
+    )
+
+    __table_args__ = (
+        Index("ix_tasks_deleted_at", "deleted_at"),
+        Index("ix_tasks_completed_at", "completed_at"),
+        # One task per occurrence, however many materializations race
+        Index("ix_tasks_recurring_task_id_deadline", "recurring_task_id", "deadline", unique=True),
+    )
+
+
+class ArchivedTask(Base):
+    """
+    Completed task moved out of the hot tasks table (see db.archive).
+    """
+
+    __tablename__ = "tasks_archive"
+
+    id = Column(TaskId(), primary_key=True)
+    title = Column(String(200), nullable=False)
+    description = Column(String(2048), nullable=False)
+    status = Column(Enum(TaskStatus), nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    priority = Column(Enum(TaskPriority), nullable=False)
+    deadline = Column(DateTime, nullable=False)
+    user_id = Column(String(50), nullable=False)
+    list_id = Column(TaskId(), nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+    archived_at = Column(DateTime, nullable=False)
+
+    subtasks = relationship(
+        "Subtask",
+        primaryjoin="ArchivedTask.id == foreign(Subtask.task_id)",
+        order_by="Subtask.position",
+        lazy="selectin",
+        viewonly=True,
+    )
+    tags = relationship(
+        "Tag",
+        secondary="task_tags",
+        primaryjoin="ArchivedTask.id == foreign(TaskTag.task_id)",
+        secondaryjoin="Tag.id == foreign(TaskTag.tag_id)",
+        order_by="Tag.name",
+        lazy="selectin",
+        viewonly=True,
+    )
+
+    __table_args__ = (
+        Index("ix_tasks_archive_user_id", "user_id"),
+        # Cold rows are rarely read, so trade some CPU for pages
+        {"mysql_row_format": "COMPRESSED"},
+    )
+
+
+class Subtask(Base):
+    """
+    Checklist item of a task.
+
+    task_id has no foreign key so the items of a task survive its move to the
+    archive table; the purge job deletes them with their task.
+    """
+
+    __tablename__ = "subtasks"
+
+    id = Column(TaskId(), primary_key=True, default=new_task_id)
+    task_id = Column(TaskId(), nullable=False, index=True)
+    # Owner of the task, so the item is stored on the task's shard
+    user_id = Column(String(50), nullable=False)
+    title = Column(String(200), nullable=False)
+    done = Column(Boolean, nullable=False, default=False)
+    position = Column(Integer, nullable=False, default=0)
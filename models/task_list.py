@@ -0,0 +1,52 @@
+import enum
+
+from sqlalchemy import Column, DateTime, Enum, ForeignKey, Index, String
+
+from db.database import Base
+from db.ids import TaskId, new_task_id
+
+
+class ListRole(enum.Enum):
+    OWNER = "owner"
+    EDITOR = "editor"
+    VIEWER = "viewer"
+
+# Each role can do everything the roles below it can
+ROLE_RANKS = {ListRole.VIEWER: 0, ListRole.EDITOR: 1, ListRole.OWNER: 2}
+
+
+def allows(role: ListRole, required: ListRole) -> bool:
+    return role is not None and ROLE_RANKS[role] >= ROLE_RANKS[required]
+
+
+class TaskList(Base):
+    """
+    List of tasks shared between its members.
+
+    Lists and their members live on the main database: tasks.list_id has no
+    foreign key, so tasks on shards can belong to a list too.
+    """
+
+    __tablename__ = "task_lists"
+
+    id = Column(TaskId(), primary_key=True, default=new_task_id)
+    name = Column(String(200), nullable=False)
+    owner_id = Column(String(50), ForeignKey("user.id"), nullable=False)
+    created_at = Column(DateTime, nullable=False)
+
+
+class TaskListMember(Base):
+    """
+    Role of a user in a list; the owner is a member with ListRole.OWNER.
+    """
+
+    __tablename__ = "task_list_members"
+
+    list_id = Column(TaskId(), ForeignKey("task_lists.id"), primary_key=True)
+    user_id = Column(String(50), ForeignKey("user.id"), primary_key=True)
+    role = Column(Enum(ListRole), nullable=False)
+
+    __table_args__ = (
+        # Lists of a user, for GET /lists and the memberships of a request
+        Index("ix_task_list_members_user_id_list_id", "user_id", "list_id"),
+    )
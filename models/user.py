@@ -19,6 +19,6 @@ class User(Base):
     updated_at = Column(
         DateTime(timezone=True),
         index=True,
-        default=datetime.datetime.now(),
+        default=lambda: datetime.datetime.now(datetime.timezone.utc),
         nullable=False,
     )
\ No newline at end of file
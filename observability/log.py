@@ -0,0 +1,191 @@
+"""
+Structured, non-blocking logging.
+
+configure_logging() routes the root logger through a QueueHandler: callers
+only put the record on an in-memory queue, and a QueueListener thread formats
+it and writes it to stdout. Records are rendered as one JSON object per line
+(LOG_FORMAT=json, the default) with the request id of the request that
+emitted them, plus any `extra` fields:
+
+    {"timestamp": "...", "level": "WARNING", "logger": "observability.sql",
+     "message": "Slow query ...", "request_id": "3f2a...", "sql": {...}}
+
+When the queue is full (LOG_QUEUE_SIZE) records are dropped and counted rather
+than blocking the event loop. RequestIdMiddleware takes the request id from
+the X-Request-ID header, or generates one, and returns it in the response.
+"""
+import atexit
+import copy
+import datetime
+import json
+import logging
+import os
+import queue
+import sys
+import uuid
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from observability.metrics import REGISTRY, Counter
+
+load_dotenv()
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json").lower()
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+
+REQUEST_ID_HEADER = b"x-request-id"
+
+LOGS_DROPPED = REGISTRY.register(
+    Counter("log_records_dropped_total", "Log records dropped because the queue was full.")
+)
+
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id"}
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp records with the current request id, in the thread that logs them."""
+
+    def filter(self, record):
+        if not hasattr(record, "request_id"):
+            record.request_id = request_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        data = {
+            "timestamp": datetime.datetime.fromtimestamp(
+                record.created, datetime.timezone.utc
+            ).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                data[key] = value
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exception"] = record.exc_text
+        return json.dumps(data, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of raising when the queue is full."""
+
+    def prepare(self, record):
+        # The stdlib version appends the traceback to the message and drops
+        # exc_info; render it into exc_text instead, which the formatters of
+        # the writer thread output on their own (the "exception" JSON field)
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOGS_DROPPED.inc()
+
+
+_listener: Optional[QueueListener] = None
+_handler: Optional[QueueHandler] = None
+
+
+def configure_logging(level: str = LOG_LEVEL, stream=None):
+    """
+    Route the root logger through the background writer thread.
+
+    Safe to call more than once; later calls are ignored until shutdown_logging().
+
+    :param level: Root log level.
+    :param stream: Output stream, stdout by default.
+    """
+    global _listener, _handler
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    if LOG_FORMAT == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(
+            logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s")
+        )
+
+    records = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    _handler = DroppingQueueHandler(records)
+    _handler.addFilter(RequestIdFilter())
+    _listener = QueueListener(records, output, respect_handler_level=True)
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(_handler)
+    _listener.start()
+
+
+def shutdown_logging():
+    """
+    Flush the queued records and stop the writer thread.
+    """
+    global _listener, _handler
+    if _listener is None:
+        return
+    logging.getLogger().removeHandler(_handler)
+    _listener.stop()
+    _listener = None
+    _handler = None
+
+
+atexit.register(shutdown_logging)
+
+
+class RequestIdMiddleware:
+    """
+    ASGI middleware binding a request id to everything logged for a request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        value = None
+        for name, header in scope["headers"]:
+            if name == REQUEST_ID_HEADER:
+                value = header.decode("latin-1")[:128]
+                break
+        value = value or uuid.uuid4().hex
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = [
+                    *message["headers"],
+                    (REQUEST_ID_HEADER, value.encode("latin-1")),
+                ]
+            await send(message)
+
+        token = request_id.set(value)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id.reset(token)
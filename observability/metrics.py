@@ -0,0 +1,278 @@
+"""
+Prometheus-style metrics.
+
+A small in-process registry rendered in the Prometheus text format at
+/metrics. Recording a sample is a dict lookup and an addition under a lock, so
+the instrumentation can stay on at full load. Metrics are per worker process;
+scrape every worker (or run one worker per container).
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+load_dotenv()
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() == "true"
+
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+Labels = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Labels, extra: str = "") -> str:
+    pairs = [
+        f'{name}="{_escape(value)}"' for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+            *self._samples(),
+        ]
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels = (), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels: Labels = ()) -> float:
+        return self._values.get(labels, 0)
+
+    def _samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, labels: Labels = (), amount: float = 1):
+        self.inc(labels, -amount)
+
+    def set(self, value: float, labels: Labels = ()):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # labels -> [bucket counts..., sum, count]
+        self._values: Dict[Labels, List[float]] = {}
+
+    def observe(self, value: float, labels: Labels = ()):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, labels: Labels = ()) -> int:
+        series = self._values.get(labels)
+        return int(series[-1]) if series else 0
+
+    def _samples(self):
+        with self._lock:
+            values = [(labels, list(series)) for labels, series in self._values.items()]
+        for labels, series in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, series):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                yield (
+                    f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} "
+                    f"{_format_value(cumulative)}"
+                )
+            label_text = _format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{label_text} {_format_value(series[-2])}"
+            yield f"{self.name}_count{label_text} {_format_value(series[-1])}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.register(
+    Counter("http_requests_total", "HTTP requests handled.", ("method", "route", "status"))
+)
+HTTP_REQUEST_DURATION = REGISTRY.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "Time spent handling HTTP requests.",
+        ("method", "route"),
+    )
+)
+HTTP_REQUESTS_IN_FLIGHT = REGISTRY.register(
+    Gauge("http_requests_in_flight", "HTTP requests being handled.")
+)
+DB_STATEMENTS = REGISTRY.register(
+    Counter("db_statements_total", "SQL statements executed.", ("operation",))
+)
+DB_STATEMENT_DURATION = REGISTRY.register(
+    Histogram(
+        "db_statement_duration_seconds",
+        "Time spent executing SQL statements.",
+        ("operation",),
+    )
+)
+AUTH_DURATION = REGISTRY.register(
+    Histogram(
+        "auth_duration_seconds",
+        "Time spent authenticating requests, by phase.",
+        ("phase",),
+    )
+)
+CACHE_REQUESTS = REGISTRY.register(
+    Counter("cache_requests_total", "Cache lookups.", ("cache", "result"))
+)
+
+
+def record_cache(cache: str, hit: bool):
+    """
+    Count a cache lookup; the hit ratio is hits / (hits + misses).
+
+    :param cache: Name of the cache.
+    :param hit: Whether the lookup was served from the cache.
+    """
+    CACHE_REQUESTS.inc((cache, "hit" if hit else "miss"))
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency and count per route, and requests in flight.
+
+    Requests are labelled with the route template (/tasks/{task_id}) rather than
+    the raw path so the number of series stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            route = route_name(scope)
+            HTTP_REQUEST_DURATION.observe(elapsed, (scope["method"], route))
+            HTTP_REQUESTS.inc((scope["method"], route, status))
+
+
+def route_name(scope) -> str:
+    """
+    Get the route template that handled a request.
+
+    :param scope: ASGI scope after routing.
+    :return: Route path template, or "unmatched".
+    """
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def instrument_engine(engine: Engine):
+    """
+    Record the count and duration of every statement run through an engine.
+
+    :param engine: Engine to instrument.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["metrics_started"].pop()
+        operation = (statement.lstrip().split(None, 1) or ["OTHER"])[0].upper()
+        DB_STATEMENTS.inc((operation,))
+        DB_STATEMENT_DURATION.observe(elapsed, (operation,))
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        started = context.connection.info.get("metrics_started") if context.connection else None
+        if started:
+            started.pop()
@@ -0,0 +1,269 @@
+"""
+Opt-in per-request profiling.
+
+The middleware is only installed when PROFILING_ENABLED=true or a
+PROFILING_SECRET is configured, so it costs nothing otherwise. A request is
+profiled when:
+
+- PROFILING_ENABLED=true and it falls in PROFILING_SAMPLE_RATE, optionally
+  restricted to paths starting with one of PROFILING_PATHS, or
+- it carries X-Profile-Expires, a unix time at most
+  PROFILING_SIGNATURE_MAX_TTL_SECONDS ahead, and X-Profile-Signature: hex
+  HMAC-SHA256 of "<METHOD> <path> <expires>" keyed with PROFILING_SECRET. A
+  signature seen in a log or a shell history is useless once it expired.
+
+    python -m observability.profiling sign GET /tasks    # prints both headers
+
+PROFILING_MODE=cprofile writes a pstats file (open with snakeviz or pstats),
+PROFILING_MODE=sampling writes collapsed stacks (flamegraph.pl, speedscope).
+Files go to PROFILING_DIR and the functions of PROFILING_FOCUS modules that
+dominated the request are logged.
+
+Only one request is profiled at a time per worker, and because requests share
+the event loop thread, concurrent requests can show up in the same profile.
+"""
+import argparse
+import asyncio
+import cProfile
+import hashlib
+import hmac
+import io
+import logging
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "false").lower() == "true"
+PROFILING_SECRET = os.environ.get("PROFILING_SECRET")
+PROFILING_SAMPLE_RATE = float(os.environ.get("PROFILING_SAMPLE_RATE", "0.01"))
+PROFILING_PATHS = [p for p in os.environ.get("PROFILING_PATHS", "").split(",") if p]
+PROFILING_MODE = os.environ.get("PROFILING_MODE", "cprofile").lower()
+PROFILING_DIR = os.environ.get("PROFILING_DIR", "profiles")
+PROFILING_INTERVAL_MS = float(os.environ.get("PROFILING_INTERVAL_MS", "2"))
+PROFILING_SIGNATURE_MAX_TTL_SECONDS = int(os.environ.get("PROFILING_SIGNATURE_MAX_TTL_SECONDS", "300"))
+PROFILING_FOCUS = [
+    m
+    for m in os.environ.get("PROFILING_FOCUS", "crud/task.py,auth/JWTBearer.py").split(",")
+    if m
+]
+
+SIGNATURE_HEADER = b"x-profile-signature"
+EXPIRES_HEADER = b"x-profile-expires"
+
+
+def profiling_configured() -> bool:
+    return PROFILING_ENABLED or bool(PROFILING_SECRET)
+
+
+def sign(method: str, path: str, secret: str, expires: int) -> str:
+    """
+    Compute the X-Profile-Signature value for a request.
+
+    :param method: HTTP method.
+    :param path: Request path, without query string.
+    :param secret: Shared profiling secret.
+    :param expires: Unix time after which the signature is refused.
+    :return: Hex HMAC-SHA256 signature.
+    """
+    return hmac.new(
+        secret.encode(), f"{method} {path} {expires}".encode(), hashlib.sha256
+    ).hexdigest()
+
+
+def signature_headers(method: str, path: str, secret: str, ttl: int = 60) -> Dict[str, str]:
+    """
+    Build the headers asking for a request to be profiled.
+
+    :param ttl: Seconds the signature stays valid.
+    :return: X-Profile-Expires and X-Profile-Signature headers.
+    """
+    expires = int(time.time()) + ttl
+    return {
+        "X-Profile-Expires": str(expires),
+        "X-Profile-Signature": sign(method, path, secret, expires),
+    }
+
+
+def _signed(scope) -> bool:
+    headers = dict(scope["headers"])
+    signature, expires = headers.get(SIGNATURE_HEADER), headers.get(EXPIRES_HEADER)
+    if signature is None or expires is None:
+        return False
+    try:
+        expires = int(expires)
+    except ValueError:
+        return False
+    # Also bounded ahead, so that a leaked signature cannot be made to last
+    if not time.time() <= expires <= time.time() + PROFILING_SIGNATURE_MAX_TTL_SECONDS:
+        return False
+    expected = sign(scope["method"], scope["path"], PROFILING_SECRET, expires)
+    return hmac.compare_digest(signature.decode("latin-1"), expected)
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of one thread from a background thread.
+
+    Produces collapsed stacks ("outer;inner;leaf count"), the input format of
+    flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_filename}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.items())
+
+    def focus(self, modules: List[str], limit: int = 10) -> List[Tuple[str, int]]:
+        """
+        Count the samples in which each function of the given modules was on the stack.
+        """
+        totals = Counter()
+        for stack, count in self.stacks.items():
+            for frame in set(stack.split(";")):
+                if any(module in frame for module in modules):
+                    totals[frame] += count
+        return totals.most_common(limit)
+
+
+def cprofile_focus(profile: cProfile.Profile, modules: List[str], limit: int = 10):
+    """
+    Get the functions of the given modules with the highest cumulative time.
+    """
+    stats = pstats.Stats(profile, stream=io.StringIO())
+    rows = [
+        (f"{filename}:{name}", round(cumulative, 6))
+        for (filename, _, name), (_, _, _, cumulative, _) in stats.stats.items()
+        if any(module in filename for module in modules)
+    ]
+    return sorted(rows, key=lambda row: row[1], reverse=True)[:limit]
+
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self._busy = threading.Lock()
+
+    def _wanted(self, scope) -> bool:
+        if PROFILING_SECRET and any(name == SIGNATURE_HEADER for name, _ in scope["headers"]):
+            return _signed(scope)
+
+        if not PROFILING_ENABLED:
+            return False
+        if PROFILING_PATHS and not any(scope["path"].startswith(p) for p in PROFILING_PATHS):
+            return False
+        return random.random() < PROFILING_SAMPLE_RATE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wanted(scope):
+            await self.app(scope, receive, send)
+            return
+
+        # One profile at a time: cProfile cannot nest on a thread
+        if not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        try:
+            if PROFILING_MODE == "sampling":
+                profiler = SamplingProfiler(
+                    threading.get_ident(), PROFILING_INTERVAL_MS / 1000
+                )
+                profiler.start()
+                try:
+                    await self.app(scope, receive, send)
+                finally:
+                    profiler.stop()
+            else:
+                profiler = cProfile.Profile()
+                profiler.enable()
+                try:
+                    await self.app(scope, receive, send)
+                finally:
+                    profiler.disable()
+        finally:
+            self._busy.release()
+
+        elapsed = time.perf_counter() - started
+        await asyncio.to_thread(self._report, scope, profiler, elapsed)
+
+    def _report(self, scope, profiler, elapsed: float) -> Optional[str]:
+        os.makedirs(PROFILING_DIR, exist_ok=True)
+        route = re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_") or "root"
+        base = os.path.join(
+            PROFILING_DIR, f"{time.strftime('%Y%m%dT%H%M%S')}-{scope['method']}-{route}"
+        )
+
+        if isinstance(profiler, SamplingProfiler):
+            path = f"{base}-{os.getpid()}.folded"
+            with open(path, "w") as f:
+                f.write(profiler.collapsed())
+            focus = profiler.focus(PROFILING_FOCUS)
+        else:
+            path = f"{base}-{os.getpid()}.prof"
+            profiler.dump_stats(path)
+            focus = cprofile_focus(profiler, PROFILING_FOCUS)
+
+        logger.info(
+            "Profiled %s %s in %.1fms, wrote %s",
+            scope["method"],
+            scope["path"],
+            elapsed * 1000,
+            path,
+            extra={"profile_path": path, "profile_focus": focus},
+        )
+        return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile requests")
+    commands = parser.add_subparsers(dest="command", required=True)
+    signing = commands.add_parser("sign", help="Print the headers profiling a request")
+    signing.add_argument("method")
+    signing.add_argument("path")
+    signing.add_argument("--ttl", type=int, default=60, help="Seconds the signature stays valid")
+    args = parser.parse_args(argv)
+
+    if not PROFILING_SECRET:
+        parser.error("PROFILING_SECRET is not set")
+    for name, value in signature_headers(args.method.upper(), args.path, PROFILING_SECRET, args.ttl).items():
+        print(f"{name}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Slow-query log and N+1 detector.
+
+instrument_sql(engine) times every statement and, inside a request wrapped by
+SqlDiagnosticsMiddleware, attributes it to that request through a context
+variable (copied into the threads FastAPI runs sync endpoints and
+dependencies in). For each request the statements are counted and grouped by
+shape, the SQL text with its placeholders, so that
+
+- statements slower than SLOW_QUERY_MS are logged with the route that issued
+  them, and their bound parameters when SLOW_QUERY_LOG_PARAMETERS=true (they
+  hold emails, usernames and task text, so only for development), and
+- a shape executed N_PLUS_ONE_THRESHOLD times or more within one request is
+  reported as a likely N+1 pattern.
+
+Diagnostics are off unless SQL_DIAGNOSTICS_ENABLED=true. Findings are logged
+with structured `extra` fields, counted in /metrics and kept in a bounded
+in-memory history served at /debug/sql when SQL_DEBUG_ENDPOINT=true.
+"""
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter as ShapeCounter
+from collections import deque
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from observability.metrics import REGISTRY, Counter, route_name
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+SQL_DIAGNOSTICS_ENABLED = os.environ.get("SQL_DIAGNOSTICS_ENABLED", "false").lower() == "true"
+SQL_DEBUG_ENDPOINT = os.environ.get("SQL_DEBUG_ENDPOINT", "false").lower() == "true"
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_LOG_PARAMETERS = os.environ.get("SLOW_QUERY_LOG_PARAMETERS", "false").lower() == "true"
+N_PLUS_ONE_THRESHOLD = int(os.environ.get("N_PLUS_ONE_THRESHOLD", "5"))
+SQL_DEBUG_HISTORY = int(os.environ.get("SQL_DEBUG_HISTORY", "100"))
+
+MAX_PARAMETERS_LENGTH = 500
+
+SLOW_QUERIES = REGISTRY.register(
+    Counter("db_slow_queries_total", "Statements slower than SLOW_QUERY_MS.", ("route",))
+)
+N_PLUS_ONE = REGISTRY.register(
+    Counter(
+        "db_n_plus_one_total",
+        "Requests that repeated one statement shape N_PLUS_ONE_THRESHOLD times or more.",
+        ("route",),
+    )
+)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """
+    Normalize a statement for grouping; the values are already placeholders.
+    """
+    return _WHITESPACE.sub(" ", statement).strip()
+
+
+class RequestStatements:
+    """SQL statements issued while handling one request."""
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = ShapeCounter()
+        self._lock = threading.Lock()
+
+    def record(self, shape: str, elapsed: float):
+        with self._lock:
+            self.count += 1
+            self.duration += elapsed
+            self.shapes[shape] += 1
+
+    def repeated(self, threshold: Optional[int] = None) -> List[Dict]:
+        threshold = threshold or N_PLUS_ONE_THRESHOLD
+        return [
+            {"statement": shape, "count": count}
+            for shape, count in self.shapes.most_common()
+            if count >= threshold
+        ]
+
+    @property
+    def route(self) -> str:
+        # Routing fills in scope["route"] before the endpoint runs
+        route = route_name(self.scope)
+        return route if route != "unmatched" else self.scope["path"]
+
+    @property
+    def label(self) -> str:
+        return f"{self.scope['method']} {self.route}"
+
+
+_current: ContextVar[Optional[RequestStatements]] = ContextVar("sql_request", default=None)
+
+_slow_queries = deque(maxlen=SQL_DEBUG_HISTORY)
+_n_plus_one = deque(maxlen=SQL_DEBUG_HISTORY)
+_requests = deque(maxlen=SQL_DEBUG_HISTORY)
+
+
+def current_request() -> Optional[RequestStatements]:
+    return _current.get()
+
+
+def _format_parameters(parameters, executemany: bool) -> str:
+    if not SLOW_QUERY_LOG_PARAMETERS:
+        return "<hidden>"
+    if executemany:
+        return f"<{len(parameters)} parameter sets>"
+    text = repr(parameters)
+    if len(text) > MAX_PARAMETERS_LENGTH:
+        return text[:MAX_PARAMETERS_LENGTH] + "..."
+    return text
+
+
+def instrument_sql(engine: Engine):
+    """
+    Attach the slow-query log and per-request statement tracking to an engine.
+
+    :param engine: Engine to instrument.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("sql_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["sql_started"].pop()
+        request = _current.get()
+        if request is not None:
+            request.record(statement_shape(statement), elapsed)
+
+        elapsed_ms = elapsed * 1000
+        if elapsed_ms < SLOW_QUERY_MS:
+            return
+
+        route = request.label if request is not None else None
+        finding = {
+            "statement": statement_shape(statement),
+            "parameters": _format_parameters(parameters, executemany),
+            "duration_ms": round(elapsed_ms, 3),
+            "route": route,
+            "timestamp": time.time(),
+        }
+        _slow_queries.append(finding)
+        SLOW_QUERIES.inc((route or "none",))
+        logger.warning(
+            "Slow query (%.1fms) in %s: %s",
+            elapsed_ms,
+            route or "no request",
+            finding["statement"],
+            extra={"sql": finding},
+        )
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        started = context.connection.info.get("sql_started") if context.connection else None
+        if started:
+            started.pop()
+
+
+def report(request: RequestStatements):
+    """
+    Record the statements of a finished request and report N+1 patterns.
+    """
+    repeated = request.repeated()
+    summary = {
+        "route": request.label,
+        "statements": request.count,
+        "duration_ms": round(request.duration * 1000, 3),
+        "timestamp": time.time(),
+    }
+    _requests.append(summary)
+    if not repeated:
+        return
+
+    finding = {**summary, "repeated": repeated}
+    _n_plus_one.append(finding)
+    N_PLUS_ONE.inc((route_name(request.scope),))
+    logger.warning(
+        "Possible N+1 in %s: %d statements, %s executed %d times",
+        request.label,
+        request.count,
+        repeated[0]["statement"],
+        repeated[0]["count"],
+        extra={"sql": finding},
+    )
+
+
+def findings() -> Dict[str, List[Dict]]:
+    """
+    Get the recent slow queries, N+1 findings and per-request statement counts.
+    """
+    return {
+        "thresholds": {
+            "slow_query_ms": SLOW_QUERY_MS,
+            "n_plus_one": N_PLUS_ONE_THRESHOLD,
+        },
+        "slow_queries": list(_slow_queries),
+        "n_plus_one": list(_n_plus_one),
+        "requests": list(_requests),
+    }
+
+
+def clear():
+    _slow_queries.clear()
+    _n_plus_one.clear()
+    _requests.clear()
+
+
+class SqlDiagnosticsMiddleware:
+    """
+    ASGI middleware collecting the SQL statements issued by each request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = RequestStatements(scope)
+        token = _current.set(request)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current.reset(token)
+            report(request)
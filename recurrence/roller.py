@@ -0,0 +1,177 @@
+"""
+Materialization window of recurring tasks.
+
+Occurrences of a series exist as rows in tasks only up to the series'
+materialized_until. GET /tasks shows occurrences up to RECURRENCE_WINDOW_DAYS
+ahead (or up to its `until` parameter, capped at RECURRENCE_MAX_WINDOW_DAYS)
+and materializes whatever is missing on the fly. RecurrenceRoller keeps every series RECURRENCE_ROLL_AHEAD_DAYS
+ahead in the background, so that requests normally find nothing to write and
+storage only holds a bounded stretch of future occurrences.
+
+    python -m recurrence.roller            # extend every series once
+"""
+import logging
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Sequence
+
+from dotenv import load_dotenv
+from sqlalchemy import or_
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from crud.task import materialize_recurring_task
+from models.recurring_task import RecurringTask
+from observability.metrics import REGISTRY, Counter
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+RECURRENCE_WINDOW_DAYS = float(os.environ.get("RECURRENCE_WINDOW_DAYS", "14"))
+RECURRENCE_ROLL_AHEAD_DAYS = float(os.environ.get("RECURRENCE_ROLL_AHEAD_DAYS", "28"))
+RECURRENCE_MAX_WINDOW_DAYS = float(os.environ.get("RECURRENCE_MAX_WINDOW_DAYS", "90"))
+RECURRENCE_ROLLER_ENABLED = os.environ.get("RECURRENCE_ROLLER_ENABLED", "true").lower() == "true"
+RECURRENCE_ROLL_INTERVAL_SECONDS = float(os.environ.get("RECURRENCE_ROLL_INTERVAL_SECONDS", "3600"))
+RECURRENCE_ROLL_BATCH_SIZE = int(os.environ.get("RECURRENCE_ROLL_BATCH_SIZE", "200"))
+
+OCCURRENCES_MATERIALIZED = REGISTRY.register(
+    Counter(
+        "recurring_task_occurrences_total",
+        "Occurrences of recurring tasks created as tasks.",
+        ("by",),
+    )
+)
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def naive_utc(value: datetime) -> datetime:
+    """
+    Convert to the naive UTC form timestamps are stored and compared in.
+    """
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def window_end(now: Optional[datetime] = None) -> datetime:
+    """
+    Default end of the window shown by GET /tasks.
+    """
+    return (now or utcnow()) + timedelta(days=RECURRENCE_WINDOW_DAYS)
+
+
+def max_window_end(now: Optional[datetime] = None) -> datetime:
+    """
+    Furthest point a request may have series materialized up to.
+    """
+    return (now or utcnow()) + timedelta(days=RECURRENCE_MAX_WINDOW_DAYS)
+
+
+def roll_ahead_end(now: Optional[datetime] = None) -> datetime:
+    """
+    Point up to which series are materialized once they need extending.
+    """
+    return (now or utcnow()) + timedelta(days=RECURRENCE_ROLL_AHEAD_DAYS)
+
+
+def roll(
+    engine: Engine,
+    batch_size: int = RECURRENCE_ROLL_BATCH_SIZE,
+    interval: float = RECURRENCE_ROLL_INTERVAL_SECONDS,
+    stop: Optional[threading.Event] = None,
+) -> int:
+    """
+    Extend the series of one database that would fall behind the window
+    before the next run.
+
+    :param engine: Database holding the series and their tasks.
+    :param batch_size: Series loaded per query.
+    :param interval: Seconds until the next run.
+    :param stop: Interrupts the run between batches once set.
+    :return: Number of tasks created.
+    """
+    now = utcnow()
+    # Leave a margin of two runs so a late run does not expose a gap
+    needed = window_end(now) + timedelta(seconds=2 * interval)
+    target = max(needed, roll_ahead_end(now))
+    created = 0
+    last_id = None
+    while stop is None or not stop.is_set():
+        with Session(bind=engine) as db:
+            query = db.query(RecurringTask).filter(
+                or_(
+                    RecurringTask.materialized_until.is_(None),
+                    RecurringTask.materialized_until < needed,
+                )
+            )
+            if last_id is not None:
+                query = query.filter(RecurringTask.id > last_id)
+            batch = query.order_by(RecurringTask.id).limit(batch_size).all()
+            if batch:
+                last_id = batch[-1].id
+            for definition in batch:
+                created += materialize_recurring_task(definition, target, db)
+        if len(batch) < batch_size:
+            break
+    OCCURRENCES_MATERIALIZED.inc(("roller",), created)
+    if created:
+        logger.info("Materialized %d recurring task occurrences", created)
+    return created
+
+
+class RecurrenceRoller:
+    """
+    Background thread running roll() every RECURRENCE_ROLL_INTERVAL_SECONDS.
+    """
+
+    def __init__(self, engines: Sequence[Engine], interval: float = RECURRENCE_ROLL_INTERVAL_SECONDS):
+        self.engines: List[Engine] = list(engines)
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> int:
+        created = 0
+        for engine in self.engines:
+            try:
+                created += roll(engine, interval=self.interval, stop=self._stop)
+            except Exception:
+                logger.warning("Could not extend the recurring tasks of %s", engine.url, exc_info=True)
+        return created
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="recurrence-roller", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+
+    def _run(self):
+        # Run at startup too: series may have fallen behind while nothing ran
+        while True:
+            self.run_once()
+            if self._stop.wait(self.interval):
+                return
+
+
+def main():
+    from db.database import engine, shards
+
+    logging.basicConfig(level=logging.INFO)
+    print(sum(roll(database) for database in [engine, *shards.engines]))
+
+
+if __name__ == "__main__":
+    main()
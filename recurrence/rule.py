@@ -0,0 +1,145 @@
+"""
+Recurrence rules, a subset of RFC 5545 RRULE:
+
+    FREQ=DAILY;INTERVAL=2
+    FREQ=WEEKLY;BYDAY=MO,WE,FR;UNTIL=20270101T000000Z
+    FREQ=MONTHLY;COUNT=12
+
+FREQ is DAILY, WEEKLY or MONTHLY; INTERVAL defaults to 1; BYDAY is only
+allowed with WEEKLY and defaults to the weekday of the first occurrence;
+COUNT and UNTIL end the series. Occurrences keep the time of day of the first
+one, and monthly ones its day of the month (months without that day are
+skipped, as in RFC 5545).
+"""
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional
+
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY")
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+
+
+class Rule:
+    __slots__ = ("freq", "interval", "byday", "count", "until")
+
+    def __init__(
+        self,
+        freq: str,
+        interval: int = 1,
+        byday: Optional[List[int]] = None,
+        count: Optional[int] = None,
+        until: Optional[datetime] = None,
+    ):
+        self.freq = freq
+        self.interval = interval
+        self.byday = byday
+        self.count = count
+        self.until = until
+
+
+def _parse_until(value: str) -> datetime:
+    for fmt in ("%Y%m%dT%H%M%SZ", "%Y%m%dT%H%M%S", "%Y%m%d"):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    raise ValueError(f"Invalid UNTIL: {value}")
+
+
+def parse_rule(text: str) -> Rule:
+    """
+    Parse a recurrence rule.
+
+    :param text: Rule such as "FREQ=WEEKLY;BYDAY=MO,TH".
+    :return: The parsed rule.
+    :raises ValueError: If the rule is malformed or outside the supported subset.
+    """
+    parts = {}
+    for part in text.strip().removeprefix("RRULE:").split(";"):
+        name, sep, value = part.partition("=")
+        if not sep or not value:
+            raise ValueError(f"Invalid rule part: {part!r}")
+        parts[name.strip().upper()] = value.strip().upper()
+
+    unknown = set(parts) - {"FREQ", "INTERVAL", "BYDAY", "COUNT", "UNTIL"}
+    if unknown:
+        raise ValueError(f"Unsupported rule parts: {', '.join(sorted(unknown))}")
+    if parts.get("FREQ") not in FREQUENCIES:
+        raise ValueError(f"FREQ must be one of {', '.join(FREQUENCIES)}")
+    if "COUNT" in parts and "UNTIL" in parts:
+        raise ValueError("COUNT and UNTIL are mutually exclusive")
+
+    try:
+        interval = int(parts.get("INTERVAL", "1"))
+        count = int(parts["COUNT"]) if "COUNT" in parts else None
+    except ValueError as e:
+        raise ValueError("INTERVAL and COUNT must be integers") from e
+    if interval < 1 or (count is not None and count < 1):
+        raise ValueError("INTERVAL and COUNT must be positive")
+
+    byday = None
+    if "BYDAY" in parts:
+        if parts["FREQ"] != "WEEKLY":
+            raise ValueError("BYDAY is only supported with FREQ=WEEKLY")
+        try:
+            byday = sorted({WEEKDAYS.index(day) for day in parts["BYDAY"].split(",")})
+        except ValueError as e:
+            raise ValueError(f"Invalid BYDAY: {parts['BYDAY']}") from e
+
+    until = _parse_until(parts["UNTIL"]) if "UNTIL" in parts else None
+    return Rule(parts["FREQ"], interval, byday, count, until)
+
+
+def _add_months(start: datetime, months: int) -> Optional[datetime]:
+    month = start.month - 1 + months
+    try:
+        return start.replace(year=start.year + month // 12, month=month % 12 + 1)
+    except ValueError:
+        # No such day in that month
+        return None
+
+
+def _candidates(rule: Rule, start: datetime, first_period: int) -> Iterator[datetime]:
+    period = first_period
+    while True:
+        step = period * rule.interval
+        if rule.freq == "DAILY":
+            yield start + timedelta(days=step)
+        elif rule.freq == "WEEKLY":
+            week = start - timedelta(days=start.weekday()) + timedelta(weeks=step)
+            for day in rule.byday or [start.weekday()]:
+                candidate = week + timedelta(days=day)
+                if candidate >= start:
+                    yield candidate
+        else:
+            candidate = _add_months(start, step)
+            if candidate is not None:
+                yield candidate
+        period += 1
+
+
+def occurrences(
+    rule: Rule, start: datetime, after: Optional[datetime], until: datetime
+) -> Iterator[datetime]:
+    """
+    Get the occurrences of a series within a window.
+
+    :param rule: Parsed rule.
+    :param start: First occurrence of the series.
+    :param after: Exclusive lower bound, or None to start with the first occurrence.
+    :param until: Inclusive upper bound.
+    :return: Occurrences in chronological order.
+    """
+    end = until if rule.until is None else min(until, rule.until)
+
+    first_period = 0
+    if after is not None and rule.count is None and rule.freq != "MONTHLY":
+        # Skip whole periods before the window instead of walking them;
+        # COUNT needs every earlier occurrence counted
+        length = timedelta(days=1 if rule.freq == "DAILY" else 7) * rule.interval
+        first_period = max(0, (after - start) // length - 1)
+
+    for index, occurrence in enumerate(_candidates(rule, start, first_period)):
+        if occurrence > end or (rule.count is not None and index >= rule.count):
+            return
+        if after is None or occurrence > after:
+            yield occurrence
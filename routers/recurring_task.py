@@ -0,0 +1,60 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from auth.auth import get_current_user, get_jwks
+from auth.JWTBearer import JWTBearer
+from crud.recurring_task import (create_recurring_task, delete_recurring_task,
+                                 get_recurring_tasks_by_user_id)
+from crud.user import get_user_by_username
+from db.database import get_db
+from recurrence.roller import roll_ahead_end
+from schemas.recurring_task import RecurringTaskCreate, RecurringTaskInDB
+from throttling.admission import db_admission
+from throttling.rate_limit import (RATE_LIMIT_TASKS_BURST,
+                                   RATE_LIMIT_TASKS_PER_SECOND,
+                                   user_rate_limit)
+
+auth = JWTBearer(get_jwks)
+
+router = APIRouter(
+    tags=["Recurring Tasks"],
+    dependencies=[
+        Depends(
+            user_rate_limit(
+                "tasks", RATE_LIMIT_TASKS_PER_SECOND, RATE_LIMIT_TASKS_BURST, auth
+            )
+        ),
+        Depends(db_admission),
+    ],
+)
+
+@router.post("/recurring-tasks", response_model=RecurringTaskInDB, dependencies=[Depends(auth)], status_code=201)
+async def create_new_recurring_task(recurring_task: RecurringTaskCreate, user_username=Depends(get_current_user), db: Session = Depends(get_db)):
+    user = get_user_by_username(user_username, db)
+
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    return create_recurring_task(recurring_task, user.id, roll_ahead_end(), db)
+
+@router.get("/recurring-tasks", response_model=List[RecurringTaskInDB], dependencies=[Depends(auth)])
+async def get_recurring_tasks(user_username=Depends(get_current_user), db: Session = Depends(get_db)):
+    user = get_user_by_username(user_username, db)
+
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    return get_recurring_tasks_by_user_id(user.id, db)
+
+@router.delete("/recurring-tasks/{recurring_task_id}", dependencies=[Depends(auth)], status_code=204)
+async def delete_recurring_task_by_id(recurring_task_id: str, user_username=Depends(get_current_user), db: Session = Depends(get_db)):
+    user = get_user_by_username(user_username, db)
+
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    delete_recurring_task(recurring_task_id, user.id, db)
+
+    return None
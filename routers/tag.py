@@ -0,0 +1,38 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from auth.auth import get_current_user, get_jwks
+from auth.JWTBearer import JWTBearer
+from crud.tag import get_tag_counts
+from crud.user import get_user_by_username
+from db.database import get_db
+from schemas.tag import TagCount
+from throttling.admission import db_admission
+from throttling.rate_limit import (RATE_LIMIT_TASKS_BURST,
+                                   RATE_LIMIT_TASKS_PER_SECOND,
+                                   user_rate_limit)
+
+auth = JWTBearer(get_jwks)
+
+router = APIRouter(
+    tags=["Tags"],
+    dependencies=[
+        Depends(
+            user_rate_limit(
+                "tasks", RATE_LIMIT_TASKS_PER_SECOND, RATE_LIMIT_TASKS_BURST, auth
+            )
+        ),
+        Depends(db_admission),
+    ],
+)
+
+@router.get("/tags", response_model=List[TagCount], dependencies=[Depends(auth)])
+async def get_tags(user_username=Depends(get_current_user), db: Session = Depends(get_db)):
+    user = get_user_by_username(user_username, db)
+
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    return [TagCount(name=name, count=count) for name, count in get_tag_counts(user.id, db)]
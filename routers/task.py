@@ -1,62 +1,208 @@
+import asyncio
 import logging
-from typing import List
+from datetime import datetime
+from typing import List, Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import (APIRouter, Depends, Header, HTTPException, Query,
+                     Response, status)
+from sqlalchemy.orm import Session, sessionmaker
 
-from auth.auth import get_current_user, jwks
+from auth.auth import get_current_user, get_jwks
 from auth.JWTBearer import JWTBearer
-from crud.task import (create_task, delete_task, get_task_by_id,
-                       get_task_by_status, get_task_by_user_id, update_task)
+from coalescing.single_flight import coalesce
+from crud.task import (add_subtask, create_task, delete_subtask, delete_task,
+                       get_task_by_id, get_task_by_status,
+                       get_task_by_user_id, materialize_recurring_tasks,
+                       restore_task, update_subtask, update_task)
 from crud.user import get_user_by_username
-from db.database import get_db
+from db.database import get_db, get_sessionmaker
+from idempotency.keys import create_task_once
 from models.task import Task as TaskModel
-from schemas.task import TaskCreate, TaskInDB, TaskUpdate
+from recurrence.roller import (OCCURRENCES_MATERIALIZED, max_window_end,
+                               naive_utc, roll_ahead_end, window_end)
+from schemas.task import (SubtaskCreate, SubtaskUpdate, TaskCreate, TaskInDB,
+                          TaskUpdate)
+from throttling.admission import db_admission
+from throttling.rate_limit import (RATE_LIMIT_TASKS_BURST,
+                                   RATE_LIMIT_TASKS_PER_SECOND,
+                                   user_rate_limit)
 
-router = APIRouter(tags=["Tasks"])
+logger = logging.getLogger(__name__)
 
-auth = JWTBearer(jwks)
+auth = JWTBearer(get_jwks)
+
+router = APIRouter(
+    tags=["Tasks"],
+    dependencies=[
+        Depends(
+            user_rate_limit(
+                "tasks", RATE_LIMIT_TASKS_PER_SECOND, RATE_LIMIT_TASKS_BURST, auth
+            )
+        ),
+        Depends(db_admission),
+    ],
+)
+
+# Reads shared by concurrent identical requests, see coalescing.single_flight.
+# They get a session of their own and return what outlives it.
+
+def _read_user(db: Session, username: str):
+    return get_user_by_username(username, db)
+
+def _read_tasks(db: Session, user_id: str, include_archived: bool, tags: List[str], match_all: bool):
+    return [
+        TaskInDB.model_validate(task, from_attributes=True)
+        for task in get_task_by_user_id(user_id, db, include_archived, tags, match_all)
+    ]
+
+def _read_task(db: Session, task_id: str, include_archived: bool, user_id: str):
+    return TaskInDB.model_validate(get_task_by_id(task_id, db, include_archived, user_id), from_attributes=True)
+
+def _read_tasks_by_status(db: Session, status: str, include_archived: bool, user_id: str):
+    return [
+        TaskInDB.model_validate(task, from_attributes=True)
+        for task in get_task_by_status(status, db, include_archived, user_id)
+    ]
 
 @router.post("/tasks", response_model=TaskInDB, dependencies=[Depends(auth)], status_code=201)
-async def create_new_task(task: TaskCreate, user_username=Depends(get_current_user), db: Session = Depends(get_db)):
+async def create_new_task(
+    task: TaskCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None),
+    user_username=Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
     user = get_user_by_username(user_username, db)
 
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
-    
-    return create_task(task, user.id, db)
+
+    if idempotency_key is None:
+        return create_task(task, user.id, db)
+
+    # In a thread: a duplicate waits for the first request with its key
+    created, replayed = await asyncio.to_thread(create_task_once, task, user.id, idempotency_key, db)
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return created
 
 @router.get("/tasks", response_model=List[TaskInDB], dependencies=[Depends(auth)])
-async def get_tasks(user_username=Depends(get_current_user), db: Session = Depends(get_db)):
-    user = get_user_by_username(user_username, db)
+async def get_tasks(
+    include_archived: bool = False,
+    until: Optional[datetime] = None,
+    tag: List[str] = Query([]),
+    tag_match: Literal["all", "any"] = "all",
+    user_username=Depends(get_current_user),
+    db: Session = Depends(get_db),
+    sessions: sessionmaker = Depends(get_sessionmaker),
+):
+    user = await coalesce("user", (user_username,), sessions, _read_user, user_username)
 
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
-    
-    return get_task_by_user_id(user.id, db)
+
+    # Recurring tasks have their occurrences up to `until` created on demand,
+    # within a bounded horizon so that one request cannot create years of them
+    needed = min(naive_utc(until), max_window_end()) if until is not None else window_end()
+    created = materialize_recurring_tasks(user.id, needed, roll_ahead_end(), db)
+    if created:
+        OCCURRENCES_MATERIALIZED.inc(("request",), created)
+
+    # ?tag=a&tag=b: tasks with both tags, or either with tag_match=any
+    args = (user.id, include_archived, tag, tag_match == "all")
+    if created:
+        # On the session that created them: from the primary, and not shared
+        # with a read started before they were committed
+        return _read_tasks(db, *args)
+    return await coalesce(
+        "tasks", (user.id, include_archived, tuple(tag), tag_match), sessions, _read_tasks, *args
+    )
 
 @router.get("/tasks/{task_id}", response_model=TaskInDB, dependencies=[Depends(auth)])
-async def get_task(task_id: str, db: Session = Depends(get_db)):
-    return get_task_by_id(task_id, db)
+async def get_task(task_id: str, include_archived: bool = False, user_username=Depends(get_current_user), sessions: sessionmaker = Depends(get_sessionmaker)):
+    user = await coalesce("user", (user_username,), sessions, _read_user, user_username)
+
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    return await coalesce(
+        "task", (task_id, include_archived, user.id), sessions, _read_task, task_id, include_archived, user.id
+    )
 
 # get tasks by status
 @router.get("/tasks/status/{status}", response_model=List[TaskInDB], dependencies=[Depends(auth)])
-async def get_tasks_by_status(status: str, db: Session = Depends(get_db)):
-    tasks = get_task_by_status(status, db)
-    return tasks
+async def get_tasks_by_status(status: str, include_archived: bool = False, user_username=Depends(get_current_user), sessions: sessionmaker = Depends(get_sessionmaker)):
+    user = await coalesce("user", (user_username,), sessions, _read_user, user_username)
+
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    # Own tasks and those of the user's lists, like GET /tasks
+    return await coalesce(
+        "tasks_by_status",
+        (status, include_archived, user.id),
+        sessions, _read_tasks_by_status, status, include_archived, user.id,
+    )
 
 @router.put("/tasks/{task_id}", response_model=TaskInDB, dependencies=[Depends(auth)])
-async def update_task_by_id(task_id: str, task: TaskUpdate, db: Session = Depends(get_db)):
+async def update_task_by_id(task_id: str, task: TaskUpdate, user_username=Depends(get_current_user), db: Session = Depends(get_db)):
+    user = get_user_by_username(user_username, db)
+
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
     try:   
-        return update_task(task_id, task, db)
+        return update_task(task_id, task, db, user.id)
 
+    except HTTPException:
+        raise
     except Exception as exc:
-        logging.exception("Unexpected error updating task: %s", exc)
+        logger.exception("Unexpected error updating task: %s", exc)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An error occurred while updating the task.") from exc
     
 @router.delete("/tasks/{task_id}", dependencies=[Depends(auth)], status_code=204)
-async def delete_task_by_id(task_id: str, db: Session = Depends(get_db)):
-    
-    delete_task(task_id, db)
+async def delete_task_by_id(task_id: str, user_username=Depends(get_current_user), db: Session = Depends(get_db)):
+    user = get_user_by_username(user_username, db)
+
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    delete_task(task_id, db, user.id)
 
     return None
+
+@router.post("/tasks/{task_id}/restore", response_model=TaskInDB, dependencies=[Depends(auth)])
+async def restore_task_by_id(task_id: str, user_username=Depends(get_current_user), db: Session = Depends(get_db)):
+    user = get_user_by_username(user_username, db)
+
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    return restore_task(task_id, db, user.id)
+
+@router.post("/tasks/{task_id}/subtasks", response_model=TaskInDB, dependencies=[Depends(auth)], status_code=201)
+async def create_subtask(task_id: str, subtask: SubtaskCreate, user_username=Depends(get_current_user), db: Session = Depends(get_db)):
+    user = get_user_by_username(user_username, db)
+
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    return add_subtask(task_id, subtask, db, user.id)
+
+@router.put("/tasks/{task_id}/subtasks/{subtask_id}", response_model=TaskInDB, dependencies=[Depends(auth)])
+async def update_subtask_by_id(task_id: str, subtask_id: str, subtask: SubtaskUpdate, user_username=Depends(get_current_user), db: Session = Depends(get_db)):
+    user = get_user_by_username(user_username, db)
+
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    return update_subtask(task_id, subtask_id, subtask, db, user.id)
+
+@router.delete("/tasks/{task_id}/subtasks/{subtask_id}", response_model=TaskInDB, dependencies=[Depends(auth)])
+async def delete_subtask_by_id(task_id: str, subtask_id: str, user_username=Depends(get_current_user), db: Session = Depends(get_db)):
+    user = get_user_by_username(user_username, db)
+
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    return delete_subtask(task_id, subtask_id, db, user.id)
@@ -0,0 +1,83 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from auth.auth import get_current_user, get_jwks
+from auth.JWTBearer import JWTBearer
+from crud.task_list import (create_task_list, get_task_lists_by_user_id,
+                            remove_member, set_member)
+from crud.user import get_user_by_username
+from db.database import get_db
+from schemas.task_list import (TaskListCreate, TaskListInDB,
+                               TaskListMemberCreate, TaskListMemberInDB)
+from throttling.admission import db_admission
+from throttling.rate_limit import (RATE_LIMIT_TASKS_BURST,
+                                   RATE_LIMIT_TASKS_PER_SECOND,
+                                   user_rate_limit)
+
+auth = JWTBearer(get_jwks)
+
+router = APIRouter(
+    tags=["Task Lists"],
+    dependencies=[
+        Depends(
+            user_rate_limit(
+                "tasks", RATE_LIMIT_TASKS_PER_SECOND, RATE_LIMIT_TASKS_BURST, auth
+            )
+        ),
+        Depends(db_admission),
+    ],
+)
+
+def _task_list(task_list, role) -> TaskListInDB:
+    return TaskListInDB(
+        id=task_list.id,
+        name=task_list.name,
+        owner_id=task_list.owner_id,
+        created_at=task_list.created_at,
+        role=role.value,
+    )
+
+@router.post("/lists", response_model=TaskListInDB, dependencies=[Depends(auth)], status_code=201)
+async def create_new_task_list(task_list: TaskListCreate, user_username=Depends(get_current_user), db: Session = Depends(get_db)):
+    user = get_user_by_username(user_username, db)
+
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    return _task_list(*create_task_list(task_list, user.id, db))
+
+@router.get("/lists", response_model=List[TaskListInDB], dependencies=[Depends(auth)])
+async def get_task_lists(user_username=Depends(get_current_user), db: Session = Depends(get_db)):
+    user = get_user_by_username(user_username, db)
+
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    return [_task_list(task_list, role) for task_list, role in get_task_lists_by_user_id(user.id, db)]
+
+@router.post("/lists/{list_id}/members", response_model=TaskListMemberInDB, dependencies=[Depends(auth)])
+async def add_task_list_member(list_id: str, member: TaskListMemberCreate, user_username=Depends(get_current_user), db: Session = Depends(get_db)):
+    user = get_user_by_username(user_username, db)
+
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    new_member = get_user_by_username(member.username, db)
+
+    if new_member is None:
+        raise HTTPException(status_code=404, detail="Member not found")
+
+    return set_member(list_id, user.id, new_member.id, member.role, db)
+
+@router.delete("/lists/{list_id}/members/{member_id}", dependencies=[Depends(auth)], status_code=204)
+async def remove_task_list_member(list_id: str, member_id: str, user_username=Depends(get_current_user), db: Session = Depends(get_db)):
+    user = get_user_by_username(user_username, db)
+
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    remove_member(list_id, user.id, member_id, db)
+
+    return None
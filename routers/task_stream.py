@@ -0,0 +1,81 @@
+import os
+from typing import AsyncIterator
+
+from dotenv import load_dotenv
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.status import (HTTP_401_UNAUTHORIZED,
+                              HTTP_503_SERVICE_UNAVAILABLE)
+
+from auth.JWTBearer import JWTAuthorizationCredentials
+from events.broker import RESYNC, Subscriber, get_broker
+from routers.task import auth
+from throttling.rate_limit import (RATE_LIMIT_TASKS_BURST,
+                                   RATE_LIMIT_TASKS_PER_SECOND,
+                                   user_rate_limit)
+
+load_dotenv()
+
+# Below the idle timeout of proxies and load balancers in front
+SSE_HEARTBEAT_SECONDS = float(os.environ.get("SSE_HEARTBEAT_SECONDS", "15"))
+SSE_RETRY_MS = int(os.environ.get("SSE_RETRY_MS", "5000"))
+
+# No admission control: a stream holds no database connection while it waits
+router = APIRouter(
+    tags=["Tasks"],
+    dependencies=[
+        Depends(
+            user_rate_limit(
+                "tasks", RATE_LIMIT_TASKS_PER_SECOND, RATE_LIMIT_TASKS_BURST, auth
+            )
+        ),
+    ],
+)
+
+
+async def event_stream(subscriber: Subscriber, heartbeat: float = SSE_HEARTBEAT_SECONDS) -> AsyncIterator[str]:
+    """
+    Format the messages of a subscriber as server-sent events.
+
+    :param subscriber: Subscription to read; released when the stream ends.
+    :param heartbeat: Seconds of silence before a keep-alive comment is sent.
+    """
+    try:
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        while True:
+            message = await subscriber.get(heartbeat)
+            if message is None:
+                yield ": keep-alive\n\n"
+            elif message == RESYNC:
+                # Events were dropped; the client should fetch its tasks again
+                yield "event: resync\ndata: {}\n\n"
+            else:
+                yield f"data: {message}\n\n"
+    finally:
+        get_broker().unsubscribe(subscriber)
+
+
+@router.get("/tasks/stream", response_class=StreamingResponse)
+async def stream_tasks(credentials: JWTAuthorizationCredentials = Depends(auth)):
+    """
+    Stream the caller's task changes as server-sent events.
+
+    Each event carries a JSON object with a "type" (task.created, task.updated
+    or task.deleted) and the "task". A "resync" event means changes were lost
+    and the task list should be fetched again.
+    """
+    user_id = credentials.claims.get("sub")
+    if not user_id:
+        raise HTTPException(status_code=HTTP_401_UNAUTHORIZED, detail="Subject missing")
+    subscriber = get_broker().subscribe(user_id)
+    if subscriber is None:
+        raise HTTPException(
+            status_code=HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many open streams",
+            headers={"Retry-After": "5"},
+        )
+    return StreamingResponse(
+        event_stream(subscriber),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
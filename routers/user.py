@@ -3,27 +3,61 @@ import os
 from dotenv import load_dotenv
 from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.encoders import jsonable_encoder
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, sessionmaker
 from starlette.responses import JSONResponse
 
-from auth.auth import get_current_user, jwks
+from auth.auth import get_current_user, get_jwks
+from auth.cognito import CognitoError, call_cognito
 from auth.JWTBearer import JWTAuthorizationCredentials, JWTBearer
 from auth.user_auth import (auth_with_code, logout_with_token,
                             user_info_with_token)
-from crud.user import create_user, get_user_by_email, get_user_by_username
-from db.database import get_db
-from models.user import User
+from coalescing.single_flight import coalesce
+from crud.user import get_user_by_username, upsert_user
+from db.database import get_db, get_sessionmaker
 from schemas.user import CreateUser
+from throttling.admission import db_admission
+from throttling.rate_limit import (RATE_LIMIT_SIGN_IN_BURST,
+                                   RATE_LIMIT_SIGN_IN_PER_SECOND,
+                                   ip_rate_limit)
 
 load_dotenv()
 
 router = APIRouter(tags=["Authentication and Authorization"])
 
-auth = JWTBearer(jwks)
+auth = JWTBearer(get_jwks)
 
 REDIRECT_URI = os.environ.get("REDIRECT_URI")
 
-@router.post("/auth/sign-in")
+sign_in_rate_limit = ip_rate_limit(
+    "sign_in", RATE_LIMIT_SIGN_IN_PER_SECOND, RATE_LIMIT_SIGN_IN_BURST
+)
+
+
+def user_from_cognito(user_info: dict) -> CreateUser:
+    """
+    Build the user to save from a Cognito GetUser response.
+
+    :param user_info: GetUser response.
+    :return: CreateUser object.
+    """
+    attributes = {
+        attribute["Name"]: attribute["Value"]
+        for attribute in user_info["UserAttributes"]
+    }
+
+    return CreateUser(
+        id=attributes["sub"],
+        given_name=attributes.get("given_name", ""),
+        family_name=attributes.get("family_name", ""),
+        username=user_info["Username"],
+        email=attributes["email"],
+    )
+
+
+@router.post(
+    "/auth/sign-in",
+    dependencies=[Depends(sign_in_rate_limit), Depends(db_admission)],
+)
 async def login(code: str, db: Session = Depends(get_db)):
     """
     Function that logs in a user.
@@ -33,46 +67,47 @@ async def login(code: str, db: Session = Depends(get_db)):
     :return: Access token and expiration time if authentication is successful, otherwise raise an HTTPException.
     """
 
-    # Authenticate user with the code
-    token = auth_with_code(code, REDIRECT_URI)
-    if token is None:
-        raise HTTPException(status_code=401, detail="Error loging in...")
-    else:
+    try:
+        # Authenticate user with the code
+        token = await call_cognito(auth_with_code, code, REDIRECT_URI)
+        if token is None:
+            raise HTTPException(status_code=401, detail="Error loging in...")
+
         # Get user info from the token
-        user_info = user_info_with_token(token.get("token"))
+        user_info = await call_cognito(user_info_with_token, token.get("token"))
+    except CognitoError as e:
+        if e.unavailable:
+            raise HTTPException(status_code=503, detail="Identity provider unavailable")
+        raise HTTPException(status_code=401, detail="Error loging in...")
+
+    if user_info is None:
+        raise HTTPException(status_code=401, detail="Error loging in...")
 
-        new_user = CreateUser(
-            id=user_info["UserAttributes"][4]["Value"],
-            given_name=user_info["UserAttributes"][3]["Value"],
-            family_name=user_info["UserAttributes"][2]["Value"],
-            username=user_info["Username"],
-            email=user_info["UserAttributes"][0]["Value"],
-        )
+    # Save the user, or refresh its names if it already exists
+    upsert_user(user_from_cognito(user_info), db)
 
-        # If the user does not exist, save it
-        if not (
-            db.query(User).filter(User.username == new_user.username).first()
-            or db.query(User).filter(User.email == new_user.email).first()
-        ):
-            create_user(new_user, db)
+    return JSONResponse(status_code=200, content=jsonable_encoder(token))
 
-        return JSONResponse(status_code=200, content=jsonable_encoder(token))
+
+def _read_current_user(db: Session, username: str) -> dict:
+    # Shared by concurrent requests for the user, see coalescing.single_flight
+    return jsonable_encoder(get_user_by_username(username=username, db=db))
 
 
 @router.get("/auth/me", dependencies=[Depends(auth)])
 async def current_user(
-    username: str = Depends(get_current_user), db: Session = Depends(get_db)
+    username: str = Depends(get_current_user), sessions: sessionmaker = Depends(get_sessionmaker)
 ):
     """
     Function that returns the current user.
 
     :param username: Username of the user to get.
-    :param db: Database session.
+    :param sessions: Factory of the session the read opens.
     :return: User object if found, otherwise raise an HTTPException
     """
     return JSONResponse(
         status_code=200,
-        content=jsonable_encoder(get_user_by_username(username=username, db=db)),
+        content=await coalesce("current_user", (username,), sessions, _read_current_user, username),
     )
 
 @router.get("/auth/logout", dependencies=[Depends(auth)])
@@ -84,7 +119,13 @@ async def logout(credentials: JWTAuthorizationCredentials = Depends(auth)):
     :return: Message if logout is successful, otherwise raise an HTTPException.
     """
 
-    result = logout_with_token(credentials.jwt_token)
+    try:
+        result = await call_cognito(logout_with_token, credentials.jwt_token)
+    except CognitoError as e:
+        if e.unavailable:
+            raise HTTPException(status_code=503, detail="Identity provider unavailable")
+        raise HTTPException(status_code=401, detail="Error loging out...")
+
     if result:
         return JSONResponse(status_code=200, content="Logout successful")
     else:
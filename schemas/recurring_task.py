@@ -0,0 +1,27 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel, field_validator
+
+from recurrence.rule import parse_rule
+
+
+class RecurringTask(BaseModel):
+    title: str
+    description: str
+    priority: str
+    rule: str
+    starts_at: datetime
+
+class RecurringTaskCreate(RecurringTask):
+    @field_validator("rule")
+    @classmethod
+    def check_rule(cls, rule: str) -> str:
+        parse_rule(rule)
+        return rule
+
+class RecurringTaskInDB(RecurringTask):
+    id: str
+    created_at: datetime
+    materialized_until: Optional[datetime] = None
+    user_id: str
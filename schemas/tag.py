@@ -0,0 +1,25 @@
+from typing import List
+
+from pydantic import BaseModel
+
+TAG_MAX_LENGTH = 50
+
+
+def normalize_tags(names: List[str]) -> List[str]:
+    """
+    Strip tag names and drop duplicates, keeping the first occurrence.
+
+    :raises ValueError: If a name is empty or longer than TAG_MAX_LENGTH.
+    """
+    tags = []
+    for name in names:
+        name = name.strip()
+        if not name or len(name) > TAG_MAX_LENGTH:
+            raise ValueError(f"Tags must be 1 to {TAG_MAX_LENGTH} characters long")
+        if name not in tags:
+            tags.append(name)
+    return tags
+
+class TagCount(BaseModel):
+    name: str
+    count: int
@@ -1,8 +1,22 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 
+from schemas.tag import normalize_tags
+
+
+class SubtaskCreate(BaseModel):
+    title: str
+
+class SubtaskUpdate(BaseModel):
+    title: Optional[str] = None
+    done: Optional[bool] = None
+
+class SubtaskInDB(SubtaskCreate):
+    id: str
+    done: bool
+    position: int
 
 class Task(BaseModel):
     title: str
@@ -11,7 +25,15 @@ class Task(BaseModel):
     deadline: datetime
 
 class TaskCreate(Task):
-    pass
+    # Shared list to add the task to; requires the editor role in it
+    list_id: Optional[str] = None
+    subtasks: List[SubtaskCreate] = []
+    tags: List[str] = []
+
+    @field_validator("tags")
+    @classmethod
+    def check_tags(cls, tags: List[str]) -> List[str]:
+        return normalize_tags(tags)
 
 class TaskUpdate(Task):
     title : Optional[str] = None
@@ -19,9 +41,26 @@ class TaskUpdate(Task):
     status: Optional[str] = None
     priority: Optional[str] = None
     deadline: Optional[datetime] = None
+    # Replaces every tag of the task when set
+    tags: Optional[List[str]] = None
+
+    @field_validator("tags")
+    @classmethod
+    def check_tags(cls, tags: Optional[List[str]]) -> Optional[List[str]]:
+        return None if tags is None else normalize_tags(tags)
 
 class TaskInDB(Task):
     id: str
     created_at: datetime
     status: str
-    user_id: str
\ No newline at end of file
+    user_id: str
+    recurring_task_id: Optional[str] = None
+    list_id: Optional[str] = None
+    subtasks: List[SubtaskInDB] = []
+    tags: List[str] = []
+
+    @field_validator("tags", mode="before")
+    @classmethod
+    def tag_names(cls, tags):
+        # Read from the Tag objects of the model
+        return [getattr(tag, "name", tag) for tag in tags]
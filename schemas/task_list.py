@@ -0,0 +1,24 @@
+from datetime import datetime
+from typing import Literal
+
+from pydantic import BaseModel
+
+
+class TaskListCreate(BaseModel):
+    name: str
+
+class TaskListInDB(TaskListCreate):
+    id: str
+    owner_id: str
+    created_at: datetime
+    # Role of the requesting user
+    role: str
+
+class TaskListMemberCreate(BaseModel):
+    username: str
+    role: Literal["editor", "viewer"]
+
+class TaskListMemberInDB(BaseModel):
+    list_id: str
+    user_id: str
+    role: str
@@ -0,0 +1,130 @@
+"""
+Production server.
+
+    python -m server                        # one worker per available core
+    python -m server --workers 4 --port 8080
+
+Runs main:app under uvicorn's process manager. Every setting can also be given
+in the environment (WEB_CONCURRENCY, PORT, KEEP_ALIVE_SECONDS, ...), the
+command line wins. uvloop and httptools are used when they are installed
+(`pip install uvicorn[standard]`), otherwise the pure-Python asyncio loop and
+h11 parser.
+
+Each worker runs the application lifespan (schema check, connection pool and
+signing key warm-up, see main.py) before it starts accepting connections.
+"""
+import argparse
+import importlib.util
+import os
+from typing import Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+HOST = os.environ.get("HOST", "0.0.0.0")
+PORT = int(os.environ.get("PORT", "8000"))
+WEB_CONCURRENCY = os.environ.get("WEB_CONCURRENCY")
+# Longer than the idle timeout of the load balancer in front (60s on an ALB),
+# so the balancer closes idle connections and never reuses one we just closed.
+KEEP_ALIVE_SECONDS = int(os.environ.get("KEEP_ALIVE_SECONDS", "75"))
+BACKLOG = int(os.environ.get("BACKLOG", "2048"))
+GRACEFUL_TIMEOUT_SECONDS = int(os.environ.get("GRACEFUL_TIMEOUT_SECONDS", "30"))
+LIMIT_CONCURRENCY = os.environ.get("LIMIT_CONCURRENCY")
+LIMIT_MAX_REQUESTS = os.environ.get("LIMIT_MAX_REQUESTS")
+FORWARDED_ALLOW_IPS = os.environ.get("FORWARDED_ALLOW_IPS", "127.0.0.1")
+ACCESS_LOG = os.environ.get("ACCESS_LOG", "false").lower() == "true"
+
+
+def available_cpus() -> int:
+    """
+    Count the cores this process may use, honouring container CPU limits.
+
+    :return: cgroup CPU quota, else CPU affinity, else the machine's core count.
+    """
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            return max(1, int(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def default_workers() -> int:
+    if WEB_CONCURRENCY:
+        return int(WEB_CONCURRENCY)
+    return available_cpus()
+
+
+def event_loop() -> str:
+    return "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+
+
+def http_protocol() -> str:
+    return "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+
+def _optional_int(value: Optional[str]) -> Optional[int]:
+    return int(value) if value else None
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the To-Do List API")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=None, help="Default: available cores")
+    parser.add_argument("--keep-alive", type=int, default=KEEP_ALIVE_SECONDS)
+    parser.add_argument("--backlog", type=int, default=BACKLOG)
+    parser.add_argument("--graceful-timeout", type=int, default=GRACEFUL_TIMEOUT_SECONDS)
+    parser.add_argument(
+        "--limit-concurrency",
+        type=int,
+        default=_optional_int(LIMIT_CONCURRENCY),
+        help="Answer 503 above this many connections per worker",
+    )
+    parser.add_argument(
+        "--limit-max-requests",
+        type=int,
+        default=_optional_int(LIMIT_MAX_REQUESTS),
+        help="Restart a worker after this many requests",
+    )
+    parser.add_argument("--access-log", action="store_true", default=ACCESS_LOG)
+    return parser.parse_args(argv)
+
+
+def uvicorn_options(args: argparse.Namespace) -> dict:
+    """
+    Translate the command line into uvicorn.run keyword arguments.
+    """
+    return {
+        "host": args.host,
+        "port": args.port,
+        "workers": args.workers or default_workers(),
+        "loop": event_loop(),
+        "http": http_protocol(),
+        "backlog": args.backlog,
+        "timeout_keep_alive": args.keep_alive,
+        "timeout_graceful_shutdown": args.graceful_timeout,
+        "limit_concurrency": args.limit_concurrency,
+        "limit_max_requests": args.limit_max_requests,
+        "proxy_headers": True,
+        "forwarded_allow_ips": FORWARDED_ALLOW_IPS,
+        "access_log": args.access_log,
+        "server_header": False,
+        # Logging is set up by the application (observability.log)
+        "log_config": None,
+    }
+
+
+def main(argv=None):
+    import uvicorn
+
+    uvicorn.run("main:app", **uvicorn_options(parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import copy
+
+from benchmarks.api import DEFAULT_MIX, compare, parse_mix, run
+from benchmarks.stats import percentile, summarize
+
+
+def test_percentile():
+    samples = [float(i) for i in range(1, 102)]
+    assert percentile(samples, 50) == 51.0
+    assert percentile(samples, 100) == 101.0
+    assert percentile([3.0], 99) == 3.0
+
+
+def test_summarize_empty():
+    assert summarize([], 1.0)["count"] == 0
+
+
+def test_run_small_load(tmp_path):
+    report = run(
+        db_url=f"sqlite:///{tmp_path / 'bench.db'}",
+        users=2,
+        tasks_per_user=5,
+        requests=40,
+        concurrency=4,
+        warmup=0,
+    )
+
+    assert report["meta"]["database"] == "sqlite"
+    assert report["total"]["count"] == 40
+    assert report["total"]["errors"] == 0
+    assert set(report["endpoints"]) == set(parse_mix(DEFAULT_MIX))
+    for stats in report["endpoints"].values():
+        assert {"p50_ms", "p95_ms", "p99_ms", "throughput_rps", "errors"} <= set(stats)
+
+
+def test_compare_flags_regressions():
+    baseline = {
+        "endpoints": {
+            "list_tasks": {"count": 10, "p95_ms": 10.0, "throughput_rps": 100.0, "errors": 0}
+        }
+    }
+    report = copy.deepcopy(baseline)
+    assert compare(report, baseline, 0.2) == []
+
+    report["endpoints"]["list_tasks"].update(p95_ms=20.0, throughput_rps=50.0)
+    regressions = compare(report, baseline, 0.2)
+    assert len(regressions) == 2
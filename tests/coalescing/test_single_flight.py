@@ -0,0 +1,169 @@
+import asyncio
+import threading
+from unittest.mock import MagicMock
+
+from fastapi import HTTPException
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from coalescing import single_flight
+from coalescing.single_flight import coalesce, write_generation
+from crud.task import create_task, get_task_by_id, update_task
+from models.user import User
+from schemas.task import TaskInDB, TaskUpdate
+from tests.conftest import new_task
+
+
+class BlockingRead:
+    """
+    A read counting its calls, each blocked until released.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, db, value):
+        self.calls += 1
+        self.started.set()
+        assert self.release.wait(5)
+        return value
+
+
+def no_db():
+    return MagicMock(spec=Session)
+
+
+async def started(read: BlockingRead):
+    assert await asyncio.to_thread(read.started.wait, 5)
+
+
+def test_concurrent_identical_reads_share_one_call():
+    read = BlockingRead()
+
+    async def main():
+        reads = [asyncio.ensure_future(coalesce("test", ("key",), no_db, read, "result")) for _ in range(8)]
+        await started(read)
+        read.release.set()
+        return await asyncio.gather(*reads)
+
+    assert asyncio.run(main()) == ["result"] * 8
+    assert read.calls == 1
+
+
+def test_reads_with_other_keys_run_on_their_own():
+    read = BlockingRead()
+    read.release.set()
+
+    async def main():
+        return await asyncio.gather(*(coalesce("test", (key,), no_db, read, key) for key in ("a", "b", "a")))
+
+    assert asyncio.run(main()) == ["a", "b", "a"]
+    assert read.calls == 2
+
+
+def test_errors_are_shared_and_not_kept():
+    calls = []
+
+    def fail(db):
+        calls.append(1)
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    async def main():
+        return await asyncio.gather(*(coalesce("test", ("key",), no_db, fail) for _ in range(3)), return_exceptions=True)
+
+    errors = asyncio.run(main())
+    assert [error.status_code for error in errors] == [404] * 3
+    asyncio.run(main())
+    assert len(calls) == 2
+
+
+def test_reads_after_a_write_do_not_join_earlier_calls(sessions):
+    read = BlockingRead()
+
+    async def main():
+        before = asyncio.ensure_future(coalesce("test", ("key",), no_db, read, "before"))
+        await started(read)
+        with sessions() as db:
+            create_task(new_task(), "user-1", db)
+        after = asyncio.ensure_future(coalesce("test", ("key",), no_db, read, "after"))
+        read.release.set()
+        return await asyncio.gather(before, after)
+
+    assert asyncio.run(main()) == ["before", "after"]
+    assert read.calls == 2
+
+
+def test_only_commits_of_writes_change_the_generation(sessions):
+    generation = write_generation()
+    with sessions() as db:
+        db.query(User).all()
+        db.commit()
+        assert write_generation() == generation
+
+        db.add(User(id="user-3", given_name="A", family_name="B", username="user-3", email="user-3@example.com"))
+        db.flush()
+        db.rollback()
+        assert write_generation() == generation
+
+        update_task(create_task(new_task(), "user-1", db).id, TaskUpdate(title="renamed"), db)
+        assert write_generation() == generation + 2
+
+
+def test_concurrent_task_reads_run_one_query(engine, sessions):
+    with sessions() as db:
+        task_id = create_task(new_task(), "user-1", db).id
+    selects = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and "FROM tasks" in statement:
+            selects.append(statement)
+
+    def read(db):
+        return TaskInDB.model_validate(get_task_by_id(task_id, db, user_id="user-1"), from_attributes=True)
+
+    async def main():
+        return await asyncio.gather(*(coalesce("task", (task_id, "user-1"), sessions, read) for _ in range(5)))
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        bodies = asyncio.run(main())
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    assert {body.id for body in bodies} == {task_id}
+    assert len(selects) == 1
+
+
+def test_coalescing_can_be_disabled(monkeypatch):
+    monkeypatch.setattr(single_flight, "READ_COALESCING_ENABLED", False)
+    read = BlockingRead()
+    read.release.set()
+
+    async def main():
+        return await asyncio.gather(*(coalesce("test", ("key",), no_db, read, "result") for _ in range(3)))
+
+    assert asyncio.run(main()) == ["result"] * 3
+    assert read.calls == 3
+
+
+def test_reads_run_on_their_own_threads_and_sessions(sessions):
+    opened = []
+
+    def tracked():
+        db = sessions()
+        opened.append((db, threading.current_thread().name))
+        return db
+
+    def read(db):
+        return db.get(User, "user-1").username
+
+    async def main():
+        return await coalesce("test", ("key",), tracked, read)
+
+    assert asyncio.run(main()) == "user-1"
+    [(db, thread)] = opened
+    assert thread.startswith("coalesced-read")
+    # Closed once the read is done: nothing is left in it
+    assert list(db) == []
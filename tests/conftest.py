@@ -0,0 +1,108 @@
+from datetime import datetime, timezone
+from typing import Iterable
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+import crud.task
+from db.database import Base
+from db.sharding import ShardSet
+from models.user import User
+from schemas.task import TaskCreate
+
+USERS = ("user-1", "user-2")
+
+
+def add_users(engine: Engine, user_ids: Iterable[str]):
+    with Session(bind=engine) as session:
+        session.add_all(
+            User(id=user_id, given_name="A", family_name="B", username=user_id, email=f"{user_id}@example.com")
+            for user_id in user_ids
+        )
+        session.commit()
+
+
+def new_task(title="title", **fields) -> TaskCreate:
+    # A fixed deadline, so that equal calls make equal requests
+    return TaskCreate(
+        title=title,
+        description="description",
+        priority="low",
+        deadline=datetime(2030, 1, 1, tzinfo=timezone.utc),
+        **fields,
+    )
+
+
+@pytest.fixture
+def users():
+    """
+    Ids of the users the databases start with; override in a module to change them.
+    """
+    return USERS
+
+
+@pytest.fixture
+def engine(tmp_path, users):
+    # A file, not a shared in-memory connection: some tests use it from
+    # several threads
+    engine = create_engine(f"sqlite:///{tmp_path / 'tasks.db'}")
+    Base.metadata.create_all(engine)
+    add_users(engine, users)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def sessions(engine):
+    return sessionmaker(bind=engine, autoflush=False)
+
+
+@pytest.fixture
+def db(sessions):
+    with sessions() as session:
+        yield session
+
+
+@pytest.fixture
+def statements(engine):
+    executed = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    yield executed
+    event.remove(engine, "before_cursor_execute", count)
+
+
+@pytest.fixture
+def broken_engine():
+    """
+    A database that cannot be reached, for jobs going over several of them.
+    """
+    engine = create_engine("sqlite:////nonexistent/directory/tasks.db")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def shard_count():
+    return 3
+
+
+@pytest.fixture
+def shards(tmp_path, users, shard_count, monkeypatch):
+    """
+    Shards next to a main database holding the users, used by crud.task.
+    """
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    Base.metadata.create_all(primary)
+    add_users(primary, users)
+    shard_set = ShardSet(primary, [f"sqlite:///{tmp_path / f'shard{i}.db'}" for i in range(shard_count)])
+    shard_set.upgrade()
+    monkeypatch.setattr(crud.task, "shards", shard_set)
+    yield shard_set
+    shard_set.dispose()
+    primary.dispose()
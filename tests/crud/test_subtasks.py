@@ -0,0 +1,84 @@
+import json
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from crud.task import (add_subtask, create_task, delete_subtask,
+                       get_task_by_id, get_task_by_user_id, update_subtask)
+from db.archive import archive
+from models.outbox import OutboxEvent
+from models.task import Subtask
+from models.task import Task as TaskModel
+from models.task import TaskStatus
+from schemas.task import SubtaskCreate, SubtaskUpdate, TaskInDB
+from tests.conftest import new_task
+
+
+def subtasks(*titles):
+    return [SubtaskCreate(title=title) for title in titles]
+
+
+def test_subtasks_are_created_with_their_task(db):
+    task = create_task(new_task(subtasks=subtasks("first", "second")), "user-1", db)
+
+    body = TaskInDB.model_validate(task, from_attributes=True)
+    assert [(item.title, item.done, item.position) for item in body.subtasks] == [
+        ("first", False, 0),
+        ("second", False, 1),
+    ]
+
+
+@pytest.mark.parametrize("tasks", [10, 100])
+def test_a_page_of_tasks_loads_subtasks_in_one_query(engine, db, statements, tasks):
+    for _ in range(tasks):
+        create_task(new_task(subtasks=subtasks("a", "b", "c")), "user-1", db)
+    db.expunge_all()
+    statements.clear()
+
+    page = [TaskInDB.model_validate(task, from_attributes=True) for task in get_task_by_user_id("user-1", db)]
+
+    assert len(page) == tasks
+    assert all(len(task.subtasks) == 3 for task in page)
+    # The user's list memberships, one SELECT for the tasks, then one each
+    # for the subtasks and the tags of all of them
+    assert len(statements) == 4
+
+
+def test_subtask_changes_update_the_task(engine, db):
+    task = create_task(new_task(subtasks=subtasks("first")), "user-1", db)
+    first = task.subtasks[0].id
+
+    add_subtask(task.id, SubtaskCreate(title="second"), db)
+    update_subtask(task.id, first, SubtaskUpdate(done=True), db)
+    task = delete_subtask(task.id, task.subtasks[1].id, db)
+
+    assert [(item.title, item.done) for item in task.subtasks] == [("first", True)]
+    with Session(bind=engine) as session:
+        topics = session.scalars(select(OutboxEvent.topic).order_by(OutboxEvent.id)).all()
+        last = json.loads(session.scalars(select(OutboxEvent.payload).order_by(OutboxEvent.id.desc())).first())
+        assert session.scalars(select(Subtask.title)).all() == ["first"]
+    assert topics == ["task.created", *["task.updated"] * 3]
+    assert [item["title"] for item in last["task"]["subtasks"]] == ["first"]
+
+
+def test_unknown_subtask_is_not_found(db):
+    task = create_task(new_task(), "user-1", db)
+
+    with pytest.raises(HTTPException) as e:
+        update_subtask(task.id, "missing", SubtaskUpdate(done=True), db)
+    assert e.value.status_code == 404
+
+
+def test_archived_tasks_keep_their_subtasks(engine, db):
+    task = create_task(new_task(subtasks=subtasks("first")), "user-1", db)
+    with Session(bind=engine) as session, session.begin():
+        session.query(TaskModel).update({"status": TaskStatus.DONE, "completed_at": datetime(2000, 1, 1)})
+
+    assert archive(engine, pause=0) == 1
+
+    db.expunge_all()
+    archived = get_task_by_id(task.id, db, include_archived=True)
+    assert [item.title for item in archived.subtasks] == ["first"]
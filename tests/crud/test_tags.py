@@ -0,0 +1,129 @@
+import pytest
+from pydantic import ValidationError
+from sqlalchemy import event, func, select
+
+from crud.tag import get_or_create_tags, get_tag_counts
+from crud.task import (create_task, delete_task, get_task_by_user_id,
+                       update_task)
+from models.tag import Tag, TaskTag
+from schemas.task import TaskInDB, TaskUpdate
+from tests.conftest import new_task
+
+
+def titles(tasks):
+    return sorted(task.title for task in tasks)
+
+
+@pytest.fixture
+def tagged(db):
+    create_task(new_task("both", tags=["home", "urgent"]), "user-1", db)
+    create_task(new_task("home", tags=["home"]), "user-1", db)
+    create_task(new_task("urgent", tags=["urgent"]), "user-1", db)
+    create_task(new_task("none"), "user-1", db)
+    create_task(new_task("other user", tags=["home", "urgent"]), "user-2", db)
+
+
+def test_tags_are_returned_with_the_task(db):
+    task = create_task(new_task("task", tags=["urgent", "home", "urgent"]), "user-1", db)
+
+    assert TaskInDB.model_validate(task, from_attributes=True).tags == ["home", "urgent"]
+
+
+def test_tags_are_shared_by_name_per_user(db):
+    create_task(new_task("a", tags=["home"]), "user-1", db)
+    create_task(new_task("b", tags=["home"]), "user-1", db)
+    create_task(new_task("c", tags=["home"]), "user-2", db)
+
+    assert db.query(Tag).filter(Tag.user_id == "user-1").count() == 1
+    assert db.query(Tag).count() == 2
+
+
+def test_get_or_create_tags_keeps_the_order(db):
+    get_or_create_tags("user-1", ["b"], db)
+
+    assert [tag.name for tag in get_or_create_tags("user-1", ["c", "b", "a"], db)] == ["c", "b", "a"]
+
+
+def test_get_or_create_tags_when_a_concurrent_request_created_one(sessions, db):
+    created = []
+
+    def create_concurrently(session, flush_context, instances):
+        if created:
+            return
+        created.append("b")
+        with sessions() as other:
+            other.add(Tag(name="b", user_id="user-1"))
+            other.commit()
+
+    event.listen(db, "before_flush", create_concurrently)
+    tags = get_or_create_tags("user-1", ["a", "b", "c"], db)
+    db.commit()
+    event.remove(db, "before_flush", create_concurrently)
+
+    assert [tag.name for tag in tags] == ["a", "b", "c"]
+    assert db.query(Tag).count() == 3
+
+
+def test_filter_requires_every_tag_by_default(db, tagged):
+    assert titles(get_task_by_user_id("user-1", db, tags=["home", "urgent"])) == ["both"]
+
+
+def test_filter_can_match_any_tag(db, tagged):
+    tasks = get_task_by_user_id("user-1", db, tags=["home", "urgent"], match_all=False)
+
+    assert titles(tasks) == ["both", "home", "urgent"]
+
+
+def test_filter_on_an_unknown_tag_matches_nothing(db, tagged):
+    assert get_task_by_user_id("user-1", db, tags=["home", "missing"]) == []
+    assert titles(get_task_by_user_id("user-1", db, tags=["home", "missing"], match_all=False)) == [
+        "both",
+        "home",
+    ]
+
+
+def test_update_replaces_the_tags(db):
+    task = create_task(new_task("task", tags=["home", "urgent"]), "user-1", db)
+
+    task = update_task(task.id, TaskUpdate(tags=["work"]), db)
+
+    assert [tag.name for tag in task.tags] == ["work"]
+    assert get_task_by_user_id("user-1", db, tags=["home"]) == []
+
+
+def test_tag_names_are_validated():
+    with pytest.raises(ValidationError):
+        new_task("task", tags=[" "])
+    assert new_task("task", tags=[" home ", "home"]).tags == ["home"]
+
+
+def test_tag_counts_come_from_one_query(engine, db, tagged):
+    urgent = next(task for task in get_task_by_user_id("user-1", db) if task.title == "urgent")
+    delete_task(urgent.id, db)
+    executed = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        counts = get_tag_counts("user-1", db)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    # The deleted task is not counted
+    assert [tuple(row) for row in counts] == [("home", 2), ("urgent", 1)]
+    assert len(executed) == 1
+
+
+def test_sharded_tags_are_stored_with_their_task(shards):
+    with shards.sessionmaker(autoflush=False)() as session:
+        create_task(new_task("both", tags=["home", "urgent"]), "user-1", session)
+        create_task(new_task("home", tags=["home"]), "user-1", session)
+
+    with shards.sessionmaker(autoflush=False)() as session:
+        assert titles(get_task_by_user_id("user-1", session, tags=["home", "urgent"])) == ["both"]
+        assert [tuple(row) for row in get_tag_counts("user-1", session)] == [("home", 2), ("urgent", 1)]
+
+    with shards.engine_for("user-1").connect() as conn:
+        assert conn.execute(select(func.count()).select_from(TaskTag.__table__)).scalar() == 3
@@ -0,0 +1,144 @@
+import pytest
+from fastapi import HTTPException
+
+from crud.task import (create_task, delete_task, get_task_by_id,
+                       get_task_by_status, get_task_by_user_id, update_task)
+from crud.task_list import (create_task_list, get_memberships,
+                            get_task_lists_by_user_id, remove_member,
+                            set_member)
+from models.task_list import ListRole
+from schemas.task import TaskUpdate
+from schemas.task_list import TaskListCreate
+from tests.conftest import new_task
+
+USERS = ("owner", "editor", "viewer", "stranger")
+
+
+@pytest.fixture
+def users():
+    return USERS
+
+
+def shared_list(db):
+    task_list, _ = create_task_list(TaskListCreate(name="Groceries"), "owner", db)
+    set_member(task_list.id, "owner", "editor", "editor", db)
+    set_member(task_list.id, "owner", "viewer", "viewer", db)
+    return task_list.id
+
+
+def test_tasks_are_private_to_their_creator(db):
+    task = create_task(new_task(), "owner", db)
+
+    assert get_task_by_id(task.id, db, user_id="owner").id == task.id
+    for call in (
+        lambda: get_task_by_id(task.id, db, user_id="stranger"),
+        lambda: update_task(task.id, TaskUpdate(title="mine"), db, "stranger"),
+        lambda: delete_task(task.id, db, "stranger"),
+    ):
+        with pytest.raises(HTTPException) as e:
+            call()
+        assert e.value.status_code == 404
+
+
+def test_members_have_their_role_in_the_list(db):
+    list_id = shared_list(db)
+    task = create_task(new_task(list_id=list_id), "editor", db)
+
+    assert get_task_by_id(task.id, db, user_id="viewer").id == task.id
+    with pytest.raises(HTTPException) as e:
+        update_task(task.id, TaskUpdate(title="renamed"), db, "viewer")
+    assert e.value.status_code == 403
+
+    assert update_task(task.id, TaskUpdate(title="renamed"), db, "owner").title == "renamed"
+    delete_task(task.id, db, "editor")
+    with pytest.raises(HTTPException):
+        get_task_by_id(task.id, db, user_id="owner")
+
+
+def test_only_editors_add_tasks_to_a_list(db):
+    list_id = shared_list(db)
+
+    with pytest.raises(HTTPException) as e:
+        create_task(new_task(list_id=list_id), "viewer", db)
+    assert e.value.status_code == 403
+    with pytest.raises(HTTPException) as e:
+        create_task(new_task(list_id=list_id), "stranger", db)
+    assert e.value.status_code == 404
+
+
+def test_task_lists_include_the_shared_tasks(db):
+    list_id = shared_list(db)
+    create_task(new_task("shared", list_id=list_id), "editor", db)
+    create_task(new_task("private"), "editor", db)
+    create_task(new_task("own"), "viewer", db)
+
+    assert sorted(task.title for task in get_task_by_user_id("viewer", db)) == ["own", "shared"]
+    assert [task.title for task in get_task_by_user_id("stranger", db)] == []
+
+
+def test_tasks_by_status_are_scoped_like_task_lists(db):
+    list_id = shared_list(db)
+    create_task(new_task("shared", list_id=list_id), "editor", db)
+    create_task(new_task("private"), "editor", db)
+    create_task(new_task("own"), "viewer", db)
+
+    assert sorted(task.title for task in get_task_by_status("todo", db, user_id="viewer")) == ["own", "shared"]
+    assert [task.title for task in get_task_by_status("todo", db, user_id="stranger")] == []
+    assert [task.title for task in get_task_by_status("done", db, user_id="viewer")] == []
+
+
+def test_access_is_resolved_by_the_query_loading_the_task(db, statements):
+    list_id = shared_list(db)
+    task = create_task(new_task(list_id=list_id), "editor", db)
+    db.expunge_all()
+    statements.clear()
+
+    get_task_by_id(task.id, db, user_id="viewer")
+
+    # The task joined to the membership, then its subtasks and tags
+    assert len(statements) == 3
+    assert "task_list_members" in statements[0]
+
+
+def test_memberships_are_looked_up_once_per_session(db, statements):
+    list_id = shared_list(db)
+    statements.clear()
+
+    assert get_memberships("viewer", db) == {list_id: ListRole.VIEWER}
+    get_memberships("viewer", db)
+    assert len(statements) == 1
+
+    remove_member(list_id, "owner", "viewer", db)
+    assert get_memberships("viewer", db) == {}
+
+
+def test_only_the_owner_manages_members(db):
+    list_id = shared_list(db)
+
+    with pytest.raises(HTTPException) as e:
+        set_member(list_id, "editor", "stranger", "editor", db)
+    assert e.value.status_code == 403
+    with pytest.raises(HTTPException) as e:
+        remove_member(list_id, "owner", "owner", db)
+    assert e.value.status_code == 422
+
+    assert [(task_list.name, role) for task_list, role in get_task_lists_by_user_id("editor", db)] == [
+        ("Groceries", ListRole.EDITOR)
+    ]
+
+
+@pytest.mark.parametrize("shard_count", [4])
+def test_sharded_tasks_are_shared_across_shards(shards):
+    with shards.sessionmaker(autoflush=False)() as session:
+        list_id = shared_list(session)
+        task = create_task(new_task("shared", list_id=list_id), "editor", session)
+
+    with shards.sessionmaker(autoflush=False)() as session:
+        assert get_task_by_id(task.id, session, user_id="viewer").title == "shared"
+        assert [item.title for item in get_task_by_user_id("viewer", session)] == ["shared"]
+        with pytest.raises(HTTPException) as e:
+            update_task(task.id, TaskUpdate(title="renamed"), session, "viewer")
+        assert e.value.status_code == 403
+        with pytest.raises(HTTPException) as e:
+            get_task_by_id(task.id, session, user_id="stranger")
+        assert e.value.status_code == 404
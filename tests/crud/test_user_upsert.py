@@ -0,0 +1,90 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from crud.user import get_user_by_username, upsert_user
+from db.database import Base
+from models.user import User
+from schemas.user import CreateUser
+
+
+@pytest.fixture(name="test_db")
+def sqlite_session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    yield db
+    db.close()
+    engine.dispose()
+
+
+def new_user(**overrides) -> CreateUser:
+    values = dict(
+        id="id1",
+        given_name="given_name1",
+        family_name="family_name1",
+        username="username1",
+        email="email1",
+    )
+    return CreateUser(**{**values, **overrides})
+
+
+def test_upsert_user_inserts(test_db):
+    upsert_user(new_user(), test_db)
+
+    user = get_user_by_username("username1", test_db)
+    assert user.id == "id1"
+    assert user.email == "email1"
+    assert user.updated_at is not None
+
+
+def test_upsert_user_refreshes_names(test_db):
+    upsert_user(new_user(), test_db)
+    first_update = test_db.query(User).one().updated_at
+
+    upsert_user(new_user(given_name="new_given", family_name="new_family"), test_db)
+    test_db.expire_all()
+
+    user = test_db.query(User).one()
+    assert user.given_name == "new_given"
+    assert user.family_name == "new_family"
+    assert user.updated_at >= first_update
+
+
+def test_upsert_user_refreshes_username_and_email(test_db):
+    upsert_user(new_user(), test_db)
+
+    upsert_user(new_user(username="username2", email="email2"), test_db)
+    test_db.expire_all()
+
+    user = test_db.query(User).one()
+    assert (user.username, user.email) == ("username2", "email2")
+
+
+@pytest.mark.parametrize("taken", [{"username": "username1"}, {"email": "email1"}])
+def test_upsert_user_does_not_take_another_users_username_or_email(test_db, taken):
+    upsert_user(new_user(), test_db)
+
+    with pytest.raises(HTTPException) as exc_info:
+        upsert_user(new_user(**{"id": "id2", "username": "username2", "email": "email2", **taken}), test_db)
+
+    assert exc_info.value.status_code == 409
+    assert [(user.id, user.username, user.email) for user in test_db.query(User)] == [
+        ("id1", "username1", "email1")
+    ]
+
+
+def test_upsert_user_is_a_single_statement(test_db):
+    statements = []
+    event.listen(
+        test_db.get_bind(),
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+
+    upsert_user(new_user(), test_db)
+    upsert_user(new_user(), test_db)
+
+    assert len([s for s in statements if s.startswith("INSERT")]) == 2
+    assert not [s for s in statements if s.startswith("SELECT")]
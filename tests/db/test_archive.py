@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, select
+
+from crud.task import (create_task, get_task_by_id, get_task_by_status,
+                       get_task_by_user_id, update_task)
+from db.archive import TaskArchiver, archive
+from models.task import ArchivedTask
+from schemas.task import TaskUpdate
+from tests.conftest import new_task
+
+
+def add_task(db, user_id="user-1", done=True, days_old=60):
+    task = create_task(new_task(), user_id, db)
+    if done:
+        update_task(task.id, TaskUpdate(status="done"), db)
+        task.completed_at = datetime.now(timezone.utc) - timedelta(days=days_old)
+    task.created_at = datetime.now(timezone.utc) - timedelta(days=days_old)
+    db.commit()
+    return task.id
+
+
+def count(engine, model) -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(model.__table__)).scalar()
+
+
+def test_archives_only_old_completed_tasks(engine, db):
+    old_done = [add_task(db) for _ in range(5)]
+    recent_done = add_task(db, days_old=1)
+    old_todo = add_task(db, done=False)
+
+    assert archive(engine, timedelta(days=30), batch_size=2, pause=0) == 5
+
+    assert count(engine, ArchivedTask) == 5
+    assert {task.id for task in get_task_by_user_id("user-1", db)} == {recent_done, old_todo}
+    archived = db.get(ArchivedTask, old_done[0])
+    assert archived.status.value == "done"
+    assert archived.archived_at is not None
+
+
+def test_age_counts_from_completion(engine, db):
+    task_id = add_task(db, done=False)
+    update_task(task_id, TaskUpdate(status="done"), db)
+
+    assert archive(engine, timedelta(days=30), pause=0) == 0
+
+    update_task(task_id, TaskUpdate(status="todo"), db)
+    assert get_task_by_id(task_id, db).completed_at is None
+
+
+def test_reads_opt_into_archived_tasks(engine, db):
+    archived_id = add_task(db)
+    hot_id = add_task(db, days_old=1)
+    archive(engine, timedelta(days=30), pause=0)
+
+    with pytest.raises(HTTPException):
+        get_task_by_id(archived_id, db)
+    assert get_task_by_id(archived_id, db, include_archived=True).id == archived_id
+    assert {task.id for task in get_task_by_user_id("user-1", db, include_archived=True)} == {
+        archived_id,
+        hot_id,
+    }
+    assert [task.id for task in get_task_by_status("done", db)] == [hot_id]
+    assert len(get_task_by_status("done", db, include_archived=True)) == 2
+
+
+def test_archiver_skips_unreachable_databases(engine, broken_engine, db):
+    add_task(db)
+
+    assert TaskArchiver([broken_engine, engine]).run_once() == 1
+
+
+def test_sharded_archive_stays_on_the_user_shard(shards):
+    with shards.sessionmaker(autoflush=False)() as session:
+        task_id = add_task(session)
+        for shard in shards.engines:
+            archive(shard, timedelta(days=30), pause=0)
+
+        assert count(shards.engine_for("user-1"), ArchivedTask) == 1
+        tasks = get_task_by_user_id("user-1", session, include_archived=True)
+        assert [task.id for task in tasks] == [task_id]
+        assert len(get_task_by_status("done", session, include_archived=True)) == 1
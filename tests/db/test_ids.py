@@ -0,0 +1,141 @@
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy import Column, MetaData, Table, create_engine, inspect, select
+from sqlalchemy.orm import Session
+
+from db.database import Base
+from db.ids import TaskId, uuid7
+from db.migrate import upgrade
+from db.migrate_task_ids import TASK_ID_COLUMNS, convert, is_binary_layout
+from models.tag import Tag, TaskTag
+from models.task import Subtask, Task, TaskPriority
+from models.task_list import ListRole, TaskList, TaskListMember
+from models.user import User
+
+
+@pytest.fixture(name="engine")
+def sqlite_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'ids.db'}")
+    yield engine
+    engine.dispose()
+
+
+def test_uuid7_version_and_variant():
+    value = uuid7()
+    assert value.version == 7
+    assert value.variant == uuid.RFC_4122
+
+
+def test_uuid7_is_time_ordered():
+    first = uuid7()
+    later = uuid7()
+    # Same millisecond ids only share the timestamp prefix
+    assert first.bytes[:6] <= later.bytes[:6]
+
+
+def test_binary_task_id_round_trip(engine):
+    metadata = MetaData()
+    table = Table("t", metadata, Column("id", TaskId(binary=True), primary_key=True))
+    metadata.create_all(engine)
+    task_id = str(uuid7())
+
+    with engine.begin() as conn:
+        conn.execute(table.insert(), {"id": task_id})
+        stored = conn.exec_driver_sql("SELECT id FROM t").scalar_one()
+        loaded = conn.execute(select(table.c.id).where(table.c.id == task_id)).scalar_one()
+
+    assert stored == uuid.UUID(task_id).bytes
+    assert loaded == task_id
+
+
+def test_string_task_id_round_trip(engine):
+    metadata = MetaData()
+    table = Table("t", metadata, Column("id", TaskId(binary=False), primary_key=True))
+    metadata.create_all(engine)
+
+    with engine.begin() as conn:
+        conn.execute(table.insert(), {"id": "task_id"})
+        assert conn.execute(select(table.c.id)).scalar_one() == "task_id"
+
+
+def test_task_id_columns_cover_models():
+    columns = {
+        table.name: {column.name for column in table.columns if isinstance(column.type, TaskId)}
+        for table in Base.metadata.sorted_tables
+    }
+
+    assert {table: set(names) for table, names in TASK_ID_COLUMNS.items()} == {
+        table: names for table, names in columns.items() if names
+    }
+
+
+def _schema(engine):
+    inspector = inspect(engine)
+    return {
+        table: (
+            sorted((index["name"], index["unique"]) for index in inspector.get_indexes(table)),
+            sorted(key["referred_table"] for key in inspector.get_foreign_keys(table)),
+            inspector.get_pk_constraint(table)["constrained_columns"],
+        )
+        for table in TASK_ID_COLUMNS
+    }
+
+
+def _values(engine):
+    with engine.connect() as conn:
+        return {
+            (table, name): sorted(
+                conn.exec_driver_sql(f"SELECT {name} FROM {table} WHERE {name} IS NOT NULL").scalars()
+            )
+            for table, names in TASK_ID_COLUMNS.items()
+            for name in names
+        }
+
+
+def test_convert_every_task_id_column(engine):
+    upgrade(engine)
+    now = datetime(2030, 1, 1)
+    with Session(bind=engine) as session:
+        session.add(User(id="user-1", given_name="A", family_name="B", username="user-1", email="a@example.com"))
+        task_list = TaskList(name="list", owner_id="user-1", created_at=now)
+        session.add(task_list)
+        session.flush()
+        session.add(TaskListMember(list_id=task_list.id, user_id="user-1", role=ListRole.OWNER))
+        task = Task(
+            title="t", description="d", priority=TaskPriority.LOW, created_at=now, deadline=now,
+            user_id="user-1", list_id=task_list.id,
+        )
+        tag = Tag(name="tag", user_id="user-1")
+        session.add_all([task, tag])
+        session.flush()
+        session.add_all([
+            Subtask(task_id=task.id, user_id="user-1", title="s"),
+            TaskTag(task_id=task.id, tag_id=tag.id, user_id="user-1"),
+        ])
+        session.commit()
+    schema, values = _schema(engine), _values(engine)
+
+    assert convert(engine, binary=True) == sum(map(len, TASK_ID_COLUMNS.values()))
+    assert is_binary_layout(engine)
+    assert convert(engine, binary=True) == 0
+    assert _schema(engine) == schema
+    # Every column holds the same ids, as bytes, so joins still match
+    assert _values(engine) == {
+        column: sorted(uuid.UUID(value).bytes for value in ids) for column, ids in values.items()
+    }
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql(
+            "SELECT COUNT(*) FROM tasks"
+            " JOIN subtasks ON subtasks.task_id = tasks.id"
+            " JOIN task_tags ON task_tags.task_id = tasks.id"
+            " JOIN tags ON tags.id = task_tags.tag_id"
+            " JOIN task_list_members ON task_list_members.list_id = tasks.list_id"
+        ).scalar_one() == 1
+
+    convert(engine, binary=False)
+
+    assert not is_binary_layout(engine)
+    assert _schema(engine) == schema
+    assert _values(engine) == values
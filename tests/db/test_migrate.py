@@ -0,0 +1,95 @@
+import pytest
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from sqlalchemy import create_engine, inspect, text
+
+import db.migrate
+from db.database import Base
+from db.migrate import (SchemaOutOfDateError, current_revision,
+                        ensure_schema_current, head_revision, upgrade)
+from db.sharding import shard_tables
+from tests.conftest import add_users
+
+
+@pytest.fixture(name="engine")
+def sqlite_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrate.db'}")
+    yield engine
+    engine.dispose()
+
+
+def test_current_revision_of_empty_database(engine):
+    assert current_revision(engine) is None
+
+
+def test_startup_check_refuses_outdated_schema(engine):
+    with pytest.raises(SchemaOutOfDateError):
+        ensure_schema_current(engine)
+
+
+def test_upgrade_to_head(engine):
+    upgrade(engine)
+
+    assert current_revision(engine) == head_revision()
+    assert {"user", "tasks"} <= set(inspect(engine).get_table_names())
+    ensure_schema_current(engine)
+
+
+def test_startup_check_auto_migrate(engine, monkeypatch):
+    monkeypatch.setattr(db.migrate, "DB_AUTO_MIGRATE", True)
+
+    ensure_schema_current(engine)
+
+    assert current_revision(engine) == head_revision()
+
+
+def test_migrations_match_models(engine):
+    upgrade(engine)
+
+    with engine.connect() as conn:
+        diff = compare_metadata(MigrationContext.configure(conn), Base.metadata)
+
+    assert diff == []
+
+
+def test_shard_migrations_match_the_shard_schema(engine):
+    upgrade(engine, shard=True)
+
+    assert "user" not in inspect(engine).get_table_names()
+    with engine.connect() as conn:
+        diff = compare_metadata(MigrationContext.configure(conn), shard_tables())
+
+    assert diff == []
+
+
+def test_startup_check_covers_the_shards(engine, tmp_path, monkeypatch):
+    shard = create_engine(f"sqlite:///{tmp_path / 'shard.db'}")
+    upgrade(engine)
+
+    with pytest.raises(SchemaOutOfDateError):
+        ensure_schema_current(engine, [shard])
+
+    monkeypatch.setattr(db.migrate, "DB_AUTO_MIGRATE", True)
+    ensure_schema_current(engine, [shard])
+
+    assert current_revision(shard) == head_revision()
+    assert "user" not in inspect(shard).get_table_names()
+    shard.dispose()
+
+
+def test_completed_tasks_are_backfilled(engine):
+    upgrade(engine, "0010")
+    add_users(engine, ["user-1"])
+    with engine.begin() as conn:
+        for task_id, status in (("done", "DONE"), ("todo", "TODO")):
+            conn.execute(text(
+                "INSERT INTO tasks (id, title, description, status, created_at, priority, deadline, user_id)"
+                " VALUES (:id, 't', 'd', :status, '2000-01-01', 'LOW', '2000-01-01', 'user-1')"
+            ), {"id": task_id, "status": status})
+
+    upgrade(engine)
+
+    with engine.connect() as conn:
+        completed = dict(conn.execute(text("SELECT id, completed_at FROM tasks")).all())
+    assert completed["done"] is not None and completed["done"] > "2000-01-02"
+    assert completed["todo"] is None
@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from crud.task import get_task_by_user_id
+from crud.user import get_user_by_username
+from db.database import Base
+from db.replicas import ReplicaPool, RoutingSession
+from models.task import Task as TaskModel
+from models.task import TaskPriority
+from models.user import User as UserModel
+
+
+def add_user(engine, username):
+    with sessionmaker(bind=engine)() as db:
+        db.add(
+            UserModel(
+                id="user-1",
+                given_name="given",
+                family_name="family",
+                username=username,
+                email="user@example.com",
+            )
+        )
+        db.commit()
+
+
+@pytest.fixture
+def databases(tmp_path):
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    for engine in (primary, replica):
+        Base.metadata.create_all(engine)
+    # Same id, different usernames, so a lookup reveals which database served it
+    add_user(primary, "on-primary")
+    add_user(replica, "on-replica")
+    yield primary, replica
+    primary.dispose()
+    replica.dispose()
+
+
+def make_session(primary, pool):
+    return sessionmaker(class_=RoutingSession, bind=primary, replicas=pool)()
+
+
+def test_marked_reads_go_to_replica(databases):
+    primary, replica = databases
+    db = make_session(primary, ReplicaPool([replica]))
+
+    assert get_user_by_username("on-replica", db).username == "on-replica"
+
+
+def test_unmarked_reads_go_to_primary(databases):
+    primary, replica = databases
+    db = make_session(primary, ReplicaPool([replica]))
+
+    assert db.query(UserModel).one().username == "on-primary"
+
+
+def test_reads_after_write_stick_to_primary(databases):
+    primary, replica = databases
+    db = make_session(primary, ReplicaPool([replica]))
+    db.add(
+        TaskModel(
+            title="title",
+            description="description",
+            created_at=datetime.now(timezone.utc),
+            priority=TaskPriority.LOW,
+            deadline=datetime.now(timezone.utc) + timedelta(days=1),
+            user_id="user-1",
+        )
+    )
+    db.commit()
+
+    assert len(get_task_by_user_id("user-1", db)) == 1
+    assert get_user_by_username("on-primary", db).username == "on-primary"
+
+
+def test_round_robin_skips_unhealthy_replicas(databases, tmp_path):
+    primary, replica = databases
+    other = create_engine(f"sqlite:///{tmp_path / 'other.db'}")
+    pool = ReplicaPool([replica, other])
+
+    assert [pool.choose() for _ in range(4)] == [replica, other, replica, other]
+
+    pool.mark(other, False)
+    assert [pool.choose() for _ in range(2)] == [replica, replica]
+
+
+def test_no_healthy_replica_falls_back_to_primary(databases):
+    primary, replica = databases
+    pool = ReplicaPool([replica])
+    pool.mark(replica, False)
+    db = make_session(primary, pool)
+
+    assert get_user_by_username("on-primary", db).username == "on-primary"
+
+
+def test_health_check_restores_replica(databases):
+    primary, replica = databases
+    pool = ReplicaPool([replica])
+    pool.mark(replica, False)
+
+    pool.check_health()
+
+    assert pool.is_healthy(replica)
+
+
+def test_health_check_removes_unreachable_replica(tmp_path):
+    unreachable = create_engine(f"sqlite:///{tmp_path / 'missing' / 'replica.db'}")
+    pool = ReplicaPool([unreachable])
+
+    pool.check_health()
+
+    assert not pool.is_healthy(unreachable)
+    assert pool.choose() is None
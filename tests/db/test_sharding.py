@@ -0,0 +1,195 @@
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import ForeignKeyConstraint, event, func, select
+from sqlalchemy.orm import Session
+
+from crud.task import (create_task, delete_task, get_task_by_id,
+                       get_task_by_status, get_task_by_user_id, update_task)
+from db.sharding import (REBALANCE_ORDER, SHARDED_TABLES, TASKS_TABLE,
+                         is_sharded, rebalance, shard_index, shard_tables)
+from models.idempotency_key import IdempotencyKey
+from models.outbox import OutboxEvent
+from models.recurring_task import RecurringTask
+from models.tag import Tag, TaskTag
+from models.task import ArchivedTask, Subtask
+from models.task import Task as TaskModel
+from models.task import TaskPriority, TaskStatus
+from schemas.task import TaskUpdate
+from tests.conftest import new_task
+
+USERS = [f"user-{i}" for i in range(12)]
+
+
+def count_tasks(engine, table=TASKS_TABLE) -> int:
+    with engine.connect() as conn:
+        return conn.execute(
+            select(func.count()).select_from(shard_tables().tables[table])
+        ).scalar()
+
+
+@pytest.fixture
+def users():
+    return USERS
+
+
+@pytest.fixture
+def db(shards):
+    with shards.sessionmaker(autoflush=False)() as session:
+        yield session
+
+
+def test_shard_index_is_stable_and_spreads_users():
+    indexes = [shard_index(f"user-{i}", 4) for i in range(1000)]
+
+    assert indexes == [shard_index(f"user-{i}", 4) for i in range(1000)]
+    assert all(indexes.count(i) > 150 for i in range(4))
+
+
+def test_adding_a_shard_moves_few_users():
+    users = [f"user-{i}" for i in range(2000)]
+
+    moved = [u for u in users if shard_index(u, 3) != shard_index(u, 4)]
+
+    # Only the users that land on the new shard move
+    assert all(shard_index(u, 4) == 3 for u in moved)
+    assert len(moved) < len(users) * 0.35
+
+
+def test_shard_schema_has_no_foreign_key():
+    tasks = shard_tables().tables[TASKS_TABLE]
+
+    assert not any(isinstance(c, ForeignKeyConstraint) for c in tasks.constraints)
+
+
+def test_tasks_are_written_to_their_users_shard(shards, db):
+    assert is_sharded(db)
+
+    for user_id in USERS:
+        create_task(new_task(), user_id, db)
+
+    for user_id in USERS:
+        assert [t.user_id for t in get_task_by_user_id(user_id, db)] == [user_id]
+    for index, engine in enumerate(shards.engines):
+        expected = sum(1 for u in USERS if shard_index(u, 3) == index)
+        assert count_tasks(engine) == expected
+    assert count_tasks(shards.primary) == 0
+
+
+def test_get_task_by_status_merges_all_shards(shards, db):
+    for user_id in USERS:
+        create_task(new_task(), user_id, db)
+
+    tasks = get_task_by_status("todo", db)
+
+    assert sorted(t.user_id for t in tasks) == sorted(USERS)
+
+
+def test_task_lookups_by_id_search_every_shard(db):
+    tasks = [create_task(new_task(), user_id, db) for user_id in USERS]
+    task = tasks[5]
+
+    assert get_task_by_id(task.id, db).user_id == USERS[5]
+
+    update_task(task.id, TaskUpdate(status="done"), db)
+    assert get_task_by_id(task.id, db).status == TaskStatus.DONE
+
+    delete_task(task.id, db)
+    with pytest.raises(HTTPException):
+        get_task_by_id(task.id, db)
+
+
+def test_rebalance_moves_tasks_from_main_database(shards):
+    with Session(shards.primary) as session:
+        for user_id in USERS:
+            session.add(
+                TaskModel(
+                    title="title",
+                    description="description",
+                    created_at=datetime.now(timezone.utc),
+                    priority=TaskPriority.LOW,
+                    deadline=datetime.now(timezone.utc),
+                    user_id=user_id,
+                )
+            )
+        session.commit()
+
+    moved = rebalance([shards.primary, *shards.engines], shards, batch_size=5)
+
+    assert sum(moved.values()) == len(USERS)
+    assert count_tasks(shards.primary) == 0
+    for index, engine in enumerate(shards.engines):
+        assert count_tasks(engine) == sum(1 for u in USERS if shard_index(u, 3) == index)
+
+    assert sum(rebalance([shards.primary, *shards.engines], shards).values()) == 0
+
+
+def test_rebalance_order_covers_every_sharded_table():
+    assert sorted(REBALANCE_ORDER) == sorted(SHARDED_TABLES)
+
+
+def test_rebalance_moves_every_sharded_table(shards):
+    @event.listens_for(shards.primary, "connect")
+    def enforce_foreign_keys(dbapi_connection, connection_record):
+        dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+    shards.primary.dispose()
+    now = datetime.now(timezone.utc)
+    with Session(shards.primary) as session:
+        for n, user_id in enumerate(USERS):
+            task = TaskModel(
+                title="title",
+                description="description",
+                created_at=now,
+                priority=TaskPriority.LOW,
+                deadline=now,
+                user_id=user_id,
+            )
+            tag = Tag(name="tag", user_id=user_id)
+            session.add_all([task, tag])
+            session.flush()
+            session.add_all([
+                Subtask(task_id=task.id, user_id=user_id, title="subtask"),
+                TaskTag(task_id=task.id, tag_id=tag.id, user_id=user_id),
+                ArchivedTask(
+                    id=f"archived-{n}",
+                    title="title",
+                    description="description",
+                    status=TaskStatus.DONE,
+                    created_at=now,
+                    priority=TaskPriority.LOW,
+                    deadline=now,
+                    user_id=user_id,
+                    archived_at=now,
+                ),
+                RecurringTask(
+                    title="title",
+                    description="description",
+                    priority=TaskPriority.LOW,
+                    rule="FREQ=DAILY",
+                    starts_at=now,
+                    created_at=now,
+                    user_id=user_id,
+                ),
+                IdempotencyKey(
+                    user_id=user_id,
+                    key="key",
+                    fingerprint="fingerprint",
+                    task_id=task.id,
+                    response="{}",
+                    created_at=now,
+                ),
+                OutboxEvent(topic="task.created", user_id=user_id, payload="{}", created_at=now, available_at=now),
+            ])
+        session.commit()
+
+    moved = rebalance([shards.primary, *shards.engines], shards, batch_size=5)
+
+    assert sum(moved.values()) == len(USERS) * len(SHARDED_TABLES)
+    for table in SHARDED_TABLES:
+        assert count_tasks(shards.primary, table) == 0
+        for index, engine in enumerate(shards.engines):
+            assert count_tasks(engine, table) == sum(1 for u in USERS if shard_index(u, 3) == index)
+
+    assert sum(rebalance([shards.primary, *shards.engines], shards).values()) == 0
@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, select
+
+import crud.task
+from crud.task import (create_task, delete_task, get_task_by_id,
+                       get_task_by_status, get_task_by_user_id, restore_task)
+from db.soft_delete import TaskPurger, purge
+from models.outbox import OutboxEvent
+from models.task import Task as TaskModel
+from tests.conftest import new_task
+
+
+def count_rows(engine) -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(TaskModel.__table__)).scalar()
+
+
+def test_deleted_tasks_are_hidden_but_kept(engine, db):
+    kept = create_task(new_task(), "user-1", db)
+    deleted = create_task(new_task(), "user-1", db)
+
+    delete_task(deleted.id, db)
+
+    assert [task.id for task in get_task_by_user_id("user-1", db)] == [kept.id]
+    assert [task.id for task in get_task_by_status("todo", db)] == [kept.id]
+    with pytest.raises(HTTPException) as exc_info:
+        get_task_by_id(deleted.id, db)
+    assert exc_info.value.status_code == 404
+    assert count_rows(engine) == 2
+    assert db.query(TaskModel).execution_options(include_deleted=True).count() == 2
+
+
+def test_restore_undoes_a_delete(db):
+    task = create_task(new_task(), "user-1", db)
+    delete_task(task.id, db)
+
+    restored = restore_task(task.id, db)
+
+    assert restored.deleted_at is None
+    assert get_task_by_id(task.id, db).id == task.id
+    topics = db.scalars(select(OutboxEvent.topic).order_by(OutboxEvent.id)).all()
+    assert topics == ["task.created", "task.deleted", "task.restored"]
+
+
+def test_restore_requires_a_deleted_task(db):
+    task = create_task(new_task(), "user-1", db)
+
+    with pytest.raises(HTTPException) as exc_info:
+        restore_task(task.id, db)
+
+    assert exc_info.value.status_code == 404
+
+
+def test_hard_delete_mode(engine, db, monkeypatch):
+    monkeypatch.setattr(crud.task, "TASK_SOFT_DELETE", False)
+    task = create_task(new_task(), "user-1", db)
+
+    delete_task(task.id, db)
+
+    assert count_rows(engine) == 0
+
+
+def test_purge_removes_expired_tombstones_in_batches(engine, db):
+    tasks = [create_task(new_task(), "user-1", db) for _ in range(6)]
+    for task in tasks[:5]:
+        delete_task(task.id, db)
+    recent = tasks[4]
+    with engine.begin() as conn:
+        conn.execute(
+            TaskModel.__table__.update()
+            .where(TaskModel.id.in_([task.id for task in tasks[:4]]))
+            .values(deleted_at=datetime(2000, 1, 1))
+        )
+
+    assert purge(engine, retention=timedelta(days=1), batch_size=3, pause=0) == 4
+
+    assert count_rows(engine) == 2
+    assert restore_task(recent.id, db).id == recent.id
+
+
+def test_purger_skips_unreachable_databases(engine, broken_engine):
+    assert TaskPurger([broken_engine, engine]).run_once() == 0
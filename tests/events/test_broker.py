@@ -0,0 +1,81 @@
+import asyncio
+import threading
+
+from events import broker as broker_module
+from events.broker import RESYNC, Broker
+
+
+def test_delivers_to_every_subscriber_of_the_user():
+    async def scenario():
+        broker = Broker()
+        first = broker.subscribe("user-1")
+        second = broker.subscribe("user-1")
+        other = broker.subscribe("user-2")
+
+        broker.publish("user-1", "hello")
+
+        assert await first.get(1) == "hello"
+        assert await second.get(1) == "hello"
+        assert await other.get(0.01) is None
+
+    asyncio.run(scenario())
+
+
+def test_wakes_a_waiting_subscriber_from_another_thread():
+    async def scenario():
+        broker = Broker()
+        subscriber = broker.subscribe("user-1")
+        waiting = asyncio.create_task(subscriber.get(5))
+        await asyncio.sleep(0)
+
+        thread = threading.Thread(target=broker.publish, args=("user-1", "hello"))
+        thread.start()
+        thread.join()
+
+        assert await waiting == "hello"
+
+    asyncio.run(scenario())
+
+
+def test_idle_subscribers_hold_no_queue():
+    async def scenario():
+        broker = Broker()
+        subscriber = broker.subscribe("user-1")
+        broker.publish("user-1", "hello")
+        await subscriber.get(1)
+        return subscriber
+
+    subscriber = asyncio.run(scenario())
+
+    assert subscriber._pending is None
+    assert not hasattr(subscriber, "__dict__")
+
+
+def test_slow_subscribers_are_told_to_resync(monkeypatch):
+    monkeypatch.setattr(broker_module, "SSE_QUEUE_SIZE", 2)
+
+    async def scenario():
+        broker = Broker()
+        subscriber = broker.subscribe("user-1")
+        for i in range(3):
+            broker.publish("user-1", f"message-{i}")
+        broker.publish("user-1", "latest")
+
+        return [await subscriber.get(1), await subscriber.get(1), await subscriber.get(0.01)]
+
+    assert asyncio.run(scenario()) == [RESYNC, "latest", None]
+
+
+def test_unsubscribe_and_subscriber_limit():
+    async def scenario():
+        broker = Broker(max_subscribers=1)
+        subscriber = broker.subscribe("user-1")
+
+        assert broker.subscribe("user-2") is None
+
+        broker.unsubscribe(subscriber)
+        broker.unsubscribe(subscriber)
+        assert not broker.has_subscribers("user-1")
+        assert broker.subscribe("user-2") is not None
+
+    asyncio.run(scenario())
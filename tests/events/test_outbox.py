@@ -0,0 +1,122 @@
+import json
+import time
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from crud.task import create_task, delete_task, update_task
+from events import outbox
+from events.outbox import OutboxWorker, claim, process_batch, retry_delay
+from models.outbox import OutboxEvent
+from schemas.task import TaskUpdate
+from tests.conftest import new_task
+
+
+def outbox_rows(engine):
+    with Session(bind=engine) as session:
+        return session.scalars(select(OutboxEvent).order_by(OutboxEvent.id)).all()
+
+
+def test_task_writes_add_outbox_events(engine, db):
+    task = create_task(new_task(), "user-1", db)
+    update_task(task.id, TaskUpdate(title="renamed"), db)
+    delete_task(task.id, db)
+
+    rows = outbox_rows(engine)
+
+    assert [row.topic for row in rows] == ["task.created", "task.updated", "task.deleted"]
+    assert {row.user_id for row in rows} == {"user-1"}
+    assert json.loads(rows[0].payload)["task"]["id"] == task.id
+    assert json.loads(rows[1].payload)["task"]["title"] == "renamed"
+
+
+def test_no_event_without_the_task_write(engine, db, monkeypatch):
+    def fail():
+        raise RuntimeError("commit failed")
+
+    monkeypatch.setattr(db, "commit", fail)
+    with pytest.raises(RuntimeError):
+        create_task(new_task(), "user-1", db)
+    db.rollback()
+
+    assert outbox_rows(engine) == []
+
+
+def test_delivered_events_are_removed(engine, db):
+    create_task(new_task(), "user-1", db)
+    received = []
+
+    assert process_batch(engine, [received.append]) == 1
+
+    assert [event.topic for event in received] == ["task.created"]
+    assert outbox_rows(engine) == []
+
+
+def test_claimed_events_are_leased(engine, db):
+    create_task(new_task(), "user-1", db)
+
+    assert len(claim(engine)) == 1
+    assert claim(engine) == []
+
+
+def test_failed_deliveries_are_retried_then_given_up(engine, db, monkeypatch):
+    monkeypatch.setattr(outbox, "OUTBOX_MAX_ATTEMPTS", 2)
+    create_task(new_task(), "user-1", db)
+
+    def broken(event):
+        raise ConnectionError("downstream is down")
+
+    process_batch(engine, [broken])
+    (row,) = outbox_rows(engine)
+    assert row.attempts == 1
+    assert row.failed_at is None
+    assert "downstream is down" in row.last_error
+    assert row.available_at > datetime.now(timezone.utc).replace(tzinfo=None)
+
+    with Session(bind=engine) as session, session.begin():
+        session.query(OutboxEvent).update({"available_at": datetime(2000, 1, 1)})
+    process_batch(engine, [broken])
+
+    (row,) = outbox_rows(engine)
+    assert row.attempts == 2
+    assert row.failed_at is not None
+    assert claim(engine) == []
+
+
+def test_retry_delay_backs_off_exponentially(monkeypatch):
+    monkeypatch.setattr(outbox, "OUTBOX_RETRY_SECONDS", 1)
+    monkeypatch.setattr(outbox, "OUTBOX_MAX_RETRY_SECONDS", 10)
+
+    assert [retry_delay(n) for n in range(1, 6)] == [1, 2, 4, 8, 10]
+
+
+def test_worker_drains_in_the_background(engine, db):
+    received = []
+    outbox.register_handler(received.append)
+    worker = OutboxWorker([engine], workers=1, poll_interval=5)
+    worker.start()
+    try:
+        create_task(new_task(), "user-1", db)
+        deadline = time.monotonic() + 5
+        while not received and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        worker.stop()
+        outbox.unregister_handler(received.append)
+
+    assert len(received) == 1
+    assert outbox_rows(engine) == []
+
+
+def test_sharded_events_are_stored_with_their_task(shards):
+    with shards.sessionmaker(autoflush=False)() as session:
+        create_task(new_task(), "user-1", session)
+
+    counts = []
+    for shard in shards.engines:
+        with shard.connect() as conn:
+            counts.append(conn.execute(select(func.count()).select_from(OutboxEvent.__table__)).scalar())
+    assert counts[shards.engines.index(shards.engine_for("user-1"))] == 1
+    assert sum(counts) == 1
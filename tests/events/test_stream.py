@@ -0,0 +1,158 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+from auth.JWTBearer import JWTAuthorizationCredentials
+from crud.task import create_task, delete_task, update_task
+from crud.task_list import create_task_list, set_member
+from events import broker as broker_module
+from events.broker import Broker, get_broker, set_broker
+from main import app
+from models.task import Task as TaskModel
+from routers.task import auth
+from routers.task_stream import event_stream
+from schemas.task import TaskUpdate
+from schemas.task_list import TaskListCreate
+from tests.conftest import new_task
+from throttling import rate_limit
+
+
+@pytest.fixture
+def broker():
+    set_broker(Broker())
+    yield get_broker()
+    set_broker(None)
+
+
+@pytest.fixture
+def users():
+    return ("user-1", "user-2", "user-3")
+
+
+def drain(subscriber):
+    messages = []
+    while subscriber._pending:
+        messages.append(json.loads(subscriber._pending.popleft()))
+    return messages
+
+
+def test_committed_task_changes_are_published(broker, db):
+    async def scenario():
+        subscriber = broker.subscribe("user-1")
+        task = create_task(new_task(), "user-1", db)
+        update_task(task.id, TaskUpdate(status="done"), db)
+        delete_task(task.id, db)
+        return task.id, drain(subscriber)
+
+    task_id, messages = asyncio.run(scenario())
+
+    assert [m["type"] for m in messages] == ["task.created", "task.updated", "task.deleted"]
+    assert messages[0]["task"]["id"] == task_id
+    assert messages[0]["task"]["status"] == "todo"
+    assert messages[1]["task"]["status"] == "done"
+    assert messages[2]["task"] == {"id": task_id}
+
+
+def test_changes_of_list_tasks_are_published_to_its_members(broker, db):
+    task_list, _ = create_task_list(TaskListCreate(name="Team"), "user-1", db)
+    set_member(task_list.id, "user-1", "user-2", "viewer", db)
+
+    async def scenario():
+        owner, member, stranger = (broker.subscribe(user_id) for user_id in ("user-1", "user-2", "user-3"))
+        task = create_task(new_task(list_id=task_list.id), "user-1", db)
+        update_task(task.id, TaskUpdate(status="done"), db)
+        return drain(owner), drain(member), drain(stranger)
+
+    owner, member, stranger = asyncio.run(scenario())
+
+    assert [m["type"] for m in member] == ["task.created", "task.updated"]
+    assert member == owner
+    assert stranger == []
+
+
+def test_rolled_back_changes_are_not_published(broker, db):
+    async def scenario():
+        subscriber = broker.subscribe("user-1")
+        db.add(
+            TaskModel(
+                title="title",
+                description="description",
+                created_at=datetime.now(timezone.utc),
+                priority="low",
+                deadline=datetime.now(timezone.utc),
+                user_id="user-1",
+            )
+        )
+        db.flush()
+        db.rollback()
+        return drain(subscriber)
+
+    assert asyncio.run(scenario()) == []
+
+
+def test_nothing_is_serialized_without_subscribers(broker, db):
+    create_task(new_task(), "user-1", db)
+
+    assert "task_events" not in db.info
+
+
+def test_event_stream_format(broker, monkeypatch):
+    monkeypatch.setattr(broker_module, "SSE_QUEUE_SIZE", 1)
+
+    async def scenario():
+        subscriber = broker.subscribe("user-1")
+        stream = event_stream(subscriber, heartbeat=0.01)
+        chunks = [await stream.__anext__()]
+        chunks.append(await stream.__anext__())
+        broker.publish("user-1", '{"type": "task.created"}')
+        chunks.append(await stream.__anext__())
+        broker.publish("user-1", "first")
+        broker.publish("user-1", "second")
+        chunks.append(await stream.__anext__())
+        await stream.aclose()
+        return chunks
+
+    chunks = asyncio.run(scenario())
+
+    assert chunks == [
+        "retry: 5000\n\n",
+        ": keep-alive\n\n",
+        'data: {"type": "task.created"}\n\n',
+        "event: resync\ndata: {}\n\n",
+    ]
+    assert not broker.has_subscribers("user-1")
+
+
+def open_stream(monkeypatch, claims, broker):
+    credentials = JWTAuthorizationCredentials(
+        jwt_token="token",
+        header={"kid": "some_kid"},
+        claims=claims,
+        signature="signature",
+        message="message",
+    )
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", False)
+    monkeypatch.setitem(app.dependency_overrides, auth, lambda: credentials)
+    set_broker(broker)
+    try:
+        return TestClient(app).get("/tasks/stream", headers={"Authorization": "Bearer token"})
+    finally:
+        set_broker(None)
+
+
+def test_stream_is_refused_when_the_worker_is_full(monkeypatch):
+    response = open_stream(monkeypatch, {"sub": "user-1"}, Broker(max_subscribers=0))
+
+    # Not routed to GET /tasks/{task_id}
+    assert response.status_code == 503
+    assert response.json() == {"detail": "Too many open streams"}
+
+
+def test_stream_needs_a_subject(monkeypatch):
+    response = open_stream(monkeypatch, {"username": "user-1"}, Broker())
+
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Subject missing"}
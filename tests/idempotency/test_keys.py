@@ -0,0 +1,142 @@
+import threading
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from idempotency import keys
+from idempotency.keys import ResponseCache, create_task_once, purge
+from models.idempotency_key import IdempotencyKey
+from models.task import Task as TaskModel
+from schemas.task import TaskInDB
+from tests.conftest import new_task
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    keys._cache.clear()
+    yield
+    keys._cache.clear()
+
+
+def task_count(engine):
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(TaskModel.__table__)).scalar()
+
+
+def test_a_retry_replays_the_first_response(engine, db):
+    task, replayed = create_task_once(new_task(), "user-1", "key-1", db)
+    assert not replayed
+
+    again, replayed = create_task_once(new_task(), "user-1", "key-1", db)
+
+    assert replayed
+    assert again == TaskInDB.model_validate(task, from_attributes=True)
+    assert task_count(engine) == 1
+
+
+def test_the_response_is_stored_with_the_task(engine, db):
+    task, _ = create_task_once(new_task(), "user-1", "key-1", db)
+    keys._cache.clear()
+
+    again, replayed = create_task_once(new_task(), "user-1", "key-1", db)
+
+    assert replayed
+    assert again.id == task.id
+    assert task_count(engine) == 1
+
+
+def test_keys_are_scoped_to_their_user(engine, db):
+    first, _ = create_task_once(new_task(), "user-1", "key-1", db)
+    second, replayed = create_task_once(new_task(), "user-2", "key-1", db)
+
+    assert not replayed
+    assert second.id != first.id
+
+
+def test_a_key_reused_for_another_request_is_rejected(db):
+    create_task_once(new_task("first"), "user-1", "key-1", db)
+
+    with pytest.raises(HTTPException) as e:
+        create_task_once(new_task("second"), "user-1", "key-1", db)
+    assert e.value.status_code == 422
+
+
+def test_concurrent_duplicates_are_coalesced(engine):
+    factory = sessionmaker(bind=engine, autoflush=False)
+    barrier = threading.Barrier(8)
+    results = []
+
+    def post():
+        with factory() as session:
+            barrier.wait()
+            task, replayed = create_task_once(new_task(), "user-1", "key-1", session)
+            results.append((task.id, replayed))
+
+    threads = [threading.Thread(target=post) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({task_id for task_id, _ in results}) == 1
+    assert sorted(replayed for _, replayed in results) == [False] + [True] * 7
+    assert task_count(engine) == 1
+
+
+def test_a_key_stored_by_another_worker_is_replayed(engine, db, monkeypatch):
+    first, _ = create_task_once(new_task(), "user-1", "key-1", db)
+    keys._cache.clear()
+    # As if the other worker committed between the lookup and the insert
+    lookups = iter([None])
+    stored = keys._stored
+    monkeypatch.setattr(keys, "_stored", lambda *args: next(lookups, None) or stored(*args))
+
+    again, replayed = create_task_once(new_task(), "user-1", "key-1", db)
+
+    assert replayed
+    assert again.id == first.id
+    assert task_count(engine) == 1
+
+
+def test_expired_keys_can_be_used_again_and_are_purged(engine, db):
+    first, _ = create_task_once(new_task(), "user-1", "key-1", db)
+    create_task_once(new_task(), "user-1", "key-2", db)
+    keys._cache.clear()
+    with Session(bind=engine) as session, session.begin():
+        session.query(IdempotencyKey).filter(IdempotencyKey.key == "key-1").update(
+            {"created_at": datetime(2000, 1, 1)}
+        )
+
+    again, replayed = create_task_once(new_task(), "user-1", "key-1", db)
+    assert not replayed
+    assert again.id != first.id
+
+    with Session(bind=engine) as session, session.begin():
+        session.query(IdempotencyKey).update({"created_at": datetime(2000, 1, 1)})
+    assert purge(engine, batch_size=1) == 2
+    assert purge(engine) == 0
+
+
+def test_invalid_keys_are_rejected(db):
+    with pytest.raises(HTTPException) as e:
+        create_task_once(new_task(), "user-1", "k" * 256, db)
+    assert e.value.status_code == 422
+
+
+def test_response_cache_is_a_bounded_lru_with_expiry():
+    now = [0.0]
+    cache = ResponseCache(max_size=2, clock=lambda: now[0])
+    cache.put(("u", "a"), "fp", "a", ttl=10)
+    cache.put(("u", "b"), "fp", "b", ttl=10)
+    cache.get(("u", "a"))
+    cache.put(("u", "c"), "fp", "c", ttl=10)
+
+    assert cache.get(("u", "b")) is None
+    assert cache.get(("u", "a")) == ("fp", "a")
+
+    now[0] = 10
+    assert cache.get(("u", "a")) is None
+    assert cache.get(("u", "c")) is None
@@ -0,0 +1,87 @@
+import io
+import json
+import logging
+import queue
+
+from fastapi.testclient import TestClient
+
+from main import app
+from observability.log import (LOGS_DROPPED, DroppingQueueHandler,
+                               JsonFormatter, RequestIdFilter,
+                               configure_logging, request_id,
+                               shutdown_logging)
+
+client = TestClient(app)
+
+
+def make_record(**extra):
+    record = logging.makeLogRecord(
+        {"name": "crud.task", "levelno": logging.INFO, "levelname": "INFO",
+         "msg": "Updated %s", "args": ("task-1",), **extra}
+    )
+    RequestIdFilter().filter(record)
+    return record
+
+
+def test_json_formatter_includes_extra_fields_and_request_id():
+    token = request_id.set("req-1")
+    try:
+        record = make_record(task_id="task-1")
+    finally:
+        request_id.reset(token)
+
+    data = json.loads(JsonFormatter().format(record))
+
+    assert data["message"] == "Updated task-1"
+    assert data["logger"] == "crud.task"
+    assert data["level"] == "INFO"
+    assert data["request_id"] == "req-1"
+    assert data["task_id"] == "task-1"
+
+
+def test_configure_logging_writes_json_from_background_thread():
+    stream = io.StringIO()
+    configure_logging("INFO", stream=stream)
+    try:
+        logging.getLogger("tests.log").info("hello", extra={"answer": 42})
+    finally:
+        shutdown_logging()
+
+    line = json.loads(stream.getvalue().splitlines()[-1])
+    assert line["message"] == "hello"
+    assert line["answer"] == 42
+
+
+def test_configure_logging_keeps_exceptions_apart_from_the_message():
+    stream = io.StringIO()
+    configure_logging("INFO", stream=stream)
+    try:
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            logging.getLogger("tests.log").exception("Could not divide %s", "one")
+    finally:
+        shutdown_logging()
+
+    line = json.loads(stream.getvalue().splitlines()[-1])
+    assert line["message"] == "Could not divide one"
+    assert "Traceback" in line["exception"]
+    assert line["exception"].endswith("ZeroDivisionError: division by zero")
+
+
+def test_full_queue_drops_records_without_blocking():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+    before = LOGS_DROPPED.value()
+
+    handler.handle(make_record())
+    handler.handle(make_record())
+
+    assert LOGS_DROPPED.value() == before + 1
+
+
+def test_request_id_is_generated_and_echoed():
+    generated = client.get("/health")
+    echoed = client.get("/health", headers={"X-Request-ID": "abc123"})
+
+    assert len(generated.headers["x-request-id"]) == 32
+    assert echoed.headers["x-request-id"] == "abc123"
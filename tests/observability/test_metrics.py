@@ -0,0 +1,63 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from main import app
+from observability.metrics import (DB_STATEMENTS, Counter, Histogram,
+                                   instrument_engine)
+
+client = TestClient(app)
+
+
+def test_histogram_render():
+    histogram = Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1))
+    histogram.observe(0.05, ("/a",))
+    histogram.observe(0.5, ("/a",))
+    histogram.observe(5, ("/a",))
+
+    lines = histogram.render()
+
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/a",le="1"} 2' in lines
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{route="/a"} 3' in lines
+    assert 'latency_seconds_sum{route="/a"} 5.55' in lines
+
+
+def test_counter_escapes_labels():
+    counter = Counter("things_total", "Things.", ("name",))
+    counter.inc(('a "quoted" value',))
+
+    assert 'things_total{name="a \\"quoted\\" value"} 1' in counter.render()
+
+
+def test_metrics_endpoint_records_routes():
+    client.get("/health")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'http_requests_total{method="GET",route="/health",status="200"}' in response.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/health"}' in response.text
+    assert "http_requests_in_flight" in response.text
+
+
+def test_unmatched_paths_share_one_series():
+    client.get("/does-not-exist/123")
+
+    response = client.get("/metrics")
+
+    assert 'route="unmatched",status="404"' in response.text
+    assert "/does-not-exist/123" not in response.text
+
+
+def test_instrument_engine_counts_statements():
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    before = DB_STATEMENTS.value(("SELECT",))
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        conn.execute(text("select 2"))
+
+    assert DB_STATEMENTS.value(("SELECT",)) == before + 2
@@ -0,0 +1,106 @@
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import observability.profiling as profiling
+from observability.profiling import (ProfilingMiddleware, sign,
+                                     signature_headers)
+
+SECRET = "profiling-secret"
+
+
+def busy_handler():
+    time.sleep(0.05)
+
+
+def make_client() -> TestClient:
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware)
+
+    @app.get("/work")
+    async def work():
+        busy_handler()
+        return {"status": "ok"}
+
+    return TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def profiling_config(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILING_DIR", str(tmp_path))
+    monkeypatch.setattr(profiling, "PROFILING_SECRET", SECRET)
+    monkeypatch.setattr(profiling, "PROFILING_ENABLED", False)
+    monkeypatch.setattr(profiling, "PROFILING_FOCUS", ["test_profiling.py"])
+
+
+def test_unsigned_request_is_not_profiled(tmp_path):
+    response = make_client().get("/work")
+
+    assert response.status_code == 200
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_wrong_signature_is_not_profiled(tmp_path):
+    make_client().get("/work", headers={"X-Profile-Signature": "bad"})
+
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.parametrize("expires_in", [-1, 3600])
+def test_signature_outside_its_window_is_not_profiled(tmp_path, expires_in):
+    expires = int(time.time()) + expires_in
+    make_client().get(
+        "/work",
+        headers={"X-Profile-Expires": str(expires), "X-Profile-Signature": sign("GET", "/work", SECRET, expires)},
+    )
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_signature_covers_the_expiry(tmp_path):
+    headers = signature_headers("GET", "/work", SECRET)
+    headers["X-Profile-Expires"] = str(int(headers["X-Profile-Expires"]) + 1)
+
+    make_client().get("/work", headers=headers)
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_signed_request_writes_pstats(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(profiling, "PROFILING_MODE", "cprofile")
+    caplog.set_level("INFO", logger="observability.profiling")
+
+    response = make_client().get("/work", headers=signature_headers("GET", "/work", SECRET))
+
+    assert response.status_code == 200
+    files = list(tmp_path.iterdir())
+    assert len(files) == 1 and files[0].suffix == ".prof"
+    [record] = [r for r in caplog.records if r.name == "observability.profiling"]
+    focus = record.profile_focus
+    assert any("busy_handler" in name for name, _ in focus)
+
+
+def test_sampling_mode_writes_collapsed_stacks(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILING_MODE", "sampling")
+    monkeypatch.setattr(profiling, "PROFILING_INTERVAL_MS", 1)
+
+    make_client().get("/work", headers=signature_headers("GET", "/work", SECRET))
+
+    files = list(tmp_path.iterdir())
+    assert len(files) == 1 and files[0].suffix == ".folded"
+    assert "busy_handler" in files[0].read_text()
+
+
+def test_sampled_fraction(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(profiling, "PROFILING_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(profiling, "PROFILING_PATHS", ["/other"])
+
+    make_client().get("/work")
+    assert list(tmp_path.iterdir()) == []
+
+    monkeypatch.setattr(profiling, "PROFILING_PATHS", ["/work"])
+    make_client().get("/work")
+    assert len(list(tmp_path.iterdir())) == 1
@@ -0,0 +1,99 @@
+import logging
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import observability.sql
+from observability.sql import (N_PLUS_ONE, SqlDiagnosticsMiddleware, findings,
+                               instrument_sql, statement_shape)
+
+
+@pytest.fixture
+def diagnostics_app():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    instrument_sql(engine)
+    SessionLocal = sessionmaker(bind=engine)
+
+    def get_session():
+        with SessionLocal() as session:
+            yield session
+
+    app = FastAPI()
+    app.add_middleware(SqlDiagnosticsMiddleware)
+
+    @app.get("/items/{count}")
+    def items(count: int, session=Depends(get_session)):
+        for i in range(count):
+            session.execute(text("SELECT :i"), {"i": i})
+        return {"ok": True}
+
+    observability.sql.clear()
+    yield TestClient(app)
+    observability.sql.clear()
+    engine.dispose()
+
+
+def test_statement_shape_collapses_whitespace():
+    assert statement_shape("SELECT a,\n   b FROM t\nWHERE id = ?") == "SELECT a, b FROM t WHERE id = ?"
+
+
+def test_counts_statements_per_request(diagnostics_app):
+    diagnostics_app.get("/items/2")
+
+    request = findings()["requests"][-1]
+    assert request["route"] == "GET /items/{count}"
+    assert request["statements"] == 2
+    assert findings()["n_plus_one"] == []
+
+
+def test_flags_repeated_statement_shapes(diagnostics_app, caplog):
+    before = N_PLUS_ONE.value(("/items/{count}",))
+
+    with caplog.at_level(logging.WARNING, logger="observability.sql"):
+        diagnostics_app.get("/items/6")
+
+    finding = findings()["n_plus_one"][-1]
+    assert finding["route"] == "GET /items/{count}"
+    assert finding["repeated"] == [{"statement": "SELECT ?", "count": 6}]
+    assert N_PLUS_ONE.value(("/items/{count}",)) == before + 1
+    record = [r for r in caplog.records if r.name == "observability.sql"][-1]
+    assert record.sql["repeated"][0]["count"] == 6
+
+
+def test_logs_slow_queries_with_parameters_and_route(diagnostics_app, monkeypatch, caplog):
+    monkeypatch.setattr(observability.sql, "SLOW_QUERY_MS", 0)
+    monkeypatch.setattr(observability.sql, "SLOW_QUERY_LOG_PARAMETERS", True)
+
+    with caplog.at_level(logging.WARNING, logger="observability.sql"):
+        diagnostics_app.get("/items/1")
+
+    slow = findings()["slow_queries"][-1]
+    assert slow["statement"] == "SELECT ?"
+    assert slow["parameters"] == "(0,)"
+    assert slow["route"] == "GET /items/{count}"
+    assert any(getattr(r, "sql", {}).get("statement") == "SELECT ?" for r in caplog.records)
+
+
+def test_slow_query_parameters_are_hidden_by_default(diagnostics_app, monkeypatch):
+    monkeypatch.setattr(observability.sql, "SLOW_QUERY_MS", 0)
+
+    diagnostics_app.get("/items/1")
+
+    assert findings()["slow_queries"][-1]["parameters"] == "<hidden>"
+
+
+def test_statements_outside_requests_are_not_attributed():
+    engine = create_engine("sqlite://")
+    instrument_sql(engine)
+    observability.sql.clear()
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+    assert findings()["requests"] == []
@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import Session
+
+from crud.recurring_task import create_recurring_task, delete_recurring_task
+from crud.task import (get_task_by_user_id, materialize_recurring_task,
+                       materialize_recurring_tasks, update_task)
+from models.recurring_task import RecurringTask
+from recurrence.roller import RecurrenceRoller, roll, utcnow
+from schemas.recurring_task import RecurringTaskCreate
+from schemas.task import TaskUpdate
+
+
+def daily(db, until, starts_at=None):
+    return create_recurring_task(
+        RecurringTaskCreate(
+            title="Stand-up",
+            description="Daily stand-up",
+            priority="medium",
+            rule="FREQ=DAILY",
+            starts_at=starts_at or utcnow().replace(microsecond=0),
+        ),
+        "user-1",
+        until,
+        db,
+    )
+
+
+def test_occurrences_are_materialized_up_to_the_window(db):
+    now = utcnow()
+    series = daily(db, now + timedelta(days=2, hours=1))
+
+    tasks = get_task_by_user_id("user-1", db)
+
+    assert len(tasks) == 3
+    assert {task.recurring_task_id for task in tasks} == {series.id}
+    assert series.materialized_until >= now + timedelta(days=2)
+
+
+def test_extending_the_window_only_adds_new_occurrences(db):
+    now = utcnow()
+    daily(db, now + timedelta(days=2, hours=1))
+
+    created = materialize_recurring_tasks("user-1", now + timedelta(days=4, hours=1), now, db)
+
+    assert created == 2
+    assert len(get_task_by_user_id("user-1", db)) == 5
+    assert materialize_recurring_tasks("user-1", now + timedelta(days=4), now, db) == 0
+
+
+def test_a_window_claimed_elsewhere_is_not_materialized_again(engine, db):
+    now = utcnow()
+    series = daily(db, now)
+    with Session(bind=engine, expire_on_commit=False) as other:
+        stale = other.get(RecurringTask, series.id)
+    materialize_recurring_task(series, now + timedelta(days=3), db)
+
+    assert materialize_recurring_task(stale, now + timedelta(days=3), db) == 0
+    assert len(get_task_by_user_id("user-1", db)) == 4
+
+
+def test_roller_extends_series_falling_behind(engine, db):
+    series_id = daily(db, utcnow()).id
+
+    created = roll(engine, interval=0)
+
+    assert created >= 28
+    with Session(bind=engine) as session:
+        assert session.get(RecurringTask, series_id).materialized_until > utcnow() + timedelta(days=27)
+    assert roll(engine, interval=0) == 0
+
+
+def test_roller_skips_unreachable_databases(engine, broken_engine, db):
+    daily(db, utcnow())
+
+    assert RecurrenceRoller([broken_engine, engine], interval=0).run_once() > 0
+
+
+def test_deleting_a_series_removes_its_pending_occurrences(db):
+    now = utcnow()
+    series = daily(db, now + timedelta(days=3), starts_at=(now - timedelta(days=2)).replace(microsecond=0))
+    started = [task for task in get_task_by_user_id("user-1", db) if task.deadline > now][0]
+    update_task(started.id, TaskUpdate(status="in-progress"), db)
+
+    delete_recurring_task(series.id, "user-1", db)
+
+    remaining = get_task_by_user_id("user-1", db)
+    assert all(task.deadline <= now or task.id == started.id for task in remaining)
+    # Three past occurrences (the last one just now) and the started one
+    assert len(remaining) == 4
+    assert db.query(RecurringTask).count() == 0
+
+
+def test_invalid_rules_are_rejected():
+    with pytest.raises(ValueError):
+        RecurringTaskCreate(
+            title="t", description="d", priority="low", rule="FREQ=YEARLY", starts_at=datetime(2026, 1, 1)
+        )
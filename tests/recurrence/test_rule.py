@@ -0,0 +1,83 @@
+from datetime import datetime
+
+import pytest
+
+from recurrence.rule import occurrences, parse_rule
+
+START = datetime(2026, 1, 1, 9, 30)  # a Thursday
+
+
+def expand(rule, after=None, until=datetime(2026, 12, 31)):
+    return list(occurrences(parse_rule(rule), START, after, until))
+
+
+def test_daily_with_interval():
+    assert expand("FREQ=DAILY;INTERVAL=2", until=datetime(2026, 1, 7)) == [
+        datetime(2026, 1, 1, 9, 30),
+        datetime(2026, 1, 3, 9, 30),
+        datetime(2026, 1, 5, 9, 30),
+    ]
+
+
+def test_weekly_by_day():
+    assert expand("FREQ=WEEKLY;BYDAY=MO,TH", until=datetime(2026, 1, 13)) == [
+        datetime(2026, 1, 1, 9, 30),
+        datetime(2026, 1, 5, 9, 30),
+        datetime(2026, 1, 8, 9, 30),
+        datetime(2026, 1, 12, 9, 30),
+    ]
+
+
+def test_weekly_defaults_to_the_start_weekday():
+    assert expand("FREQ=WEEKLY;INTERVAL=2", until=datetime(2026, 2, 1)) == [
+        datetime(2026, 1, 1, 9, 30),
+        datetime(2026, 1, 15, 9, 30),
+        datetime(2026, 1, 29, 9, 30),
+    ]
+
+
+def test_monthly_skips_months_without_the_day():
+    start = datetime(2026, 1, 31)
+    rule = parse_rule("FREQ=MONTHLY;COUNT=3")
+
+    assert list(occurrences(rule, start, None, datetime(2027, 1, 1))) == [
+        datetime(2026, 1, 31),
+        datetime(2026, 3, 31),
+        datetime(2026, 5, 31),
+    ]
+
+
+def test_count_and_until_end_the_series():
+    assert len(expand("FREQ=DAILY;COUNT=5")) == 5
+    assert expand("FREQ=DAILY;UNTIL=20260103T093000Z")[-1] == datetime(2026, 1, 3, 9, 30)
+
+
+def test_count_applies_from_the_first_occurrence():
+    assert expand("FREQ=DAILY;COUNT=5", after=datetime(2026, 1, 3, 12)) == [
+        datetime(2026, 1, 4, 9, 30),
+        datetime(2026, 1, 5, 9, 30),
+    ]
+
+
+@pytest.mark.parametrize("rule", ["FREQ=DAILY;INTERVAL=3", "FREQ=WEEKLY;BYDAY=TU,SA"])
+def test_windows_skip_ahead_to_the_same_occurrences(rule):
+    after = datetime(2026, 7, 14, 10)
+
+    assert expand(rule, after=after) == [d for d in expand(rule) if d > after]
+
+
+@pytest.mark.parametrize(
+    "rule",
+    [
+        "FREQ=HOURLY",
+        "FREQ=DAILY;BYDAY=MO",
+        "FREQ=WEEKLY;BYDAY=XX",
+        "FREQ=DAILY;INTERVAL=0",
+        "FREQ=DAILY;COUNT=2;UNTIL=20260101",
+        "FREQ=DAILY;BYMONTH=1",
+        "DAILY",
+    ],
+)
+def test_rejects_unsupported_rules(rule):
+    with pytest.raises(ValueError):
+        parse_rule(rule)
@@ -6,6 +6,7 @@ from dotenv import load_dotenv
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 
+from auth.cognito import CognitoError
 from auth.JWTBearer import JWTAuthorizationCredentials
 from db.database import get_db
 from main import app
@@ -42,11 +43,11 @@ def reset_mock_db(mock_db):
     mock_db.reset_mock()
 
 
-@patch("routers.user.create_user")
+@patch("routers.user.upsert_user")
 @patch("routers.user.user_info_with_token")
 @patch("routers.user.auth_with_code", return_value=None)
 def test_unsuccessful_login_with_invalid_credentials(
-    mock_auth_with_code, mock_user_info_with_token, mock_create_user, mock_db
+    mock_auth_with_code, mock_user_info_with_token, mock_upsert_user, mock_db
 ):
     response = client.post("/auth/sign-in?code=invalid_code")
 
@@ -54,79 +55,89 @@ def test_unsuccessful_login_with_invalid_credentials(
     mock_auth_with_code.assert_called_once_with("invalid_code", REDIRECT_URI)
     assert mock_user_info_with_token.call_count == 0
     assert mock_db.query.call_count == 0
-    assert mock_create_user.call_count == 0
+    assert mock_upsert_user.call_count == 0
 
 
-@patch("routers.user.create_user")
+@patch("routers.user.upsert_user")
 @patch("routers.user.user_info_with_token", return_value=user_attributes)
 @patch(
     "routers.user.auth_with_code",
     return_value={"token": "valid_token", "expires_in": 100},
 )
-def test_successful_login_with_valid_credentials_found_username(
-    mock_auth_with_code, mock_user_info_with_token, mock_create_user, mock_db
+def test_successful_login_with_valid_credentials(
+    mock_auth_with_code, mock_user_info_with_token, mock_upsert_user, mock_db
 ):
-    mock_db.query.return_value.filter.return_value.first.side_effect = [True, False]
-
     response = client.post("/auth/sign-in?code=valid_code")
 
     assert response.status_code == 200
     assert response.json() == {"token": "valid_token", "expires_in": 100}
     mock_auth_with_code.assert_called_once_with("valid_code", REDIRECT_URI)
     mock_user_info_with_token.assert_called_once_with("valid_token")
-    assert mock_db.query.call_count == 1
-    assert mock_create_user.call_count == 0
+    assert mock_db.query.call_count == 0
+    mock_upsert_user.assert_called_once_with(
+        CreateUser(
+            id="id1",
+            given_name="given_name1",
+            family_name="family_name1",
+            username="username1",
+            email="email@email.com",
+        ),
+        mock_db,
+    )
 
 
-@patch("routers.user.create_user")
-@patch("routers.user.user_info_with_token", return_value=user_attributes)
+@patch("routers.user.upsert_user")
+@patch(
+    "routers.user.user_info_with_token",
+    return_value={
+        "UserAttributes": list(reversed(user_attributes["UserAttributes"])),
+        "Username": "username1",
+    },
+)
 @patch(
     "routers.user.auth_with_code",
     return_value={"token": "valid_token", "expires_in": 100},
 )
-def test_successful_login_with_valid_credentials_found_email(
-    mock_auth_with_code, mock_user_info_with_token, mock_create_user, mock_db
+def test_login_reads_user_attributes_by_name(
+    mock_auth_with_code, mock_user_info_with_token, mock_upsert_user, mock_db
 ):
-    mock_db.query.return_value.filter.return_value.first.side_effect = [False, True]
-
     response = client.post("/auth/sign-in?code=valid_code")
 
     assert response.status_code == 200
-    assert response.json() == {"token": "valid_token", "expires_in": 100}
-    mock_auth_with_code.assert_called_once_with("valid_code", REDIRECT_URI)
-    mock_user_info_with_token.assert_called_once_with("valid_token")
-    assert mock_db.query.call_count == 2
-    assert mock_create_user.call_count == 0
+    saved_user = mock_upsert_user.call_args.args[0]
+    assert saved_user.id == "id1"
+    assert saved_user.email == "email@email.com"
+    assert saved_user.given_name == "given_name1"
+    assert saved_user.family_name == "family_name1"
 
 
-@patch("routers.user.create_user")
-@patch("routers.user.user_info_with_token", return_value=user_attributes)
+@patch("routers.user.upsert_user")
+@patch("routers.user.user_info_with_token")
+@patch("routers.user.auth_with_code", side_effect=CognitoError("Timeout"))
+def test_login_identity_provider_timeout(
+    mock_auth_with_code, mock_user_info_with_token, mock_upsert_user, mock_db
+):
+    response = client.post("/auth/sign-in?code=valid_code")
+
+    assert response.status_code == 503
+    assert mock_user_info_with_token.call_count == 0
+    assert mock_upsert_user.call_count == 0
+
+
+@patch("routers.user.upsert_user")
+@patch("routers.user.user_info_with_token", side_effect=CognitoError("UserNotFoundException"))
 @patch(
     "routers.user.auth_with_code",
     return_value={"token": "valid_token", "expires_in": 100},
 )
-def test_successful_login_with_valid_credentials_new_user(
-    mock_auth_with_code, mock_user_info_with_token, mock_create_user, mock_db
+def test_login_rejected_by_identity_provider(
+    mock_auth_with_code, mock_user_info_with_token, mock_upsert_user, mock_db
 ):
-    mock_db.query.return_value.filter.return_value.first.side_effect = [False, False]
-
     response = client.post("/auth/sign-in?code=valid_code")
 
-    assert response.status_code == 200
-    assert response.json() == {"token": "valid_token", "expires_in": 100}
-    mock_auth_with_code.assert_called_once_with("valid_code", REDIRECT_URI)
-    mock_user_info_with_token.assert_called_once_with("valid_token")
-    assert mock_db.query.call_count == 2
-    mock_create_user.assert_called_once_with(
-        CreateUser(
-            id=user_attributes["UserAttributes"][4]["Value"],
-            given_name=user_attributes["UserAttributes"][3]["Value"],
-            family_name=user_attributes["UserAttributes"][2]["Value"],
-            username=user_attributes["Username"],
-            email=user_attributes["UserAttributes"][0]["Value"],
-        ),
-        mock_db,
-    )
+    assert response.status_code == 401
+    assert mock_upsert_user.call_count == 0
+
 
 @patch("routers.user.logout_with_token", return_value=True)
 def test_successful_logout(mock_logout_with_token):
@@ -167,4 +178,25 @@ def test_unsuccessful_logout(mock_logout_with_token):
 
     mock_logout_with_token.assert_called_once_with("token")
 
-    app.dependency_overrides = {}
\ No newline at end of file
+    app.dependency_overrides = {}
+
+
+@pytest.mark.parametrize(
+    "code, status_code",
+    [("NotAuthorizedException", 401), ("TooManyRequestsException", 503), ("Timeout", 503)],
+)
+def test_logout_identity_provider_errors(code, status_code):
+    app.dependency_overrides[auth] = lambda: JWTAuthorizationCredentials(
+        jwt_token="token",
+        header={"kid": "some_kid"},
+        claims={"sub": "user_id"},
+        signature="signature",
+        message="message",
+    )
+
+    with patch("routers.user.logout_with_token", side_effect=CognitoError(code)):
+        response = client.get("/auth/logout", headers={"Authorization": "Bearer token"})
+
+    assert response.status_code == status_code
+
+    app.dependency_overrides = {}
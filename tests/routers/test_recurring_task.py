@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from auth.auth import get_current_user
+from auth.JWTBearer import JWTAuthorizationCredentials
+from db.database import get_db
+from main import app
+from routers.recurring_task import auth
+from schemas.recurring_task import RecurringTaskInDB
+
+client = TestClient(app)
+
+credentials = JWTAuthorizationCredentials(
+    jwt_token="token",
+    header={"kid": "some_kid"},
+    claims={"sub": "user_id"},
+    signature="signature",
+    message="message",
+)
+
+headers = {"Authorization": "Bearer token"}
+
+
+@pytest.fixture(autouse=True)
+def overrides(monkeypatch):
+    db = MagicMock(spec=Session)
+    monkeypatch.setitem(app.dependency_overrides, get_db, lambda: db)
+    monkeypatch.setitem(app.dependency_overrides, auth, lambda: credentials)
+    monkeypatch.setitem(app.dependency_overrides, get_current_user, lambda: "username1")
+    return db
+
+
+def recurring_task_data():
+    return {
+        "title": "Stand-up",
+        "description": "Daily stand-up",
+        "priority": "low",
+        "rule": "FREQ=WEEKLY;BYDAY=MO,WE,FR",
+        "starts_at": (datetime.now() + timedelta(days=1)).isoformat(),
+    }
+
+
+@patch("routers.recurring_task.get_user_by_username")
+@patch("routers.recurring_task.create_recurring_task")
+def test_create_recurring_task(mock_create, mock_get_user_by_username):
+    mock_get_user_by_username.return_value = MagicMock(id="user_id")
+    data = recurring_task_data()
+    mock_create.return_value = RecurringTaskInDB(
+        **data, id="series_id", created_at=datetime.now(), user_id="user_id"
+    )
+
+    response = client.post("/recurring-tasks", json=data, headers=headers)
+
+    assert response.status_code == 201
+    assert response.json()["id"] == "series_id"
+    assert mock_create.call_args.args[1] == "user_id"
+
+
+def test_create_recurring_task_rejects_unsupported_rules():
+    data = {**recurring_task_data(), "rule": "FREQ=YEARLY"}
+
+    response = client.post("/recurring-tasks", json=data, headers=headers)
+
+    assert response.status_code == 422
+
+
+@patch("routers.recurring_task.get_user_by_username")
+@patch("routers.recurring_task.delete_recurring_task")
+def test_delete_recurring_task(mock_delete, mock_get_user_by_username, overrides):
+    mock_get_user_by_username.return_value = MagicMock(id="user_id")
+
+    response = client.delete("/recurring-tasks/series_id", headers=headers)
+
+    assert response.status_code == 204
+    mock_delete.assert_called_once_with("series_id", "user_id", overrides)
@@ -0,0 +1,74 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from auth.auth import get_current_user
+from auth.JWTBearer import JWTAuthorizationCredentials
+from db.database import get_db, get_sessionmaker
+from main import app
+from routers import tag, task
+
+client = TestClient(app)
+
+credentials = JWTAuthorizationCredentials(
+    jwt_token="token",
+    header={"kid": "some_kid"},
+    claims={"sub": "user_id"},
+    signature="signature",
+    message="message",
+)
+
+headers = {"Authorization": "Bearer token"}
+
+
+@pytest.fixture(autouse=True)
+def overrides(monkeypatch):
+    db = MagicMock(spec=Session)
+    monkeypatch.setitem(app.dependency_overrides, get_db, lambda: db)
+    monkeypatch.setitem(app.dependency_overrides, get_sessionmaker, lambda: lambda: db)
+    monkeypatch.setitem(app.dependency_overrides, tag.auth, lambda: credentials)
+    monkeypatch.setitem(app.dependency_overrides, task.auth, lambda: credentials)
+    monkeypatch.setitem(app.dependency_overrides, get_current_user, lambda: "username1")
+    return db
+
+
+@patch("routers.tag.get_user_by_username")
+@patch("routers.tag.get_tag_counts")
+def test_get_tags(mock_get_tag_counts, mock_get_user_by_username, overrides):
+    mock_get_user_by_username.return_value = MagicMock(id="user_id")
+    mock_get_tag_counts.return_value = [("home", 2), ("urgent", 1)]
+
+    response = client.get("/tags", headers=headers)
+
+    assert response.status_code == 200
+    assert response.json() == [{"name": "home", "count": 2}, {"name": "urgent", "count": 1}]
+    mock_get_tag_counts.assert_called_once_with("user_id", overrides)
+
+
+@patch("routers.tag.get_user_by_username")
+def test_get_tags_user_not_found(mock_get_user_by_username):
+    mock_get_user_by_username.return_value = None
+
+    response = client.get("/tags", headers=headers)
+
+    assert response.status_code == 404
+
+
+@patch("routers.task.get_user_by_username")
+@patch("routers.task.materialize_recurring_tasks", return_value=0)
+@patch("routers.task.get_task_by_user_id", return_value=[])
+def test_get_tasks_by_tag(mock_get_task_by_user_id, mock_materialize, mock_get_user_by_username, overrides):
+    mock_get_user_by_username.return_value = MagicMock(id="user_id")
+
+    response = client.get("/tasks?tag=home&tag=urgent&tag_match=any", headers=headers)
+
+    assert response.status_code == 200
+    mock_get_task_by_user_id.assert_called_once_with("user_id", overrides, False, ["home", "urgent"], False)
+
+
+def test_get_tasks_rejects_an_unknown_tag_match():
+    response = client.get("/tasks?tag=home&tag_match=some", headers=headers)
+
+    assert response.status_code == 422
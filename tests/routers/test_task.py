@@ -10,11 +10,12 @@ from sqlalchemy.orm import Session
 
 from auth.auth import get_current_user
 from auth.JWTBearer import JWTAuthorizationCredentials, JWTBearer
-from db.database import get_db
+from db.database import get_db, get_sessionmaker
 from main import app
 from models.task import TaskPriority, TaskStatus
+from recurrence.roller import RECURRENCE_MAX_WINDOW_DAYS, utcnow
 from routers.task import auth
-from schemas.task import TaskCreate, TaskInDB
+from schemas.task import SubtaskCreate, SubtaskInDB, TaskCreate, TaskInDB
 
 client = TestClient(app)
 
@@ -30,6 +31,7 @@ credentials = JWTAuthorizationCredentials(
 def mock_db():
     db = MagicMock(spec=Session)
     app.dependency_overrides[get_db] = lambda: db
+    app.dependency_overrides[get_sessionmaker] = lambda: lambda: db
     yield db
 
 @pytest.fixture(autouse=True)
@@ -197,14 +199,17 @@ def test_get_task_not_found(mock_jwt_bearer, mock_get_task_by_id, mock_db):
     assert response.json()["detail"] == "Task not found"
 
 # test get_tasks_by_status
+@patch("routers.task.get_user_by_username")
 @patch("routers.task.get_task_by_status")
 @patch.object(JWTBearer, "__call__", return_value=credentials)
-def test_get_tasks_by_status(mock_jwt_bearer, mock_get_task_by_status, mock_db):
+def test_get_tasks_by_status(mock_jwt_bearer, mock_get_task_by_status, mock_get_user_by_username, mock_db):
     app.dependency_overrides[auth] = lambda: credentials
     app.dependency_overrides[get_current_user] = lambda: "username1"
 
     headers = {"Authorization": "Bearer token"}
 
+    mock_get_user_by_username.return_value = MagicMock(id="user_id")
+
     mock_get_task_by_status.return_value = [
         TaskInDB(
             title="Test Task",
@@ -222,6 +227,7 @@ def test_get_tasks_by_status(mock_jwt_bearer, mock_get_task_by_status, mock_db):
 
     assert response.status_code == 200
     assert len(response.json()) == 1
+    mock_get_task_by_status.assert_called_once_with("todo", mock_db, False, "user_id")
 
     task = response.json()[0]
     assert task["title"] == "Test Task"
@@ -279,4 +285,153 @@ def test_delete_task(mock_jwt_bearer, mock_delete_task, mock_db):
 
     response = client.delete("/tasks/task_id", headers=headers)
 
-    assert response.status_code == 204
\ No newline at end of file
+    assert response.status_code == 204
+
+@patch("routers.task.get_user_by_username")
+@patch("routers.task.restore_task")
+@patch.object(JWTBearer, "__call__", return_value=credentials)
+def test_restore_task(mock_jwt_bearer, mock_restore_task, mock_get_user_by_username, mock_db):
+    app.dependency_overrides[auth] = lambda: credentials
+    app.dependency_overrides[get_current_user] = lambda: "username1"
+
+    mock_get_user_by_username.return_value = MagicMock(id="user_id")
+
+    mock_restore_task.return_value = TaskInDB(
+        title="Test Task",
+        description="Test Description",
+        priority="low",
+        deadline=datetime.now() + timedelta(days=1),
+        created_at=datetime.now(),
+        id="task_id",
+        user_id="user_id",
+        status=TaskStatus.TODO,
+    )
+
+    response = client.post("/tasks/task_id/restore", headers={"Authorization": "Bearer token"})
+
+    assert response.status_code == 200
+    assert response.json()["id"] == "task_id"
+    mock_restore_task.assert_called_once_with("task_id", mock_db, "user_id")
+
+@patch("routers.task.get_user_by_username")
+@patch("routers.task.get_task_by_user_id")
+@patch.object(JWTBearer, "__call__", return_value=credentials)
+def test_get_tasks_include_archived(mock_jwt_bearer, mock_get_task_by_user_id, mock_get_user_by_username, mock_db):
+    app.dependency_overrides[auth] = lambda: credentials
+    app.dependency_overrides[get_current_user] = lambda: "username1"
+
+    mock_get_user_by_username.return_value = MagicMock(id="user_id")
+    mock_get_task_by_user_id.return_value = []
+
+    response = client.get("/tasks?include_archived=true", headers={"Authorization": "Bearer token"})
+
+    assert response.status_code == 200
+    mock_get_task_by_user_id.assert_called_once_with("user_id", mock_db, True, [], True)
+
+@patch("routers.task.get_user_by_username")
+@patch("routers.task.get_task_by_user_id")
+@patch("routers.task.materialize_recurring_tasks")
+@patch.object(JWTBearer, "__call__", return_value=credentials)
+def test_get_tasks_caps_the_materialization_horizon(mock_jwt_bearer, mock_materialize, mock_get_task_by_user_id, mock_get_user_by_username, mock_db):
+    app.dependency_overrides[auth] = lambda: credentials
+    app.dependency_overrides[get_current_user] = lambda: "username1"
+
+    mock_get_user_by_username.return_value = MagicMock(id="user_id")
+    mock_get_task_by_user_id.return_value = []
+    mock_materialize.return_value = 0
+
+    response = client.get("/tasks?until=2999-01-01T00:00:00Z", headers={"Authorization": "Bearer token"})
+
+    assert response.status_code == 200
+    needed = mock_materialize.call_args.args[1]
+    assert needed <= utcnow() + timedelta(days=RECURRENCE_MAX_WINDOW_DAYS)
+
+@patch("routers.task.get_user_by_username")
+@patch("routers.task.get_task_by_user_id")
+@patch("routers.task.materialize_recurring_tasks")
+@patch.object(JWTBearer, "__call__", return_value=credentials)
+def test_get_tasks_reads_new_occurrences_on_the_session_that_created_them(mock_jwt_bearer, mock_materialize, mock_get_task_by_user_id, mock_get_user_by_username, mock_db, monkeypatch):
+    app.dependency_overrides[auth] = lambda: credentials
+    app.dependency_overrides[get_current_user] = lambda: "username1"
+    monkeypatch.setitem(app.dependency_overrides, get_sessionmaker, lambda: MagicMock)
+
+    mock_get_user_by_username.return_value = MagicMock(id="user_id")
+    mock_get_task_by_user_id.return_value = []
+    mock_materialize.return_value = 2
+
+    response = client.get("/tasks", headers={"Authorization": "Bearer token"})
+
+    assert response.status_code == 200
+    mock_get_task_by_user_id.assert_called_once_with("user_id", mock_db, False, [], True)
+
+@patch("routers.task.get_user_by_username")
+@patch("routers.task.add_subtask")
+@patch.object(JWTBearer, "__call__", return_value=credentials)
+def test_create_subtask(mock_jwt_bearer, mock_add_subtask, mock_get_user_by_username, mock_db):
+    app.dependency_overrides[auth] = lambda: credentials
+    app.dependency_overrides[get_current_user] = lambda: "username1"
+
+    mock_get_user_by_username.return_value = MagicMock(id="user_id")
+
+    mock_add_subtask.return_value = TaskInDB(
+        title="Test Task",
+        description="Test Description",
+        priority="low",
+        deadline=datetime.now() + timedelta(days=1),
+        created_at=datetime.now(),
+        id="task_id",
+        user_id="user_id",
+        status=TaskStatus.TODO,
+        subtasks=[SubtaskInDB(id="subtask_id", title="Step", done=False, position=0)],
+    )
+
+    response = client.post(
+        "/tasks/task_id/subtasks", json={"title": "Step"}, headers={"Authorization": "Bearer token"}
+    )
+
+    assert response.status_code == 201
+    assert response.json()["subtasks"] == [{"id": "subtask_id", "title": "Step", "done": False, "position": 0}]
+    mock_add_subtask.assert_called_once_with("task_id", SubtaskCreate(title="Step"), mock_db, "user_id")
+
+@patch("routers.task.get_user_by_username")
+@patch("routers.task.update_task")
+@patch.object(JWTBearer, "__call__", return_value=credentials)
+def test_update_task_forbidden(mock_jwt_bearer, mock_update_task, mock_get_user_by_username, mock_db):
+    app.dependency_overrides[auth] = lambda: credentials
+    app.dependency_overrides[get_current_user] = lambda: "username1"
+
+    mock_get_user_by_username.return_value = MagicMock(id="user_id")
+    mock_update_task.side_effect = HTTPException(status_code=403, detail="Not allowed to change this task")
+
+    response = client.put("/tasks/task_id", json={"title": "New"}, headers={"Authorization": "Bearer token"})
+
+    assert response.status_code == 403
+    assert mock_update_task.call_args.args[3] == "user_id"
+
+@patch("routers.task.get_user_by_username")
+@patch("routers.task.create_task_once")
+@patch.object(JWTBearer, "__call__", return_value=credentials)
+def test_create_new_task_replays_idempotent_requests(mock_jwt_bearer, mock_create_task_once, mock_get_user_by_username, mock_db):
+    app.dependency_overrides[auth] = lambda: credentials
+    app.dependency_overrides[get_current_user] = lambda: "username1"
+
+    task_data = {
+        "title": "Test Task",
+        "description": "Test Description",
+        "priority": "low",
+        "deadline": (datetime.now() + timedelta(days=1)).isoformat()
+    }
+    mock_get_user_by_username.return_value = MagicMock(id="user_id")
+    mock_create_task_once.return_value = (
+        TaskInDB(**task_data, created_at=datetime.now(), id="task_id", user_id="user_id", status=TaskStatus.TODO),
+        True,
+    )
+
+    response = client.post(
+        "/tasks", json=task_data, headers={"Authorization": "Bearer token", "Idempotency-Key": "key-1"}
+    )
+
+    assert response.status_code == 201
+    assert response.json()["id"] == "task_id"
+    assert response.headers["Idempotent-Replayed"] == "true"
+    assert mock_create_task_once.call_args.args[1:3] == ("user_id", "key-1")
@@ -0,0 +1,76 @@
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from auth.auth import get_current_user
+from auth.JWTBearer import JWTAuthorizationCredentials
+from db.database import get_db
+from main import app
+from models.task_list import ListRole
+from routers.task_list import auth
+
+client = TestClient(app)
+
+credentials = JWTAuthorizationCredentials(
+    jwt_token="token",
+    header={"kid": "some_kid"},
+    claims={"sub": "user_id"},
+    signature="signature",
+    message="message",
+)
+
+headers = {"Authorization": "Bearer token"}
+
+
+@pytest.fixture(autouse=True)
+def overrides(monkeypatch):
+    db = MagicMock(spec=Session)
+    monkeypatch.setitem(app.dependency_overrides, get_db, lambda: db)
+    monkeypatch.setitem(app.dependency_overrides, auth, lambda: credentials)
+    monkeypatch.setitem(app.dependency_overrides, get_current_user, lambda: "username1")
+    return db
+
+
+def task_list():
+    return MagicMock(id="list_id", owner_id="user_id", created_at=datetime.now())
+
+
+@patch("routers.task_list.get_user_by_username")
+@patch("routers.task_list.create_task_list")
+def test_create_task_list(mock_create, mock_get_user_by_username):
+    mock_get_user_by_username.return_value = MagicMock(id="user_id")
+    created = task_list()
+    created.name = "Groceries"
+    mock_create.return_value = (created, ListRole.OWNER)
+
+    response = client.post("/lists", json={"name": "Groceries"}, headers=headers)
+
+    assert response.status_code == 201
+    assert response.json()["role"] == "owner"
+    assert mock_create.call_args.args[1] == "user_id"
+
+
+@patch("routers.task_list.get_user_by_username")
+@patch("routers.task_list.set_member")
+def test_add_member(mock_set_member, mock_get_user_by_username, overrides):
+    mock_get_user_by_username.side_effect = [MagicMock(id="user_id"), MagicMock(id="member_id")]
+    mock_set_member.return_value = MagicMock(list_id="list_id", user_id="member_id", role=ListRole.VIEWER)
+
+    response = client.post(
+        "/lists/list_id/members", json={"username": "member", "role": "viewer"}, headers=headers
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {"list_id": "list_id", "user_id": "member_id", "role": "viewer"}
+    mock_set_member.assert_called_once_with("list_id", "user_id", "member_id", "viewer", overrides)
+
+
+def test_add_member_rejects_the_owner_role():
+    response = client.post(
+        "/lists/list_id/members", json={"username": "member", "role": "owner"}, headers=headers
+    )
+
+    assert response.status_code == 422
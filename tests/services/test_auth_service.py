@@ -1,10 +1,11 @@
 import base64
 import logging
-import os
 from unittest.mock import patch
 
 import pytest
 
+from auth.cognito import (COGNITO_TIMEOUT_SECONDS, CognitoProvider,
+                          set_cognito_provider)
 from auth.user_auth import (auth_with_code, logout_with_token,
                             user_info_with_token)
 
@@ -30,17 +31,54 @@ class RequestsMockResponse:
         return self.json_data
 
 
-@pytest.fixture(autouse=True, scope="module")
-def setup_environ():
-    logger.info("Setting up environment")
-    os.environ["COGNITO_USER_CLIENT_ID"] = cognito_user_client_id
-    os.environ["COGNITO_USER_CLIENT_SECRET"] = cognito_user_client_secret
-    os.environ["COGNITO_TOKEN_ENDPOINT"] = cognito_token_endpoint
+@pytest.fixture(name="provider")
+def setup_provider():
+    logger.info("Setting up provider")
+    provider = CognitoProvider(
+        client_id=cognito_user_client_id,
+        client_secret=cognito_user_client_secret,
+        token_endpoint=cognito_token_endpoint,
+    )
+    set_cognito_provider(provider)
+    yield provider
+    set_cognito_provider(None)
+
+
+@pytest.fixture(name="requests_post_mock")
+def patch_session_post(provider):
+    with patch.object(provider.session, "post") as requests_post_mock:
+        yield requests_post_mock
+
+
+def test_provider_precomputes_credentials(provider):
+    assert provider._token_headers == headers
+
+
+def test_provider_reuses_session(provider):
+    session = provider.session
+
+    assert provider.session is session
+    adapter = session.get_adapter(cognito_token_endpoint)
+    assert adapter.max_retries.total > 0
+    assert adapter.max_retries.read == 0
+
+
+def test_token_endpoint_is_not_retried_after_it_may_have_used_the_code(provider):
+    token = provider.session.get_adapter(cognito_token_endpoint).max_retries
+    jwks = provider.session.get_adapter("https://cognito-idp.us-east-1.amazonaws.com/pool").max_retries
+
+    assert token.is_retry("POST", 503)
+    assert token.is_retry("POST", 429)
+    for status_code in (500, 502, 504):
+        assert not token.is_retry("POST", status_code)
+        assert jwks.is_retry("GET", status_code)
+    assert not jwks.is_retry("POST", 503)
 
 
 # 400 it's just a random error status code to test the error handling
-@patch("auth.user_auth.requests.post", return_value=RequestsMockResponse({}, 400))
 def test_unsuccessful_auth_with_code(requests_post_mock):
+    requests_post_mock.return_value = RequestsMockResponse({}, 400)
+
     payload = {
         "grant_type": "authorization_code",
         "code": "code",
@@ -51,18 +89,19 @@ def test_unsuccessful_auth_with_code(requests_post_mock):
     result = auth_with_code("code", "redirect_uri")
 
     requests_post_mock.assert_called_once_with(
-        cognito_token_endpoint, data=payload, headers=headers
+        cognito_token_endpoint,
+        data=payload,
+        headers=headers,
+        timeout=COGNITO_TIMEOUT_SECONDS,
     )
     assert result is None
 
 
-@patch(
-    "auth.user_auth.requests.post",
-    return_value=RequestsMockResponse(
-        {"access_token": "client_access_token", "expires_in": 200}, 200
-    ),
-)
 def test_successful_auth_with_code(requests_post_mock):
+    requests_post_mock.return_value = RequestsMockResponse(
+        {"access_token": "client_access_token", "expires_in": 200}, 200
+    )
+
     payload = {
         "grant_type": "authorization_code",
         "code": "code",
@@ -73,57 +112,52 @@ def test_successful_auth_with_code(requests_post_mock):
     result = auth_with_code("code", "redirect_uri")
 
     requests_post_mock.assert_called_once_with(
-        cognito_token_endpoint, data=payload, headers=headers
+        cognito_token_endpoint,
+        data=payload,
+        headers=headers,
+        timeout=COGNITO_TIMEOUT_SECONDS,
     )
     assert result == {"token": "client_access_token", "expires_in": 200}
 
 
-@patch(
-    "auth.user_auth.cognito_client.get_user",
-    return_value={"ResponseMetadata": {"HTTPStatusCode": 200}},
-)
-def test_user_info_with_token(mock_cognito_client_get_user_function):
+@patch("auth.user_auth.get_cognito_provider")
+def test_user_info_with_token(mock_get_cognito_provider):
+    mock_cognito_client_get_user_function = mock_get_cognito_provider.return_value.get_user
+    mock_cognito_client_get_user_function.return_value = {"ResponseMetadata": {"HTTPStatusCode": 200}}
+
     result = user_info_with_token("access_token")
 
-    mock_cognito_client_get_user_function.assert_called_once_with(
-        AccessToken="access_token"
-    )
+    mock_cognito_client_get_user_function.assert_called_once_with("access_token")
     assert result == {"ResponseMetadata": {"HTTPStatusCode": 200}}
 
 
-@patch(
-    "auth.user_auth.cognito_client.get_user",
-    return_value={"ResponseMetadata": {"HTTPStatusCode": 400}},
-)
-def test_unsuccessful_user_info_with_token(mock_cognito_client_get_user_function):
+@patch("auth.user_auth.get_cognito_provider")
+def test_unsuccessful_user_info_with_token(mock_get_cognito_provider):
+    mock_cognito_client_get_user_function = mock_get_cognito_provider.return_value.get_user
+    mock_cognito_client_get_user_function.return_value = {"ResponseMetadata": {"HTTPStatusCode": 400}}
+
     result = user_info_with_token("access_token_2")
 
-    mock_cognito_client_get_user_function.assert_called_once_with(
-        AccessToken="access_token_2"
-    )
+    mock_cognito_client_get_user_function.assert_called_once_with("access_token_2")
     assert result is None
 
-@patch(
-    "auth.user_auth.cognito_client.global_sign_out",
-    return_value={"ResponseMetadata": {"HTTPStatusCode": 200}},
-)
-def test_logout_with_token(mock_cognito_client_global_sign_out_function):
+@patch("auth.user_auth.get_cognito_provider")
+def test_logout_with_token(mock_get_cognito_provider):
+    mock_cognito_client_global_sign_out_function = mock_get_cognito_provider.return_value.global_sign_out
+    mock_cognito_client_global_sign_out_function.return_value = {"ResponseMetadata": {"HTTPStatusCode": 200}}
+
     result = logout_with_token("access_token")
 
-    mock_cognito_client_global_sign_out_function.assert_called_once_with(
-        AccessToken="access_token"
-    )
+    mock_cognito_client_global_sign_out_function.assert_called_once_with("access_token")
     assert result == True
 
 
-@patch(
-    "auth.user_auth.cognito_client.global_sign_out",
-    return_value={"ResponseMetadata": {"HTTPStatusCode": 400}},
-)
-def test_unsuccessful_logout_with_token(mock_cognito_client_global_sign_out_function):
+@patch("auth.user_auth.get_cognito_provider")
+def test_unsuccessful_logout_with_token(mock_get_cognito_provider):
+    mock_cognito_client_global_sign_out_function = mock_get_cognito_provider.return_value.global_sign_out
+    mock_cognito_client_global_sign_out_function.return_value = {"ResponseMetadata": {"HTTPStatusCode": 400}}
+
     result = logout_with_token("access_token_2")
 
-    mock_cognito_client_global_sign_out_function.assert_called_once_with(
-        AccessToken="access_token_2"
-    )
+    mock_cognito_client_global_sign_out_function.assert_called_once_with("access_token_2")
     assert result == False
\ No newline at end of file
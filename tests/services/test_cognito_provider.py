@@ -0,0 +1,216 @@
+import asyncio
+import base64
+import json
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+from botocore.exceptions import ClientError, EndpointConnectionError
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from auth.cognito import (CognitoError, CognitoProvider, FakeCognitoProvider,
+                          call_cognito, get_cognito_provider,
+                          set_cognito_provider)
+from auth.JWTBearer import JWKS, JWTAuthorizationCredentials, JWTBearer
+from observability.metrics import CACHE_REQUESTS
+
+
+def make_token(claims: dict) -> str:
+    payload = base64.urlsafe_b64encode(json.dumps(claims).encode()).decode().rstrip("=")
+    return f"header.{payload}.signature"
+
+
+def test_real_provider_is_lazy():
+    provider = CognitoProvider(region="eu-west-1", user_pool_id="pool")
+
+    assert provider._client is None
+    assert provider._jwks is None
+
+
+def test_jwt_bearer_loads_jwks_on_first_use():
+    loader = MagicMock(return_value=JWKS(keys=[{"kid": "kid1", "kty": "RSA"}]))
+
+    bearer = JWTBearer(loader)
+    assert loader.call_count == 0
+
+    assert bearer.kid_to_jwk == {"kid1": {"kid": "kid1", "kty": "RSA"}}
+    assert bearer.kid_to_jwk is bearer.kid_to_jwk
+    assert loader.call_count == 1
+
+
+def jwks_response(status_code: int, body: dict) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = json.dumps(body).encode()
+    return response
+
+
+def test_real_provider_does_not_keep_a_failed_jwks_fetch():
+    provider = CognitoProvider(region="eu-west-1", user_pool_id="pool")
+    provider._session = MagicMock()
+    provider._session.get.side_effect = [
+        jwks_response(503, {"message": "Service Unavailable"}),
+        jwks_response(200, {"message": "not a key set"}),
+        jwks_response(200, {"keys": [{"kid": "kid1"}]}),
+    ]
+
+    with pytest.raises(requests.HTTPError):
+        provider.jwks()
+    with pytest.raises(ValueError):
+        provider.jwks()
+    hits, misses = CACHE_REQUESTS.value(("jwks", "hit")), CACHE_REQUESTS.value(("jwks", "miss"))
+
+    assert provider.jwks() == {"keys": [{"kid": "kid1"}]}
+    assert provider.jwks() == {"keys": [{"kid": "kid1"}]}
+    assert provider._session.get.call_count == 3
+    assert CACHE_REQUESTS.value(("jwks", "hit")) == hits + 1
+    assert CACHE_REQUESTS.value(("jwks", "miss")) == misses + 1
+
+
+def test_jwt_bearer_refresh_fetches_the_provider_keys_again():
+    provider = CognitoProvider(region="eu-west-1", user_pool_id="pool")
+    provider._session = MagicMock()
+    provider._session.get.side_effect = [
+        jwks_response(200, {"keys": [{"kid": "old"}]}),
+        jwks_response(200, {"keys": [{"kid": "new"}]}),
+    ]
+    set_cognito_provider(provider)
+    try:
+        bearer = JWTBearer(lambda: JWKS.model_validate(get_cognito_provider().jwks()))
+        assert list(bearer.kid_to_jwk) == ["old"]
+
+        bearer.refresh_keys()
+        assert list(bearer.kid_to_jwk) == ["new"]
+    finally:
+        set_cognito_provider(None)
+
+
+def test_jwt_bearer_refreshes_the_keys_on_an_unknown_kid_at_most_once_per_interval():
+    loader = MagicMock(side_effect=[JWKS(keys=[{"kid": kid}]) for kid in ("old", "new", "newer")])
+    now = [0.0]
+    bearer = JWTBearer(loader, clock=lambda: now[0])
+
+    def verify(kid):
+        credentials = JWTAuthorizationCredentials(
+            jwt_token="token", header={"kid": kid}, claims={}, signature="c2lnbmF0dXJl", message="message"
+        )
+        with patch("auth.JWTBearer.jwk.construct") as construct:
+            construct.return_value.verify.return_value = True
+            return bearer.verify_jwk_token(credentials)
+
+    assert verify("old")
+    assert verify("new")
+    assert loader.call_count == 2
+
+    with pytest.raises(HTTPException) as exc_info:
+        verify("newer")
+    assert exc_info.value.status_code == 403
+    assert loader.call_count == 2
+
+    now[0] += 61
+    assert verify("newer")
+    assert loader.call_count == 3
+
+
+def test_jwt_bearer_answers_503_when_the_keys_cannot_be_loaded():
+    bearer = JWTBearer(MagicMock(side_effect=requests.HTTPError("503 Server Error")))
+    credentials = JWTAuthorizationCredentials(
+        jwt_token="token", header={"kid": "kid1"}, claims={}, signature="signature", message="message"
+    )
+
+    with pytest.raises(HTTPException) as exc_info:
+        bearer.verify_jwk_token(credentials)
+    assert exc_info.value.status_code == 503
+    assert bearer._kid_to_jwk is None
+
+
+def test_real_provider_errors_tell_rejections_from_outages():
+    provider = CognitoProvider(region="eu-west-1", user_pool_id="pool")
+    provider._client = MagicMock()
+    provider._client.get_user.side_effect = [
+        ClientError({"Error": {"Code": "UserNotFoundException"}}, "GetUser"),
+        EndpointConnectionError(endpoint_url="https://cognito-idp.eu-west-1.amazonaws.com"),
+    ]
+
+    with pytest.raises(CognitoError) as rejected:
+        provider.get_user("token")
+    with pytest.raises(CognitoError) as unreachable:
+        provider.get_user("token")
+
+    assert not rejected.value.unavailable
+    assert unreachable.value.code == "Unavailable"
+    assert unreachable.value.unavailable
+
+
+def test_real_provider_token_endpoint_failure_is_unavailable():
+    provider = CognitoProvider(region="eu-west-1", user_pool_id="pool", token_endpoint="https://auth/token")
+    provider._session = MagicMock()
+    provider._session.post.return_value = jwks_response(502, {})
+
+    with pytest.raises(CognitoError) as exc_info:
+        provider.exchange_code("code", "redirect_uri")
+    assert exc_info.value.unavailable
+
+
+@pytest.mark.parametrize(
+    "code, status_code", [("UserNotFoundException", 403), ("TooManyRequestsException", 503)]
+)
+def test_jwt_bearer_answers_503_only_when_the_provider_is_unavailable(code, status_code):
+    bearer = JWTBearer(JWKS(keys=[]))
+    request = Request({"type": "http", "headers": [(b"authorization", b"Bearer a.b.c")]})
+
+    with patch("auth.JWTBearer.user_info_with_token", side_effect=CognitoError(code)):
+        with pytest.raises(HTTPException) as exc_info:
+            asyncio.run(bearer(request))
+    assert exc_info.value.status_code == status_code
+
+
+def test_fake_provider_get_user():
+    provider = FakeCognitoProvider()
+    token = make_token({"sub": "id1", "username": "username1", "email": "email1"})
+
+    user_info = provider.get_user(token)
+
+    assert user_info["Username"] == "username1"
+    attributes = {a["Name"]: a["Value"] for a in user_info["UserAttributes"]}
+    assert attributes["sub"] == "id1"
+    assert attributes["email"] == "email1"
+
+
+def test_fake_provider_revokes_on_sign_out():
+    provider = FakeCognitoProvider()
+    token = make_token({"sub": "id1", "username": "username1"})
+
+    provider.global_sign_out(token)
+
+    with pytest.raises(CognitoError) as exc_info:
+        provider.get_user(token)
+    assert exc_info.value.code == "NotAuthorizedException"
+
+
+def test_set_cognito_provider():
+    provider = FakeCognitoProvider()
+    set_cognito_provider(provider)
+    try:
+        assert get_cognito_provider() is provider
+    finally:
+        set_cognito_provider(None)
+
+
+def test_call_cognito_runs_off_the_event_loop():
+    async def run():
+        return await call_cognito(threading.current_thread)
+
+    assert asyncio.run(run()).name.startswith("cognito")
+
+
+def test_call_cognito_timeout():
+    async def run():
+        await call_cognito(time.sleep, 1, timeout=0.05)
+
+    with pytest.raises(CognitoError) as exc_info:
+        asyncio.run(run())
+    assert exc_info.value.code == "Timeout"
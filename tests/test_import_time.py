@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative import time of `main`, in microseconds. Mostly FastAPI/pydantic;
+# pulling boto3/botocore back in at import time would blow through it.
+IMPORT_BUDGET_US = 3_000_000
+
+
+def import_times(module: str) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT_DIR,
+        env={**os.environ, "COGNITO_PROVIDER": "fake"},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_main_import_does_not_load_aws_sdk():
+    times = import_times("main")
+
+    assert "main" in times
+    assert not [name for name in times if name.split(".")[0] in ("boto3", "botocore")]
+
+
+def test_main_import_time_budget():
+    times = import_times("main")
+
+    assert times["main"] < IMPORT_BUDGET_US
@@ -0,0 +1,69 @@
+from unittest.mock import patch
+
+import server
+
+
+def test_workers_default_to_available_cores(monkeypatch):
+    monkeypatch.setattr(server, "WEB_CONCURRENCY", None)
+    monkeypatch.setattr(server, "available_cpus", lambda: 6)
+
+    options = server.uvicorn_options(server.parse_args([]))
+
+    assert options["workers"] == 6
+
+
+def test_web_concurrency_and_cli_override_cores(monkeypatch):
+    monkeypatch.setattr(server, "WEB_CONCURRENCY", "3")
+    assert server.uvicorn_options(server.parse_args([]))["workers"] == 3
+    assert server.uvicorn_options(server.parse_args(["--workers", "2"]))["workers"] == 2
+
+
+def test_fast_loop_and_parser_are_used_when_installed():
+    with patch("importlib.util.find_spec", return_value=object()):
+        assert server.event_loop() == "uvloop"
+        assert server.http_protocol() == "httptools"
+    with patch("importlib.util.find_spec", return_value=None):
+        assert server.event_loop() == "asyncio"
+        assert server.http_protocol() == "h11"
+
+
+def test_connection_settings_are_passed_to_uvicorn():
+    args = server.parse_args(
+        ["--keep-alive", "90", "--backlog", "4096", "--graceful-timeout", "10",
+         "--limit-concurrency", "500"]
+    )
+
+    options = server.uvicorn_options(args)
+
+    assert options["timeout_keep_alive"] == 90
+    assert options["backlog"] == 4096
+    assert options["timeout_graceful_shutdown"] == 10
+    assert options["limit_concurrency"] == 500
+    assert options["limit_max_requests"] is None
+    assert options["log_config"] is None
+
+
+def test_main_runs_the_app_under_uvicorn():
+    with patch("uvicorn.run") as run:
+        server.main(["--workers", "1", "--port", "9000"])
+
+    run.assert_called_once()
+    assert run.call_args.args == ("main:app",)
+    assert run.call_args.kwargs["port"] == 9000
+
+
+def test_available_cpus_is_positive():
+    assert server.available_cpus() >= 1
+
+
+def test_warm_pool_leaves_open_connections_in_the_pool(tmp_path):
+    from sqlalchemy import create_engine
+
+    from db.database import warm_pool
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'warm.db'}")
+
+    warm_pool(engine, 3)
+
+    assert engine.pool.checkedin() == 3
+    engine.dispose()
@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from throttling.admission import ADMISSION_REJECTED, AdmissionLimiter
+
+
+def test_admits_up_to_the_limit_and_queues_the_rest():
+    async def scenario():
+        limiter = AdmissionLimiter(max_in_flight=2, max_queued=1, timeout=1)
+        await limiter.acquire()
+        await limiter.acquire()
+
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.queued == 1
+
+        limiter.release()
+        await waiter
+        assert limiter.in_flight == 2
+        assert limiter.queued == 0
+
+    asyncio.run(scenario())
+
+
+def test_sheds_load_when_the_queue_is_full():
+    async def scenario():
+        limiter = AdmissionLimiter(max_in_flight=1, max_queued=0, timeout=1)
+        await limiter.acquire()
+        with pytest.raises(HTTPException) as exc_info:
+            await limiter.acquire()
+        return exc_info.value
+
+    before = ADMISSION_REJECTED.value(("queue_full",))
+
+    error = asyncio.run(scenario())
+
+    assert error.status_code == 503
+    assert error.headers["Retry-After"] == "1"
+    assert ADMISSION_REJECTED.value(("queue_full",)) == before + 1
+
+
+def test_queued_requests_time_out():
+    async def scenario():
+        limiter = AdmissionLimiter(max_in_flight=1, max_queued=5, timeout=0.01)
+        await limiter.acquire()
+        with pytest.raises(HTTPException):
+            await limiter.acquire()
+        assert limiter.queued == 0
+
+    asyncio.run(scenario())
+
+
+def test_dependency_releases_its_slot():
+    async def scenario():
+        limiter = AdmissionLimiter(max_in_flight=1, max_queued=0, timeout=1)
+        dependency = limiter()
+        await dependency.__anext__()
+        assert limiter.in_flight == 1
+        with pytest.raises(StopAsyncIteration):
+            await dependency.__anext__()
+        assert limiter.in_flight == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,102 @@
+import asyncio
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from auth.JWTBearer import JWTAuthorizationCredentials
+from db.database import get_db, get_sessionmaker
+from main import app
+from routers.task import auth
+from throttling.rate_limit import (RATE_LIMIT_TASKS_BURST, RATE_LIMITED,
+                                   MemoryBackend, set_rate_limit_backend)
+
+client = TestClient(app)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def acquire(backend, key="k", rate=1.0, burst=2):
+    return asyncio.run(backend.acquire(key, rate, burst))
+
+
+def test_bucket_allows_burst_then_refills():
+    clock = FakeClock()
+    backend = MemoryBackend(clock=clock)
+
+    assert acquire(backend)[0]
+    assert acquire(backend)[0]
+    allowed, retry_after = acquire(backend)
+    assert not allowed
+    assert retry_after == pytest.approx(1.0)
+
+    clock.now = 0.5
+    assert not acquire(backend)[0]
+    clock.now = 1.0
+    assert acquire(backend)[0]
+
+
+def test_buckets_are_independent_per_key():
+    backend = MemoryBackend(clock=FakeClock())
+    acquire(backend, "a", burst=1)
+
+    assert not acquire(backend, "a", burst=1)[0]
+    assert acquire(backend, "b", burst=1)[0]
+
+
+def test_least_recently_used_buckets_are_evicted():
+    backend = MemoryBackend(max_keys=2, clock=FakeClock())
+    for key in ("a", "b", "c"):
+        acquire(backend, key)
+
+    assert list(backend._buckets) == ["b", "c"]
+
+
+@pytest.fixture
+def fresh_backend():
+    # A frozen clock, so no tokens are refilled while the test runs
+    set_rate_limit_backend(MemoryBackend(clock=FakeClock()))
+    yield
+    set_rate_limit_backend(None)
+    app.dependency_overrides.clear()
+
+
+def test_task_routes_answer_429_per_user(fresh_backend):
+    credentials = JWTAuthorizationCredentials(
+        jwt_token="token",
+        header={"kid": "kid"},
+        claims={"username": "greedy"},
+        signature="signature",
+        message="message",
+    )
+    app.dependency_overrides[auth] = lambda: credentials
+    app.dependency_overrides[get_db] = lambda: None
+    app.dependency_overrides[get_sessionmaker] = lambda: MagicMock
+    before = RATE_LIMITED.value(("tasks",))
+
+    with patch("routers.task.get_user_by_username", return_value=MagicMock(id="greedy")), \
+            patch("routers.task.get_task_by_status", return_value=[]):
+        statuses = [
+            client.get("/tasks/status/todo").status_code
+            for _ in range(RATE_LIMIT_TASKS_BURST + 1)
+        ]
+
+    assert statuses[:-1] == [200] * RATE_LIMIT_TASKS_BURST
+    assert statuses[-1] == 429
+    assert RATE_LIMITED.value(("tasks",)) > before
+
+
+def test_sign_in_is_limited_per_client_address(fresh_backend):
+    with patch("routers.user.call_cognito", return_value=None):
+        statuses = [client.post("/auth/sign-in?code=x").status_code for _ in range(12)]
+
+    assert statuses[:10] == [401] * 10
+    assert statuses[10:] == [429, 429]
+    response = client.post("/auth/sign-in?code=x")
+    assert int(response.headers["retry-after"]) >= 1
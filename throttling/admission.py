@@ -0,0 +1,98 @@
+"""
+Admission control for database-heavy requests.
+
+Each worker lets at most DB_MAX_IN_FLIGHT such requests run at once. Up to
+DB_MAX_QUEUED more may wait, for at most DB_QUEUE_TIMEOUT_MS; anything beyond
+is answered 503 with Retry-After straight away. Rejecting early keeps the
+latency of admitted requests bounded instead of letting every request slow
+down together once the connection pool is exhausted.
+"""
+import asyncio
+import os
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from starlette.status import HTTP_503_SERVICE_UNAVAILABLE
+
+from observability.metrics import REGISTRY, Counter, Gauge
+
+load_dotenv()
+
+# Matches the default SQLAlchemy pool (5 connections + 10 overflow)
+DB_MAX_IN_FLIGHT = int(os.environ.get("DB_MAX_IN_FLIGHT", "15"))
+DB_MAX_QUEUED = int(os.environ.get("DB_MAX_QUEUED", "50"))
+DB_QUEUE_TIMEOUT_MS = float(os.environ.get("DB_QUEUE_TIMEOUT_MS", "500"))
+
+ADMISSION_IN_FLIGHT = REGISTRY.register(
+    Gauge("admission_in_flight", "Admitted database-heavy requests in progress.")
+)
+ADMISSION_QUEUED = REGISTRY.register(
+    Gauge("admission_queued", "Database-heavy requests waiting for admission.")
+)
+ADMISSION_REJECTED = REGISTRY.register(
+    Counter("admission_rejected_total", "Requests shed by admission control.", ("reason",))
+)
+
+
+class AdmissionLimiter:
+    def __init__(
+        self,
+        max_in_flight: int = DB_MAX_IN_FLIGHT,
+        max_queued: int = DB_MAX_QUEUED,
+        timeout: float = DB_QUEUE_TIMEOUT_MS / 1000,
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self.in_flight = 0
+        self.queued = 0
+        # Created on first use, inside the worker's event loop
+        self._semaphore = None
+
+    def _reject(self, reason: str):
+        ADMISSION_REJECTED.inc((reason,))
+        raise HTTPException(
+            status_code=HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server busy, try again",
+            headers={"Retry-After": "1"},
+        )
+
+    async def acquire(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+
+        if self._semaphore.locked():
+            if self.queued >= self.max_queued:
+                self._reject("queue_full")
+            self.queued += 1
+            ADMISSION_QUEUED.inc()
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                self._reject("timeout")
+            finally:
+                self.queued -= 1
+                ADMISSION_QUEUED.dec()
+        else:
+            await self._semaphore.acquire()
+
+        self.in_flight += 1
+        ADMISSION_IN_FLIGHT.inc()
+
+    def release(self):
+        self.in_flight -= 1
+        ADMISSION_IN_FLIGHT.dec()
+        self._semaphore.release()
+
+    async def __call__(self):
+        """
+        Dependency holding a slot for the rest of the request.
+        """
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+
+db_admission = AdmissionLimiter()
@@ -0,0 +1,207 @@
+"""
+Token-bucket rate limiting.
+
+A bucket holds up to `burst` tokens and refills at `rate` tokens per second;
+every request takes one token and is answered 429 with a Retry-After header
+when the bucket is empty. Buckets are keyed by the verified username of the
+caller (user_rate_limit) or by the client address (ip_rate_limit).
+
+Buckets live in the worker's memory by default, so each worker enforces the
+limit on its own. RATE_LIMIT_BACKEND=redis (with RATE_LIMIT_REDIS_URL and the
+redis package installed) shares them between workers and hosts; any other
+store can be plugged in with set_rate_limit_backend().
+"""
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+from dotenv import load_dotenv
+from fastapi import Depends, HTTPException, Request
+from starlette.status import HTTP_429_TOO_MANY_REQUESTS
+
+from auth.JWTBearer import JWTAuthorizationCredentials, JWTBearer
+from observability.metrics import REGISTRY, Counter
+
+load_dotenv()
+
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "memory").lower()
+RATE_LIMIT_REDIS_URL = os.environ.get("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+# Buckets kept by the memory backend; the least recently used are dropped first
+RATE_LIMIT_MAX_KEYS = int(os.environ.get("RATE_LIMIT_MAX_KEYS", "100000"))
+
+# Task endpoints, per user
+RATE_LIMIT_TASKS_PER_SECOND = float(os.environ.get("RATE_LIMIT_TASKS_PER_SECOND", "10"))
+RATE_LIMIT_TASKS_BURST = int(os.environ.get("RATE_LIMIT_TASKS_BURST", "40"))
+# Sign-in, per client address; every attempt calls Cognito twice
+RATE_LIMIT_SIGN_IN_PER_SECOND = float(os.environ.get("RATE_LIMIT_SIGN_IN_PER_SECOND", "0.2"))
+RATE_LIMIT_SIGN_IN_BURST = int(os.environ.get("RATE_LIMIT_SIGN_IN_BURST", "10"))
+
+RATE_LIMITED = REGISTRY.register(
+    Counter("rate_limited_requests_total", "Requests rejected by a rate limit.", ("limit",))
+)
+
+
+class RateLimitBackend:
+    async def acquire(self, key: str, rate: float, burst: int) -> Tuple[bool, float]:
+        """
+        Take a token from a bucket.
+
+        :param key: Bucket key.
+        :param rate: Tokens added per second.
+        :param burst: Bucket capacity.
+        :return: Whether a token was taken, and the seconds until one is available.
+        """
+        raise NotImplementedError
+
+
+class MemoryBackend(RateLimitBackend):
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS, clock: Callable[[], float] = time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        # key -> [tokens, last refill]
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def acquire(self, key: str, rate: float, burst: int) -> Tuple[bool, float]:
+        now = self.clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(burst), now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return True, 0.0
+            return False, (1 - bucket[0]) / rate
+
+
+# KEYS[1]: bucket, ARGV: rate, burst, now; returns {allowed, retry_after * 1000}
+_REDIS_SCRIPT = """
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local wait = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+  allowed = 1
+else
+  wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return {allowed, math.ceil(wait * 1000)}
+"""
+
+
+class RedisBackend(RateLimitBackend):
+    """Buckets shared through Redis, updated atomically by a Lua script."""
+
+    def __init__(self, url: str = RATE_LIMIT_REDIS_URL, prefix: str = "ratelimit:"):
+        import redis.asyncio
+
+        self.client = redis.asyncio.from_url(url)
+        self.prefix = prefix
+        self._script = self.client.register_script(_REDIS_SCRIPT)
+
+    async def acquire(self, key: str, rate: float, burst: int) -> Tuple[bool, float]:
+        allowed, wait_ms = await self._script(
+            keys=[self.prefix + key], args=[rate, burst, time.time()]
+        )
+        return bool(allowed), wait_ms / 1000
+
+
+_backend: Optional[RateLimitBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_rate_limit_backend() -> RateLimitBackend:
+    """
+    Get the process-wide backend selected by RATE_LIMIT_BACKEND.
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = RedisBackend() if RATE_LIMIT_BACKEND == "redis" else MemoryBackend()
+    return _backend
+
+
+def set_rate_limit_backend(backend: Optional[RateLimitBackend]):
+    """
+    Replace the backend, e.g. with a shared store or a fresh one in tests.
+    """
+    global _backend
+    _backend = backend
+
+
+async def enforce(name: str, key: str, rate: float, burst: int):
+    """
+    Take a token for `key` from the bucket of limit `name`, or raise 429.
+    """
+    if not RATE_LIMIT_ENABLED:
+        return
+    allowed, retry_after = await get_rate_limit_backend().acquire(f"{name}:{key}", rate, burst)
+    if not allowed:
+        RATE_LIMITED.inc((name,))
+        raise HTTPException(
+            status_code=HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+
+def client_ip(request: Request) -> str:
+    # Behind a proxy, uvicorn's proxy_headers fills this from X-Forwarded-For
+    return request.client.host if request.client else "unknown"
+
+
+def user_rate_limit(name: str, rate: float, burst: int, bearer: JWTBearer):
+    """
+    Build a dependency limiting each authenticated user.
+
+    Pass the same JWTBearer instance the route uses so the token is verified
+    only once per request.
+
+    :param name: Name of the limit, used in keys and metrics.
+    :param rate: Requests per second allowed on average.
+    :param burst: Requests allowed at once.
+    :param bearer: JWTBearer dependency of the route.
+    """
+
+    async def dependency(
+        request: Request, credentials: JWTAuthorizationCredentials = Depends(bearer)
+    ):
+        key = credentials.claims.get("username") or credentials.claims.get("sub")
+        await enforce(name, key or client_ip(request), rate, burst)
+
+    return dependency
+
+
+def ip_rate_limit(name: str, rate: float, burst: int):
+    """
+    Build a dependency limiting each client address, for unauthenticated routes.
+
+    :param name: Name of the limit, used in keys and metrics.
+    :param rate: Requests per second allowed on average.
+    :param burst: Requests allowed at once.
+    """
+
+    async def dependency(request: Request):
+        await enforce(name, client_ip(request), rate, burst)
+
+    return dependency